@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+批量警报评估 - 使用NumPy一次性计算所有交易对的变化率、阈值判断和警报级别
+输入为按交易对对齐的数组，只返回触发警报的下标；多个比较窗口时基准为(窗口, 交易对)矩阵，一次计算全部窗口
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+# 警报级别编号，与enhanced_monitor.AlertLevel的顺序一致
+LEVEL_LOW = 0
+LEVEL_MEDIUM = 1
+LEVEL_HIGH = 2
+LEVEL_CRITICAL = 3
+
+# 警报级别阈值（持仓量变化, 价格变化），从高到低依次判断，满足任一即为该级别
+# 与EnhancedBinanceMonitor.determine_alert_level使用相同的比较方式
+ALERT_LEVEL_THRESHOLDS = (
+    (LEVEL_CRITICAL, 0.15, 0.05),
+    (LEVEL_HIGH, 0.12, 0.04),
+    (LEVEL_MEDIUM, 0.10, 0.03),
+)
+
+
+@dataclass
+class BatchEvaluation:
+    """批量评估结果（所有数组与输入按下标对齐，多窗口评估时为(窗口, 交易对)二维数组）"""
+    oi_change: np.ndarray       # 持仓量变化率，无基准时为NaN
+    price_change: np.ndarray    # 价格变化率，无基准时为NaN
+    valid: np.ndarray           # 是否有可用基准
+    triggered: np.ndarray       # 是否同时超过两个阈值
+    levels: np.ndarray          # 警报级别编号
+
+    @property
+    def fired_indices(self) -> np.ndarray:
+        """触发警报的下标"""
+        return np.flatnonzero(self.triggered)
+
+
+def _change_rate(current: np.ndarray, baseline: np.ndarray) -> np.ndarray:
+    """计算变化率，基准缺失或为0时返回NaN"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = (current - baseline) / baseline
+    rate[~np.isfinite(baseline) | (baseline == 0)] = np.nan
+    return rate
+
+
+def compute_alert_levels(oi_change_percent: np.ndarray, price_change_percent: np.ndarray) -> np.ndarray:
+    """
+    批量计算警报级别
+
+    Args:
+        oi_change_percent: 持仓量变化百分比的绝对值
+        price_change_percent: 价格变化百分比的绝对值
+
+    Returns:
+        np.ndarray: 警报级别编号（int8）
+    """
+    levels = np.full(oi_change_percent.shape, LEVEL_LOW, dtype=np.int8)
+    # 从低到高依次覆盖，最终保留满足的最高级别
+    for level, oi_threshold, price_threshold in reversed(ALERT_LEVEL_THRESHOLDS):
+        mask = (oi_change_percent >= oi_threshold) | (price_change_percent >= price_threshold)
+        levels[mask] = level
+    return levels
+
+
+def evaluate_batch(current_oi: np.ndarray, current_price: np.ndarray,
+                   baseline_oi: np.ndarray, baseline_price: np.ndarray,
+                   oi_change_threshold, price_change_threshold) -> BatchEvaluation:
+    """
+    批量评估所有交易对
+
+    Args:
+        current_oi: 当前持仓量
+        current_price: 当前价格
+        baseline_oi: 基准持仓量（无基准时为NaN）
+        baseline_price: 基准价格（无基准时为NaN）
+        oi_change_threshold: 持仓量变化阈值（小数形式，可以是与基准形状可广播的数组）
+        price_change_threshold: 价格变化阈值（小数形式，同上）
+
+    Returns:
+        BatchEvaluation: 评估结果
+    """
+    current_oi = np.asarray(current_oi, dtype=np.float64)
+    current_price = np.asarray(current_price, dtype=np.float64)
+    baseline_oi = np.asarray(baseline_oi, dtype=np.float64)
+    baseline_price = np.asarray(baseline_price, dtype=np.float64)
+
+    oi_change = _change_rate(current_oi, baseline_oi)
+    price_change = _change_rate(current_price, baseline_price)
+    valid = ~(np.isnan(oi_change) | np.isnan(price_change))
+
+    # 与逐个判断时相同：比较百分比的绝对值
+    oi_change_percent = np.abs(oi_change * 100)
+    price_change_percent = np.abs(price_change * 100)
+
+    with np.errstate(invalid='ignore'):
+        triggered = valid & (oi_change_percent >= oi_change_threshold * 100) & \
+            (price_change_percent >= price_change_threshold * 100)
+        levels = compute_alert_levels(oi_change_percent, price_change_percent)
+
+    return BatchEvaluation(
+        oi_change=oi_change,
+        price_change=price_change,
+        valid=valid,
+        triggered=triggered,
+        levels=levels
+    )
+
+
+def evaluate_windows(current_oi: np.ndarray, current_price: np.ndarray,
+                     baseline_oi: np.ndarray, baseline_price: np.ndarray,
+                     oi_thresholds, price_thresholds) -> BatchEvaluation:
+    """
+    多窗口批量评估：每个窗口使用自己的阈值，所有窗口一次计算
+
+    Args:
+        current_oi: 当前持仓量（交易对数）
+        current_price: 当前价格（交易对数）
+        baseline_oi: 各窗口的基准持仓量（窗口数 x 交易对数，无基准时为NaN）
+        baseline_price: 各窗口的基准价格（窗口数 x 交易对数）
+        oi_thresholds: 各窗口的持仓量变化阈值
+        price_thresholds: 各窗口的价格变化阈值
+
+    Returns:
+        BatchEvaluation: 评估结果（窗口数 x 交易对数）
+    """
+    oi_thresholds = np.asarray(oi_thresholds, dtype=np.float64)[:, np.newaxis]
+    price_thresholds = np.asarray(price_thresholds, dtype=np.float64)[:, np.newaxis]
+    return evaluate_batch(current_oi, current_price, baseline_oi, baseline_price,
+                          oi_thresholds, price_thresholds)
+
+
+def select_windows(evaluation: BatchEvaluation) -> np.ndarray:
+    """
+    为每个交易对选出用于警报的窗口
+
+    触发的窗口中取警报级别最高的，级别相同时取排在前面（较短）的窗口。
+
+    Args:
+        evaluation: evaluate_windows的结果
+
+    Returns:
+        np.ndarray: 每个交易对选中的窗口下标，没有窗口触发时为-1
+    """
+    scores = np.where(evaluation.triggered, evaluation.levels.astype(np.int16), -1)
+    chosen = np.argmax(scores, axis=0)
+    chosen[~evaluation.triggered.any(axis=0)] = -1
+    return chosen
+
+
+def apply_zscore_gate(evaluation: BatchEvaluation, oi_z: np.ndarray, price_z: np.ndarray,
+                      ready: np.ndarray, oi_z_threshold: float, price_z_threshold: float) -> BatchEvaluation:
+    """
+    用z分数代替固定阈值判断是否触发
+
+    统计量就绪的位置：持仓量和价格变化的z分数绝对值同时达到阈值即触发；
+    未就绪的位置（样本不足）保留固定阈值的判断结果。警报级别仍按变化幅度计算。
+
+    Args:
+        evaluation: evaluate_windows的结果
+        oi_z: 持仓量变化率的z分数（与评估结果同形状）
+        price_z: 价格变化率的z分数
+        ready: z分数是否可用
+        oi_z_threshold: 持仓量z分数阈值
+        price_z_threshold: 价格z分数阈值
+
+    Returns:
+        BatchEvaluation: 替换了triggered的评估结果
+    """
+    with np.errstate(invalid='ignore'):
+        adaptive = evaluation.valid & (np.abs(oi_z) >= oi_z_threshold) & (np.abs(price_z) >= price_z_threshold)
+    return BatchEvaluation(
+        oi_change=evaluation.oi_change,
+        price_change=evaluation.price_change,
+        valid=evaluation.valid,
+        triggered=np.where(ready, adaptive, evaluation.triggered),
+        levels=evaluation.levels
+    )
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+冷数据归档 - 把过期的持仓量数据按天导出为压缩列式文件（Parquet或Arrow IPC）
+读取时内存映射文件，按交易对和时间范围返回NumPy数组，不再占用在线SQLite数据库
+需要安装pyarrow（可选依赖）：pip install pyarrow
+"""
+
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装pyarrow时归档功能不可用，其余功能不受影响
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 86400 * 1000
+
+# 归档格式 -> 文件扩展名
+ARCHIVE_FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+# 数值列及其NumPy类型
+VALUE_COLUMNS = (
+    ('ts', np.int64),
+    ('open_interest', np.float64),
+    ('price', np.float64),
+)
+
+
+def _empty_columns() -> Dict[str, np.ndarray]:
+    """空的结果数组"""
+    return {name: np.empty(0, dtype=dtype) for name, dtype in VALUE_COLUMNS}
+
+
+class ColdArchive:
+    """按天归档的列式文件存储
+
+    每个UTC自然日一个文件（oi_YYYYMMDD.parquet / .arrow），行按(symbol, ts)排序，
+    Parquet按交易对过滤时可以跳过不相关的行组。文件先写入临时文件再原子替换，
+    中断不会留下不完整的归档。
+    """
+
+    def __init__(self, archive_dir: str = "data/archive", fmt: str = 'parquet',
+                 compression: str = 'zstd'):
+        """
+        初始化归档
+
+        Args:
+            archive_dir: 归档目录
+            fmt: 文件格式（parquet / arrow）
+            compression: 压缩算法（parquet支持zstd/snappy/gzip等，arrow支持zstd/lz4）
+        """
+        if fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"未知的归档格式: {fmt}（可选: {', '.join(ARCHIVE_FORMATS)}）")
+        self.archive_dir = archive_dir
+        self.fmt = fmt
+        self.compression = compression
+
+    @property
+    def available(self) -> bool:
+        """pyarrow是否可用"""
+        return pa is not None
+
+    def _require_pyarrow(self):
+        if pa is None:
+            raise RuntimeError("冷数据归档需要安装pyarrow: pip install pyarrow")
+
+    def path_for(self, day_start: int) -> str:
+        """某天的归档文件路径"""
+        day = datetime.fromtimestamp(day_start / 1000, timezone.utc).strftime('%Y%m%d')
+        return os.path.join(self.archive_dir, f"oi_{day}{ARCHIVE_FORMATS[self.fmt]}")
+
+    def has_day(self, day_start: int) -> bool:
+        """某天是否已归档"""
+        return os.path.exists(self.path_for(day_start))
+
+    def archived_days(self) -> List[int]:
+        """已归档的日期（UTC零点毫秒），按时间升序"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+
+        days = []
+        extension = ARCHIVE_FORMATS[self.fmt]
+        for name in os.listdir(self.archive_dir):
+            if name.startswith('oi_') and name.endswith(extension):
+                try:
+                    day = datetime.strptime(name[3:-len(extension)], '%Y%m%d').replace(tzinfo=timezone.utc)
+                except ValueError:
+                    continue
+                days.append(int(day.timestamp() * 1000))
+        return sorted(days)
+
+    def write_day(self, day_start: int, rows: Iterable[Tuple[str, int, float, float]]) -> Optional[str]:
+        """
+        写入一天的数据
+
+        Args:
+            day_start: 当天UTC零点（毫秒）
+            rows: (symbol, ts, open_interest, price) 记录
+
+        Returns:
+            Optional[str]: 归档文件路径，没有数据时返回None
+        """
+        self._require_pyarrow()
+
+        rows = sorted(rows, key=lambda row: (row[0], row[1]))
+        if not rows:
+            return None
+
+        symbols, timestamps, open_interest, prices = zip(*rows)
+        table = pa.table({
+            'symbol': pa.array(symbols, type=pa.string()).dictionary_encode(),
+            'ts': pa.array(timestamps, type=pa.int64()),
+            'open_interest': pa.array(open_interest, type=pa.float64()),
+            'price': pa.array(prices, type=pa.float64()),
+        })
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = self.path_for(day_start)
+        tmp_path = path + '.tmp'
+
+        if self.fmt == 'parquet':
+            pq.write_table(table, tmp_path, compression=self.compression)
+        else:
+            options = ipc.IpcWriteOptions(compression=self.compression)
+            with pa.OSFile(tmp_path, 'wb') as sink, ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+
+        os.replace(tmp_path, path)
+        logger.info(f"归档 {len(rows)} 条持仓量数据: {path}")
+        return path
+
+    def _read_file(self, path: str, symbol: str):
+        """内存映射读取一个文件中某个交易对的数据"""
+        if self.fmt == 'parquet':
+            return pq.read_table(
+                path,
+                columns=[name for name, _ in VALUE_COLUMNS],
+                filters=[('symbol', '=', symbol)],
+                memory_map=True
+            )
+
+        with pa.memory_map(path, 'r') as source:
+            table = ipc.open_file(source).read_all()
+        mask = pc.equal(table.column('symbol').cast(pa.string()), symbol)
+        return table.filter(mask).select([name for name, _ in VALUE_COLUMNS])
+
+    def read(self, symbol: str, start_ms: int, end_ms: int) -> Dict[str, np.ndarray]:
+        """
+        读取一个交易对在时间范围内的归档数据
+
+        Args:
+            symbol: 交易对符号
+            start_ms: 开始时间（UTC毫秒，含）
+            end_ms: 结束时间（UTC毫秒，不含）
+
+        Returns:
+            Dict[str, np.ndarray]: ts、open_interest、price数组，按时间升序
+        """
+        self._require_pyarrow()
+
+        chunks: Dict[str, List[np.ndarray]] = {name: [] for name, _ in VALUE_COLUMNS}
+        day = start_ms - start_ms % DAY_MS
+        while day < end_ms:
+            path = self.path_for(day)
+            day += DAY_MS
+            if not os.path.exists(path):
+                continue
+
+            table = self._read_file(path, symbol)
+            if table.num_rows == 0:
+                continue
+
+            ts = table.column('ts').to_numpy()
+            in_range = (ts >= start_ms) & (ts < end_ms)
+            for name, dtype in VALUE_COLUMNS:
+                chunks[name].append(table.column(name).to_numpy().astype(dtype, copy=False)[in_range])
+
+        if not chunks['ts']:
+            return _empty_columns()
+        return {name: np.concatenate(arrays) for name, arrays in chunks.items()}
+
+    def get_stats(self) -> Dict[str, int]:
+        """归档文件数量和总大小"""
+        days = self.archived_days()
+        size = sum(os.path.getsize(self.path_for(day)) for day in days)
+        return {'files': len(days), 'size_bytes': size}
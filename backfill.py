@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+历史数据回填 - 用openInterestHist和K线接口补齐停机期间缺失的持仓量数据
+各交易对并发获取（受同一个权重限流器约束），结果分批在大事务中导入，已存在的记录跳过
+
+用法:
+    python backfill.py                 # 自动检测缺口（最多回填24小时）
+    python backfill.py --hours 72      # 回填最近72小时
+    python backfill.py --symbols BTCUSDT,ETHUSDT --concurrency 4
+"""
+
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+OI_HIST_ENDPOINT = "/futures/data/openInterestHist"
+KLINES_ENDPOINT = "/fapi/v1/klines"
+
+# openInterestHist支持的周期（毫秒）
+PERIOD_MS = {
+    '5m': 5 * 60 * 1000,
+    '15m': 15 * 60 * 1000,
+    '30m': 30 * 60 * 1000,
+    '1h': 60 * 60 * 1000,
+}
+
+OI_HIST_LIMIT = 500
+# limit小于500时K线权重为2
+KLINES_LIMIT = 499
+# openInterestHist只提供最近30天的数据
+OI_HIST_MAX_DAYS = 30
+
+
+class OIBackfiller:
+    """持仓量历史回填器
+
+    请求通过传入的request_func发送（例如EnhancedBinanceMonitor._make_rate_limited_request），
+    因此与监控共用权重限流和重试规则。每个交易对分页获取持仓量历史和对应周期的K线，
+    以K线收盘价作为该时刻的价格。
+    """
+
+    def __init__(self, request_func: Callable[..., Optional[requests.Response]], db,
+                 base_url: str = "https://fapi.binance.com", period: str = '5m',
+                 max_concurrency: int = 8, batch_rows: int = 20000):
+        """
+        初始化回填器
+
+        Args:
+            request_func: 请求函数 request_func(url, params) -> Optional[Response]
+            db: DatabaseManager实例
+            base_url: API基础地址
+            period: 数据周期（5m / 15m / 30m / 1h）
+            max_concurrency: 同时回填的交易对数
+            batch_rows: 每个导入事务的行数
+        """
+        if period not in PERIOD_MS:
+            raise ValueError(f"不支持的回填周期: {period}（可选: {', '.join(PERIOD_MS)}）")
+        self.request_func = request_func
+        self.db = db
+        self.base_url = base_url
+        self.period = period
+        self.period_ms = PERIOD_MS[period]
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_rows = max(1, batch_rows)
+
+    def detect_gap(self, max_hours: float = 24.0, now_ms: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """
+        检测需要回填的时间范围
+
+        从最新一条记录之后（没有数据时从max_hours之前）到最近一个完整周期结束，
+        缺口不足两个周期时不回填。
+
+        Args:
+            max_hours: 最多回填的小时数
+            now_ms: 当前时间（UTC毫秒）
+
+        Returns:
+            Optional[Tuple[int, int]]: (开始, 结束) UTC毫秒，无需回填时返回None
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        max_hours = min(max_hours, OI_HIST_MAX_DAYS * 24)
+        earliest = now_ms - int(max_hours * 3600 * 1000)
+
+        latest = self.db.get_oi_latest_ts()
+        start = earliest if latest is None else max(earliest, latest + 1)
+        start += -start % self.period_ms
+        end = now_ms - now_ms % self.period_ms
+
+        if end - start < 2 * self.period_ms:
+            return None
+        return start, end
+
+    def _get_json(self, endpoint: str, params: Dict[str, Any]) -> Optional[list]:
+        """发送请求并解析JSON，失败时返回None"""
+        response = self.request_func(f"{self.base_url}{endpoint}", params)
+        if response is None:
+            return None
+        data = response.json()
+        return data if isinstance(data, list) else None
+
+    def _fetch_oi_hist(self, symbol: str, start_ms: int, end_ms: int) -> Optional[Dict[int, Tuple[float, float]]]:
+        """分页获取持仓量历史：ts -> (持仓量, 持仓价值)"""
+        points: Dict[int, Tuple[float, float]] = {}
+        cursor = start_ms
+        while cursor <= end_ms:
+            data = self._get_json(OI_HIST_ENDPOINT, {
+                'symbol': symbol, 'period': self.period, 'limit': OI_HIST_LIMIT,
+                'startTime': cursor, 'endTime': end_ms
+            })
+            if data is None:
+                return None
+            for item in data:
+                points[int(item['timestamp'])] = (float(item['sumOpenInterest']),
+                                                  float(item['sumOpenInterestValue']))
+            if len(data) < OI_HIST_LIMIT:
+                break
+            cursor = max(points) + self.period_ms
+        return points
+
+    def _fetch_prices(self, symbol: str, start_ms: int, end_ms: int) -> Optional[Dict[int, float]]:
+        """分页获取K线：周期结束时间 -> 收盘价"""
+        prices: Dict[int, float] = {}
+        # 时间点t的价格取结束于t的K线收盘价，因此从前一个周期开始获取
+        cursor = start_ms - self.period_ms
+        while cursor < end_ms:
+            data = self._get_json(KLINES_ENDPOINT, {
+                'symbol': symbol, 'interval': self.period, 'limit': KLINES_LIMIT,
+                'startTime': cursor, 'endTime': end_ms
+            })
+            if data is None:
+                return None
+            for kline in data:
+                prices[int(kline[0]) + self.period_ms] = float(kline[4])
+            if len(data) < KLINES_LIMIT:
+                break
+            cursor = int(data[-1][0]) + self.period_ms
+        return prices
+
+    def fetch_symbol(self, symbol: str, start_ms: int, end_ms: int) -> Optional[List[tuple]]:
+        """
+        获取一个交易对在时间范围内的回填数据
+
+        Returns:
+            Optional[List[tuple]]: oi_history插入参数（变化率留空，与旧版导入一致），请求失败时返回None
+        """
+        points = self._fetch_oi_hist(symbol, start_ms, end_ms)
+        if points is None:
+            return None
+        if not points:
+            return []
+
+        prices = self._fetch_prices(symbol, min(points), max(points))
+        if prices is None:
+            return None
+
+        rows = []
+        for ts in sorted(points):
+            price = prices.get(ts)
+            if price is None or not start_ms <= ts <= end_ms:
+                continue
+            open_interest, value_usdt = points[ts]
+            rows.append((symbol, ts, open_interest, price, value_usdt, None, None))
+        return rows
+
+    def run(self, symbols: List[str], start_ms: int, end_ms: int) -> Dict[str, Any]:
+        """
+        并发回填所有交易对
+
+        Args:
+            symbols: 交易对列表
+            start_ms: 开始时间（UTC毫秒）
+            end_ms: 结束时间（UTC毫秒）
+
+        Returns:
+            Dict: 回填统计
+        """
+        start = time.time()
+        stats = {'symbols': len(symbols), 'failed': [], 'rows_fetched': 0, 'rows_inserted': 0,
+                 'transactions': 0}
+        buffer: List[tuple] = []
+
+        def flush():
+            if buffer:
+                stats['rows_inserted'] += self.db.bulk_load_oi(buffer)
+                stats['transactions'] += 1
+                buffer.clear()
+
+        logger.info(f"开始回填 {len(symbols)} 个交易对的持仓量数据: {start_ms} - {end_ms}（周期 {self.period}）")
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="backfill") as executor:
+            futures = {executor.submit(self.fetch_symbol, symbol, start_ms, end_ms): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    logger.error(f"回填 {symbol} 失败: {e}")
+                    rows = None
+
+                if rows is None:
+                    stats['failed'].append(symbol)
+                    continue
+
+                stats['rows_fetched'] += len(rows)
+                buffer.extend(rows)
+                if len(buffer) >= self.batch_rows:
+                    flush()
+        flush()
+
+        stats['duration'] = round(time.time() - start, 2)
+        logger.info(
+            f"回填完成: 获取 {stats['rows_fetched']} 行, 新写入 {stats['rows_inserted']} 行, "
+            f"失败 {len(stats['failed'])} 个交易对, 耗时 {stats['duration']}秒"
+        )
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="持仓量历史数据回填")
+    parser.add_argument("--hours", type=float, default=None,
+                        help="回填最近多少小时（默认自动检测缺口，最多回填24小时）")
+    parser.add_argument("--symbols", default=None, help="逗号分隔的交易对（默认全部永续合约）")
+    parser.add_argument("--period", choices=sorted(PERIOD_MS), default='5m', help="数据周期")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时回填的交易对数")
+    args = parser.parse_args()
+
+    # 延迟导入，避免与监控器模块循环依赖
+    from enhanced_monitor import EnhancedBinanceMonitor, MonitoringConfig
+
+    config = MonitoringConfig(backfill_on_startup=False, snapshot_enabled=False)
+    monitor = EnhancedBinanceMonitor(config)
+    backfiller = OIBackfiller(monitor._make_rate_limited_request, monitor.db, base_url=monitor.base_url,
+                              period=args.period, max_concurrency=args.concurrency)
+
+    try:
+        now_ms = int(time.time() * 1000)
+        if args.hours is None:
+            gap = backfiller.detect_gap(now_ms=now_ms)
+        else:
+            period_ms = PERIOD_MS[args.period]
+            gap = (now_ms - int(args.hours * 3600 * 1000), now_ms - now_ms % period_ms)
+        if gap is None:
+            print("没有需要回填的数据")
+            return
+
+        symbols = args.symbols.split(',') if args.symbols else monitor.symbol_cache.get_symbols()
+        stats = backfiller.run(symbols, *gap)
+        print(f"回填完成: 获取 {stats['rows_fetched']:,} 行, 新写入 {stats['rows_inserted']:,} 行, "
+              f"失败 {len(stats['failed'])} 个交易对, 耗时 {stats['duration']}秒")
+    finally:
+        monitor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+警报回放与回测 - 把oi_history中一段时间的数据读成列式数组，按monitor_once相同的逻辑重新计算警报
+比较窗口和阈值、警报级别、窗口选择和冷却期与在线监控一致，用于在历史数据上调整阈值
+
+用法:
+    python backtest.py --days 30
+    python backtest.py --start 2025-09-01 --end 2025-10-01 --output alerts.csv
+    python backtest.py --days 7 --window 15:0.04:0.015 --window 60:0.08:0.03 --cooldown-minutes 30
+    python backtest.py --days 30 --adaptive --z-oi 4 --z-price 3
+"""
+
+import argparse
+import csv
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from alert_evaluator import apply_zscore_gate, evaluate_windows, select_windows
+from database_manager import DatabaseManager
+from enhanced_monitor import (
+    ALERT_COOLDOWN_SECONDS, ALERT_LEVEL_ORDER, UTC8, MonitoringConfig,
+    format_window, resolve_change_windows
+)
+from history_cache import asof_tolerance, baseline_lookback_seconds
+from oi_storage import STORAGE_LAYOUTS
+from rolling_stats import RollingStats
+
+logger = logging.getLogger(__name__)
+
+# 从数据库读取的行格式
+ROW_DTYPE = np.dtype([('ts', np.int64), ('open_interest', np.float64), ('price', np.float64)])
+
+# 每次向量化评估的行数（限制(窗口, 行)中间数组的内存）
+EVAL_CHUNK_ROWS = 250000
+
+# 满足警报条件的行的字段
+CANDIDATE_FIELDS = ('row', 'window', 'level', 'oi_change', 'price_change', 'old_oi', 'old_price')
+
+# 警报时间的显示时区。Asia/Shanghai自1991年起没有夏令时，使用固定偏移避免逐条调用pytz
+_UTC8_FIXED = timezone(timedelta(hours=8))
+
+
+@dataclass
+class OIColumns:
+    """按(交易对, 时间)排序的列式持仓量数据"""
+    symbols: List[str]          # 交易对编号 -> 交易对符号
+    codes: np.ndarray           # 交易对编号（int32）
+    ts: np.ndarray              # UTC毫秒（int64）
+    open_interest: np.ndarray
+    price: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+
+@dataclass
+class ReplayResult:
+    """回放结果"""
+    alerts: List[Dict[str, Any]] = field(default_factory=list)
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+    def to_csv(self, path: str):
+        """把警报列表写入CSV文件"""
+        columns = ['timestamp', 'symbol', 'window_minutes', 'alert_level', 'oi_change_percent',
+                   'price_change_percent', 'current_oi', 'old_oi', 'current_price', 'old_price', 'ts']
+        with open(path, 'w', newline='', encoding='utf-8') as fp:
+            writer = csv.DictWriter(fp, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(self.alerts)
+
+
+def load_oi_columns(db: DatabaseManager, start_ms: int, end_ms: int) -> OIColumns:
+    """
+    读取时间范围内所有交易对的持仓量数据
+
+    逐个交易对按(symbol, ts)索引做范围查询，结果直接按(交易对, 时间)有序，
+    只返回数值列，每批结果一次转换为NumPy结构化数组。
+
+    Args:
+        db: DatabaseManager实例
+        start_ms: 开始时间（UTC毫秒，含）
+        end_ms: 结束时间（UTC毫秒，不含）
+
+    Returns:
+        OIColumns: 列式数据
+    """
+    symbols: List[str] = []
+    parts: List[np.ndarray] = []
+    codes: List[np.ndarray] = []
+
+    with db.get_connection(readonly=True) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        for symbol in db.oi_storage.symbols(conn.cursor()):
+            cursor.execute(
+                f"""SELECT ts, open_interest, price FROM {db.oi_storage.source}
+                WHERE symbol = ? AND ts >= ? AND ts < ?
+                ORDER BY ts""",
+                (symbol, start_ms, end_ms)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                continue
+            parts.append(np.array(rows, dtype=ROW_DTYPE))
+            codes.append(np.full(len(rows), len(symbols), dtype=np.int32))
+            symbols.append(symbol)
+
+    data = np.concatenate(parts) if parts else np.empty(0, dtype=ROW_DTYPE)
+    return OIColumns(
+        symbols=symbols,
+        codes=np.concatenate(codes) if codes else np.empty(0, dtype=np.int32),
+        ts=data['ts'].copy(),
+        open_interest=data['open_interest'].copy(),
+        price=data['price'].copy()
+    )
+
+
+class ReplayEngine:
+    """警报回放引擎
+
+    每一行数据视为它所在周期的"当前值"，各窗口的基准与HistoryCache.get_window_baselines相同：
+    同一交易对中时间最接近 ts - 窗口长度 且偏差在容差内的记录（相差相同时取较早的一条），
+    没有时按config.baseline_fallback回退到目标时间之前最近的一条记录。
+    所有行的基准通过一次有序查找得到，之后分块调用与监控相同的evaluate_windows和select_windows，
+    最后按交易对顺序应用冷却期。启用自适应阈值时，滚动统计依赖周期顺序，改为逐周期评估。
+    """
+
+    def __init__(self, config: Optional[MonitoringConfig] = None,
+                 cooldown_seconds: float = ALERT_COOLDOWN_SECONDS,
+                 eval_chunk_rows: int = EVAL_CHUNK_ROWS):
+        """
+        初始化回放引擎
+
+        Args:
+            config: 监控配置（比较窗口、阈值和自适应阈值设置）
+            cooldown_seconds: 警报冷却期（秒）
+            eval_chunk_rows: 每次向量化评估的行数
+        """
+        self.config = config or MonitoringConfig()
+        self.change_windows = resolve_change_windows(self.config)
+        self.window_minutes = [minutes for minutes, _, _ in self.change_windows]
+        self.cooldown_ms = int(cooldown_seconds * 1000)
+        self.eval_chunk_rows = max(1, eval_chunk_rows)
+
+        self.window_ms = np.array([int(minutes * 60 * 1000) for minutes in self.window_minutes], dtype=np.int64)
+        self.tolerance_ms = np.array([int(asof_tolerance(minutes) * 1000) for minutes in self.window_minutes],
+                                     dtype=np.int64)
+        self.fallback = self.config.baseline_fallback
+        self.fallback_ms = np.array([int(baseline_lookback_seconds(minutes) * 1000) for minutes in self.window_minutes],
+                                    dtype=np.int64)
+
+    @property
+    def lookback_ms(self) -> int:
+        """回放开始前需要额外读取的时间（最长窗口的基准查找范围），使开始时刻的行也有基准"""
+        return int(baseline_lookback_seconds(self.window_minutes[-1], self.fallback) * 1000)
+
+    def baseline_indices(self, columns: OIColumns) -> np.ndarray:
+        """
+        查找每一行在每个窗口上的基准行
+
+        Returns:
+            np.ndarray: 基准行下标（窗口数 x 行数，int32），无基准时为-1
+        """
+        rows = len(columns)
+        result = np.full((len(self.window_ms), rows), -1, dtype=np.int32)
+        if rows == 0:
+            return result
+
+        # 把(交易对, 时间)编码为一个单调递增的整数键，目标时间不会越过相邻交易对的范围
+        base = int(columns.ts.min()) - self.lookback_ms - 1
+        span = int(columns.ts.max()) - base + int(self.tolerance_ms.max()) + 1
+        prefix = columns.codes.astype(np.int64) * span
+        keys = prefix + (columns.ts - base)
+
+        for row, (window_ms, tolerance_ms, fallback_ms) in enumerate(
+                zip(self.window_ms, self.tolerance_ms, self.fallback_ms)):
+            target = columns.ts - window_ms
+            right = np.searchsorted(keys, prefix + (target - base), side='left')
+            left = right - 1
+
+            # 与SymbolHistory.asof_index相同：比较目标前后相邻的两条记录，相差相同时取较早的一条
+            left_clipped = np.clip(left, 0, rows - 1)
+            right_clipped = np.clip(right, 0, rows - 1)
+            left_gap = np.abs(columns.ts[left_clipped] - target)
+            right_gap = np.abs(columns.ts[right_clipped] - target)
+            left_ok = (left >= 0) & (columns.codes[left_clipped] == columns.codes) & (left_gap <= tolerance_ms)
+            right_ok = (right < rows) & (columns.codes[right_clipped] == columns.codes) & (right_gap <= tolerance_ms)
+
+            use_right = right_ok & (~left_ok | (right_gap < left_gap))
+            result[row] = np.where(use_right, right_clipped, np.where(left_ok, left_clipped, -1))
+
+            if self.fallback:
+                # 与SymbolHistory.baseline_index相同：容差内没有记录时取目标时间之前最近的一条
+                before = np.searchsorted(keys, prefix + (target - base), side='right') - 1
+                before_clipped = np.clip(before, 0, rows - 1)
+                before_ok = ((before >= 0) & (columns.codes[before_clipped] == columns.codes)
+                             & (columns.ts[before_clipped] >= columns.ts - fallback_ms))
+                result[row] = np.where(result[row] < 0, np.where(before_ok, before_clipped, -1), result[row])
+
+        return result
+
+    def _evaluate(self, columns: OIColumns, baselines: np.ndarray, rows: np.ndarray):
+        """评估一组行，返回评估结果和基准矩阵"""
+        indices = baselines[:, rows]
+        missing = indices < 0
+        baseline_oi = np.where(missing, np.nan, columns.open_interest[indices])
+        baseline_price = np.where(missing, np.nan, columns.price[indices])
+        evaluation = evaluate_windows(
+            columns.open_interest[rows],
+            columns.price[rows],
+            baseline_oi,
+            baseline_price,
+            [oi_threshold for _, oi_threshold, _ in self.change_windows],
+            [price_threshold for _, _, price_threshold in self.change_windows]
+        )
+        return evaluation, baseline_oi, baseline_price
+
+    def _candidates(self, columns: OIColumns, baselines: np.ndarray,
+                    start_ms: int) -> Tuple[List[Dict[str, np.ndarray]], int]:
+        """固定阈值：分块向量化评估，返回满足警报条件的行（未应用冷却期）"""
+        candidates = []
+        evaluated = 0
+        for begin in range(0, len(columns), self.eval_chunk_rows):
+            rows = np.arange(begin, min(begin + self.eval_chunk_rows, len(columns)))
+            rows = rows[columns.ts[rows] >= start_ms]
+            if not len(rows):
+                continue
+            evaluation, baseline_oi, baseline_price = self._evaluate(columns, baselines, rows)
+            evaluated += int(evaluation.valid.any(axis=0).sum())
+            candidates.append(self._collect(rows, evaluation, baseline_oi, baseline_price))
+        return candidates, evaluated
+
+    def _candidates_adaptive(self, columns: OIColumns, baselines: np.ndarray,
+                             start_ms: int) -> Tuple[List[Dict[str, np.ndarray]], int]:
+        """自适应阈值：按周期（相同时间戳）依次评估并更新滚动统计，与在线监控的顺序一致"""
+        stats = RollingStats(
+            self.window_minutes,
+            halflife_cycles=self.config.rolling_stats_halflife_cycles,
+            min_samples=self.config.zscore_min_samples
+        )
+        order = np.lexsort((columns.codes, columns.ts))
+        boundaries = np.flatnonzero(np.diff(columns.ts[order])) + 1
+
+        candidates = []
+        evaluated = 0
+        for rows in np.split(order, boundaries):
+            if not len(rows):
+                continue
+            evaluation, baseline_oi, baseline_price = self._evaluate(columns, baselines, rows)
+            symbols = [columns.symbols[code] for code in columns.codes[rows]]
+            oi_z, price_z, ready = stats.zscores(symbols, evaluation.oi_change, evaluation.price_change)
+            evaluation = apply_zscore_gate(
+                evaluation, oi_z, price_z, ready,
+                self.config.zscore_oi_threshold, self.config.zscore_price_threshold
+            )
+            stats.update(symbols, evaluation.oi_change, evaluation.price_change)
+
+            # 回放开始前的数据只用于累计统计量
+            if columns.ts[rows[0]] < start_ms:
+                continue
+            evaluated += int(evaluation.valid.any(axis=0).sum())
+            candidates.append(self._collect(rows, evaluation, baseline_oi, baseline_price))
+
+        return candidates, evaluated
+
+    @staticmethod
+    def _collect(rows: np.ndarray, evaluation, baseline_oi: np.ndarray,
+                 baseline_price: np.ndarray) -> Dict[str, np.ndarray]:
+        """选出触发的行及其选中窗口上的变化率和基准（字段见CANDIDATE_FIELDS）"""
+        windows = select_windows(evaluation)
+        fired = np.flatnonzero(windows >= 0)
+        chosen = windows[fired]
+        return {
+            'row': rows[fired],
+            'window': chosen,
+            'level': evaluation.levels[chosen, fired],
+            'oi_change': evaluation.oi_change[chosen, fired],
+            'price_change': evaluation.price_change[chosen, fired],
+            'old_oi': baseline_oi[chosen, fired],
+            'old_price': baseline_price[chosen, fired],
+        }
+
+    def run(self, columns: OIColumns, start_ms: Optional[int] = None) -> ReplayResult:
+        """
+        回放警报
+
+        Args:
+            columns: 列式数据（应包含start_ms之前lookback_ms的数据作为基准）
+            start_ms: 只对该时间及之后的行产生警报（默认全部）
+
+        Returns:
+            ReplayResult: 警报列表和统计
+        """
+        start = time.time()
+        if start_ms is None:
+            start_ms = int(columns.ts.min()) if len(columns) else 0
+
+        baselines = self.baseline_indices(columns)
+        if self.config.adaptive_thresholds:
+            candidates, evaluated = self._candidates_adaptive(columns, baselines, start_ms)
+        else:
+            candidates, evaluated = self._candidates(columns, baselines, start_ms)
+
+        # 按行下标排序即按(交易对, 时间)排序
+        fired = {
+            name: np.concatenate([part[name] for part in candidates]) if candidates else np.empty(0)
+            for name in CANDIDATE_FIELDS
+        }
+        order = np.argsort(fired['row'], kind='stable')
+        fired = {name: values[order] for name, values in fired.items()}
+        fired_rows = fired['row'].astype(np.intp)
+
+        # 冷却期：与should_alert相同，距上次发送警报超过冷却期才发送
+        accepted = []
+        last_code = -1
+        last_alert_ms = 0
+        for index, (code, ts) in enumerate(zip(columns.codes[fired_rows].tolist(),
+                                               columns.ts[fired_rows].tolist())):
+            if code == last_code and ts - last_alert_ms <= self.cooldown_ms:
+                continue
+            last_code = code
+            last_alert_ms = ts
+            accepted.append(index)
+
+        sent = {name: values[accepted].tolist() for name, values in fired.items()}
+        sent_rows = fired_rows[accepted]
+        alerts = [
+            {
+                'timestamp': datetime.fromtimestamp(ts / 1000, _UTC8_FIXED).isoformat(),
+                'symbol': columns.symbols[code],
+                'window_minutes': self.window_minutes[window],
+                'alert_level': ALERT_LEVEL_ORDER[level].value,
+                'oi_change_percent': oi_change * 100,
+                'price_change_percent': price_change * 100,
+                'current_oi': current_oi,
+                'old_oi': old_oi,
+                'current_price': current_price,
+                'old_price': old_price,
+                'ts': ts,
+            }
+            for code, ts, current_oi, current_price, window, level, oi_change, price_change, old_oi, old_price in zip(
+                columns.codes[sent_rows].tolist(), columns.ts[sent_rows].tolist(),
+                columns.open_interest[sent_rows].tolist(), columns.price[sent_rows].tolist(),
+                sent['window'], sent['level'], sent['oi_change'], sent['price_change'],
+                sent['old_oi'], sent['old_price']
+            )
+        ]
+        suppressed = len(fired_rows) - len(accepted)
+
+        in_range = columns.ts >= start_ms
+        duration = time.time() - start
+        rows = int(in_range.sum())
+        stats = {
+            'rows': rows,
+            'symbols': int(len(np.unique(columns.codes[in_range]))),
+            'cycles': int(len(np.unique(columns.ts[in_range]))),
+            'rows_with_baseline': evaluated,
+            'candidates': len(fired_rows),
+            'alerts': len(alerts),
+            'suppressed_by_cooldown': suppressed,
+            'by_level': dict(Counter(alert['alert_level'] for alert in alerts)),
+            'by_window': {
+                format_window(minutes): count
+                for minutes, count in sorted(Counter(alert['window_minutes'] for alert in alerts).items())
+            },
+            'top_symbols': Counter(alert['symbol'] for alert in alerts).most_common(10),
+            'adaptive_thresholds': self.config.adaptive_thresholds,
+            'duration': round(duration, 3),
+            'rows_per_second': round(rows / duration) if duration > 0 else rows,
+        }
+        return ReplayResult(alerts=alerts, stats=stats)
+
+
+def _parse_window(text: str) -> Tuple[float, Optional[float], Optional[float]]:
+    """解析 分钟[:持仓量阈值:价格阈值]，例如 15 或 60:0.08:0.03"""
+    parts = text.split(':')
+    if len(parts) not in (1, 3):
+        raise argparse.ArgumentTypeError(f"窗口格式应为 分钟 或 分钟:持仓量阈值:价格阈值，实际为 {text}")
+    try:
+        minutes = float(parts[0])
+        if len(parts) == 1:
+            return minutes, None, None
+        return minutes, float(parts[1]), float(parts[2])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的窗口: {text}")
+
+
+def _parse_date(text: str) -> datetime:
+    """解析日期或日期时间（无时区信息的按UTC+8处理）"""
+    dt = datetime.fromisoformat(text)
+    return UTC8.localize(dt) if dt.tzinfo is None else dt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在历史持仓量数据上回放警报逻辑")
+    parser.add_argument("--db", default="data/binance_monitor.db", help="数据库路径")
+    parser.add_argument("--layout", choices=sorted(STORAGE_LAYOUTS), default="standard",
+                        help="持仓量数据存储布局（须与监控配置一致）")
+    parser.add_argument("--start", type=_parse_date, default=None, help="开始时间（如 2025-09-01）")
+    parser.add_argument("--end", type=_parse_date, default=None, help="结束时间（默认当前时间）")
+    parser.add_argument("--days", type=float, default=30, help="未指定--start时回放最近多少天")
+    parser.add_argument("--window", type=_parse_window, action="append", default=None,
+                        help="比较窗口 分钟[:持仓量阈值:价格阈值]，可重复（默认使用监控配置）")
+    parser.add_argument("--oi-threshold", type=float, default=None, help="默认持仓量变化阈值（小数）")
+    parser.add_argument("--price-threshold", type=float, default=None, help="默认价格变化阈值（小数）")
+    parser.add_argument("--interval-minutes", type=float, default=None,
+                        help="数据的周期间隔（分钟，默认使用监控间隔；回填的5分钟数据可以配合5分钟窗口）")
+    parser.add_argument("--cooldown-minutes", type=float, default=ALERT_COOLDOWN_SECONDS / 60, help="警报冷却期（分钟）")
+    parser.add_argument("--adaptive", action="store_true", help="使用z分数自适应阈值")
+    parser.add_argument("--no-baseline-fallback", action="store_true",
+                        help="比较时间点附近没有记录时不回退到更早的记录（对应baseline_fallback=False）")
+    parser.add_argument("--z-oi", type=float, default=None, help="持仓量z分数阈值")
+    parser.add_argument("--z-price", type=float, default=None, help="价格z分数阈值")
+    parser.add_argument("--output", default=None, help="把警报列表写入CSV文件")
+    args = parser.parse_args()
+
+    config = MonitoringConfig()
+    overrides: Dict[str, Any] = {'adaptive_thresholds': args.adaptive,
+                                 'baseline_fallback': not args.no_baseline_fallback}
+    if args.interval_minutes is not None:
+        overrides['monitor_interval_minutes'] = args.interval_minutes
+    if args.window:
+        overrides['change_windows'] = tuple(args.window)
+        minutes = [window[0] for window in args.window]
+        if config.change_rate_window_minutes not in minutes:
+            overrides['change_rate_window_minutes'] = minutes[0]
+    for name, value in (('oi_change_threshold', args.oi_threshold), ('price_change_threshold', args.price_threshold),
+                        ('zscore_oi_threshold', args.z_oi), ('zscore_price_threshold', args.z_price)):
+        if value is not None:
+            overrides[name] = value
+    config = replace(config, **overrides)
+
+    engine = ReplayEngine(config, cooldown_seconds=args.cooldown_minutes * 60)
+    end = args.end or datetime.now(UTC8)
+    start = args.start or end - timedelta(days=args.days)
+    start_ms = int(start.timestamp() * 1000)
+    end_ms = int(end.timestamp() * 1000)
+
+    db = DatabaseManager(db_path=args.db, storage_layout=args.layout)
+    try:
+        load_start = time.time()
+        columns = load_oi_columns(db, start_ms - engine.lookback_ms, end_ms)
+        load_duration = time.time() - load_start
+    finally:
+        db.shutdown()
+
+    result = engine.run(columns, start_ms=start_ms)
+    stats = result.stats
+
+    print(f"回放 {start.isoformat()} - {end.isoformat()}: {stats['symbols']} 个交易对, "
+          f"{stats['cycles']:,} 个周期, {stats['rows']:,} 行")
+    print(f"读取 {len(columns):,} 行耗时 {load_duration:.2f}秒, 评估耗时 {stats['duration']:.2f}秒 "
+          f"({stats['rows_per_second']:,} 行/秒)")
+    print("比较窗口: " + ", ".join(
+        f"{format_window(minutes)}(持仓量 {oi_threshold:.1%}, 价格 {price_threshold:.1%})"
+        for minutes, oi_threshold, price_threshold in engine.change_windows
+    ) + (f", z分数阈值 持仓量 {config.zscore_oi_threshold} / 价格 {config.zscore_price_threshold}"
+         if config.adaptive_thresholds else ""))
+    print(f"警报 {stats['alerts']:,} 条（满足条件 {stats['candidates']:,} 次, 冷却期内跳过 {stats['suppressed_by_cooldown']:,} 次）")
+    print(f"按级别: {stats['by_level']}")
+    print(f"按窗口: {stats['by_window']}")
+    print("警报最多的交易对: " + ", ".join(f"{symbol}({count})" for symbol, count in stats['top_symbols']))
+
+    if args.output:
+        result.to_csv(args.output)
+        print(f"警报列表已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
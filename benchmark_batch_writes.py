@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+批量写入基准测试 - 对比逐条自动提交写入和周期级批量事务写入的吞吐量
+模拟一个监控周期：每个交易对写入一条持仓量数据（性能指标在内存中汇总，不逐条写入）
+另外检查异步写入模式下每个周期的批次仍在一个事务中提交
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from database_manager import DatabaseManager, get_utc8_time
+from oi_storage import STORAGE_LAYOUTS
+
+
+def bench_autocommit(db: DatabaseManager, symbols: int, cycles: int) -> float:
+    """逐条写入（每次调用一个事务）"""
+    start = time.time()
+    for _ in range(cycles):
+        now = get_utc8_time()
+        for i in range(symbols):
+            symbol = f"SYM{i}USDT"
+            db.save_oi_data(symbol, now, 1000.0 + i, 1.0 + i, (1000.0 + i) * (1.0 + i))
+    return time.time() - start
+
+
+def bench_cycle_batch(db: DatabaseManager, symbols: int, cycles: int) -> float:
+    """周期级批量写入（每个周期一个事务）"""
+    start = time.time()
+    for _ in range(cycles):
+        now = get_utc8_time()
+        with db.cycle_batch() as batch:
+            for i in range(symbols):
+                symbol = f"SYM{i}USDT"
+                batch.add_oi_data(symbol, now, 1000.0 + i, 1.0 + i, (1000.0 + i) * (1.0 + i))
+    return time.time() - start
+
+
+def check_write_behind_cycles(db_path: str, layout: str, symbols: int, cycles: int) -> bool:
+    """异步写入模式（批大小小于周期行数）下，每个周期应恰好对应一次写入事务"""
+    db = DatabaseManager(db_path=db_path, storage_layout=layout, write_behind=True,
+                         write_batch_size=max(1, symbols // 4))
+    try:
+        for cycle in range(cycles):
+            batches_before = db.write_queue.get_stats()['batches']
+            bench_cycle_batch(db, symbols, 1)
+            db.flush()
+            batches = db.write_queue.get_stats()['batches'] - batches_before
+            if batches != 1:
+                print(f"异步写入检查失败: 第 {cycle + 1} 个周期拆成了 {batches} 个事务")
+                return False
+        return True
+    finally:
+        db.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量写入基准测试")
+    parser.add_argument("--symbols", type=int, default=500, help="每个周期的交易对数量")
+    parser.add_argument("--cycles", type=int, default=3, help="模拟的周期数")
+    parser.add_argument("--layout", choices=sorted(STORAGE_LAYOUTS), default="standard",
+                        help="持仓量数据存储布局")
+    args = parser.parse_args()
+
+    rows = args.symbols * args.cycles
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = {}
+        for name, bench in (("逐条写入", bench_autocommit), ("批量事务", bench_cycle_batch)):
+            db_path = os.path.join(tmp_dir, f"{bench.__name__}.db")
+            db = DatabaseManager(db_path=db_path, storage_layout=args.layout)
+            duration = bench(db, args.symbols, args.cycles)
+            db.shutdown()
+            results[name] = duration
+            size_kb = os.path.getsize(db_path) / 1024
+            print(f"{name}: {rows} 行, 耗时 {duration:.3f}秒, {rows / duration:,.0f} 行/秒, 文件 {size_kb:,.0f} KB")
+
+        if check_write_behind_cycles(os.path.join(tmp_dir, "write_behind.db"), args.layout,
+                                     args.symbols, args.cycles):
+            print("异步写入检查通过: 每个周期一个事务")
+
+    speedup = results["逐条写入"] / results["批量事务"]
+    print(f"批量事务提速: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,7 +16,7 @@ def check_change_rates():
     # 获取AAVE最近的两条记录
     cursor.execute('''
         SELECT timestamp, open_interest, price
-        FROM oi_history
+        FROM oi_history_readable
         WHERE symbol = 'AAVEUSDT'
         ORDER BY timestamp DESC
         LIMIT 2
@@ -59,11 +59,11 @@ def check_change_rates():
 
         cursor.execute('''
             SELECT symbol,
-                   (SELECT open_interest FROM oi_history h2 WHERE h2.symbol = h1.symbol ORDER BY timestamp DESC LIMIT 1) as latest_oi,
-                   (SELECT open_interest FROM oi_history h3 WHERE h3.symbol = h1.symbol ORDER BY timestamp DESC LIMIT 1 OFFSET 1) as prev_oi,
-                   (SELECT price FROM oi_history h4 WHERE h4.symbol = h1.symbol ORDER BY timestamp DESC LIMIT 1) as latest_price,
-                   (SELECT price FROM oi_history h5 WHERE h5.symbol = h1.symbol ORDER BY timestamp DESC LIMIT 1 OFFSET 1) as prev_price
-            FROM (SELECT DISTINCT symbol FROM oi_history WHERE timestamp > datetime('now', '-2 hours')) h1
+                   (SELECT open_interest FROM oi_history_readable h2 WHERE h2.symbol = h1.symbol ORDER BY ts DESC LIMIT 1) as latest_oi,
+                   (SELECT open_interest FROM oi_history_readable h3 WHERE h3.symbol = h1.symbol ORDER BY ts DESC LIMIT 1 OFFSET 1) as prev_oi,
+                   (SELECT price FROM oi_history_readable h4 WHERE h4.symbol = h1.symbol ORDER BY ts DESC LIMIT 1) as latest_price,
+                   (SELECT price FROM oi_history_readable h5 WHERE h5.symbol = h1.symbol ORDER BY ts DESC LIMIT 1 OFFSET 1) as prev_price
+            FROM (SELECT DISTINCT symbol FROM oi_history_readable WHERE ts > (strftime('%s', 'now') - 7200) * 1000) h1
             HAVING latest_oi IS NOT NULL AND prev_oi IS NOT NULL AND latest_price IS NOT NULL AND prev_price IS NOT NULL
             LIMIT 10
         ''')
@@ -6,12 +6,22 @@ SQLite数据库管理器 - 高性能数据存储和清理
 
 import sqlite3
 import logging
+import queue
+import threading
+import time
 from contextlib import contextmanager
+from functools import partial
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterable, Iterator
 import os
 import pytz
 
+from metrics import DEFAULT_PERCENTILES, MetricsRegistry
+from oi_storage import create_layout
+from retention import RETENTION_RESULT_KEYS, RetentionEngine
+from rollup import RAW_TIER, ROLLUP_TIERS, RollupManager
+from write_behind import WriteBehindQueue
+
 # 时区设置
 UTC8 = pytz.timezone('Asia/Shanghai')
 
@@ -25,26 +35,453 @@ def convert_to_utc8(dt):
         dt = pytz.utc.localize(dt)
     return dt.astimezone(UTC8)
 
+def to_epoch_ms(dt: datetime) -> int:
+    """将时间转换为UTC毫秒时间戳（无时区信息的时间按UTC+8处理）"""
+    if dt.tzinfo is None:
+        dt = UTC8.localize(dt)
+    return int(round(dt.timestamp() * 1000))
+
+def from_epoch_ms(ts: int) -> datetime:
+    """将UTC毫秒时间戳转换为UTC+8时间"""
+    return datetime.fromtimestamp(ts / 1000.0, UTC8)
+
+def epoch_ms_to_iso(ts: Optional[int]) -> Optional[str]:
+    """将UTC毫秒时间戳转换为UTC+8的ISO-8601字符串"""
+    return from_epoch_ms(ts).isoformat() if ts is not None else None
+
+def now_epoch_ms() -> int:
+    """当前UTC毫秒时间戳"""
+    return to_epoch_ms(get_utc8_time())
+
 logger = logging.getLogger(__name__)
 
+# 数据库结构版本（PRAGMA user_version）
+# 1: 时间列为UTC+8 ISO-8601文本
+# 2: 时间列为UTC毫秒整数（ts / alert_ts），并提供可读视图
+SCHEMA_VERSION = 2
+
+# 时间戳为整数的表结构，{name}用于迁移时创建临时表
+TABLE_SCHEMAS = {
+    # 监控数据表 - 存储持仓量和价格历史
+    'oi_history': '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            open_interest REAL NOT NULL,
+            price REAL NOT NULL,
+            value_usdt REAL,
+            price_change REAL DEFAULT 0.0,
+            oi_change REAL DEFAULT 0.0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # 警报记录表 - 存储触发的警报
+    'alerts': '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT NOT NULL,
+            oi_change_percent REAL NOT NULL,
+            price_change_percent REAL NOT NULL,
+            current_oi REAL NOT NULL,
+            old_oi REAL NOT NULL,
+            current_price REAL NOT NULL,
+            old_price REAL NOT NULL,
+            total_value_usdt REAL,
+            alert_ts INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # 性能指标表 - 存储监控性能数据
+    'performance_metrics': '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            metric_name TEXT NOT NULL,
+            metric_value REAL NOT NULL,
+            symbol TEXT,
+            ts INTEGER NOT NULL
+        )
+    ''',
+    # 指标汇总表 - 每个刷新间隔每个指标一行（ts为间隔开始时间）
+    'metric_aggregates': '''
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            metric_name TEXT NOT NULL,
+            metric_type TEXT NOT NULL,
+            symbol TEXT,
+            ts INTEGER NOT NULL,
+            interval_ms INTEGER NOT NULL,
+            sample_count INTEGER NOT NULL,
+            value REAL NOT NULL,
+            sum_value REAL NOT NULL,
+            min_value REAL,
+            max_value REAL,
+            summary TEXT
+        )
+    ''',
+}
+
+# 时间戳迁移：表名 -> (旧文本时间列, 新整数时间列, 其余列)
+TIMESTAMP_MIGRATIONS = {
+    'oi_history': ('timestamp', 'ts',
+                   ['id', 'symbol', 'open_interest', 'price', 'value_usdt',
+                    'price_change', 'oi_change', 'created_at']),
+    'alerts': ('alert_time', 'alert_ts',
+               ['id', 'symbol', 'oi_change_percent', 'price_change_percent', 'current_oi',
+                'old_oi', 'current_price', 'old_price', 'total_value_usdt', 'created_at']),
+    'performance_metrics': ('timestamp', 'ts',
+                            ['id', 'metric_name', 'metric_value', 'symbol']),
+}
+
+# 将ISO-8601文本转换为UTC毫秒（带时区后缀的按其时区解析，否则与to_epoch_ms一致按UTC+8处理；无法解析时为NULL）
+_ISO_TO_EPOCH_MS_SQL = (
+    "CAST(ROUND((CASE WHEN {column} GLOB '*[+-][0-9][0-9]:[0-9][0-9]' OR {column} GLOB '*[Zz]' "
+    "THEN julianday({column}) ELSE julianday({column}, '-8 hours') END - 2440587.5) * 86400000.0) AS INTEGER)"
+)
+
+# 将UTC毫秒转换为UTC+8的ISO-8601文本，供可读视图使用
+_EPOCH_MS_TO_ISO_SQL = "strftime('%Y-%m-%dT%H:%M:%f', {column} / 1000.0, 'unixepoch', '+8 hours') || '+08:00'"
+
+# 持仓量数据的可读视图，SELECT语句由存储布局提供
+OI_READABLE_VIEW = 'oi_history_readable'
+
+# 可读视图：保留旧的文本时间列名和列顺序，供诊断脚本和DB Browser使用
+READABLE_VIEWS = {
+    'alerts_readable': f'''
+        SELECT id, symbol, oi_change_percent, price_change_percent, current_oi, old_oi,
+               current_price, old_price, total_value_usdt,
+               {_EPOCH_MS_TO_ISO_SQL.format(column='alert_ts')} AS alert_time, created_at, alert_ts
+        FROM alerts
+    ''',
+    'performance_metrics_readable': f'''
+        SELECT id, metric_name, metric_value, symbol,
+               {_EPOCH_MS_TO_ISO_SQL.format(column='ts')} AS timestamp, ts
+        FROM performance_metrics
+    ''',
+    'metric_aggregates_readable': f'''
+        SELECT id, metric_name, metric_type, symbol,
+               {_EPOCH_MS_TO_ISO_SQL.format(column='ts')} AS interval_start, interval_ms / 1000.0 AS interval_seconds,
+               sample_count, value, sum_value, min_value, max_value, summary, ts
+        FROM metric_aggregates
+    ''',
+}
+
+# 各表的插入语句（单条写入和批量写入共用）
+INSERT_SQL = {
+    'oi_history': """INSERT INTO oi_history
+        (symbol, ts, open_interest, price, value_usdt, price_change, oi_change)
+        VALUES (?, ?, ?, ?, ?, ?, ?)""",
+    'performance_metrics': """INSERT INTO performance_metrics
+        (metric_name, metric_value, symbol, ts)
+        VALUES (?, ?, ?, ?)""",
+    'metric_aggregates': """INSERT INTO metric_aggregates
+        (metric_name, metric_type, symbol, ts, interval_ms, sample_count,
+         value, sum_value, min_value, max_value, summary)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    'alerts': """INSERT INTO alerts
+        (symbol, oi_change_percent, price_change_percent, current_oi, old_oi,
+         current_price, old_price, total_value_usdt, alert_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    'error_logs': """INSERT INTO error_logs
+        (error_type, error_message, symbol, context, error_time)
+        VALUES (?, ?, ?, ?, ?)""",
+}
+
+# 分块删除过期数据（持仓量数据由存储布局删除），参数为(截止时间, 最多删除行数)
+RETENTION_DELETE_SQL = {
+    'alerts': """DELETE FROM alerts WHERE id IN
+        (SELECT id FROM alerts WHERE alert_ts < ? ORDER BY alert_ts LIMIT ?)""",
+    'error_logs': """DELETE FROM error_logs WHERE id IN
+        (SELECT id FROM error_logs WHERE error_time < ? ORDER BY error_time LIMIT ?)""",
+    'performance_metrics': """DELETE FROM performance_metrics WHERE id IN
+        (SELECT id FROM performance_metrics WHERE ts < ? ORDER BY ts LIMIT ?)""",
+    'metric_aggregates': """DELETE FROM metric_aggregates WHERE id IN
+        (SELECT id FROM metric_aggregates WHERE ts < ? ORDER BY ts LIMIT ?)""",
+    **{
+        tier.table: f"""DELETE FROM {tier.table} WHERE (symbol, bucket) IN
+            (SELECT symbol, bucket FROM {tier.table} WHERE bucket < ? ORDER BY bucket LIMIT ?)"""
+        for tier in ROLLUP_TIERS
+    },
+}
+
+# 由table_stats维护行数和最新时间的表：统计名 -> 整数时间列（None表示只维护行数）
+TABLE_STATS_COLUMNS = {
+    'oi_history': 'ts',
+    'alerts': 'alert_ts',
+    'error_logs': None,
+    'performance_metrics': 'ts',
+    'metric_aggregates': 'ts',
+}
+
+def _stats_trigger_sql(table: str, stats_name: str, time_column: Optional[str]) -> List[str]:
+    """生成维护table_stats的插入和删除触发器（每行一次小表更新）"""
+    latest = ''
+    if time_column:
+        latest = f", latest_ts = MAX(COALESCE(latest_ts, NEW.{time_column}), NEW.{time_column})"
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_insert AFTER INSERT ON {table}
+        BEGIN
+            UPDATE table_stats SET row_count = row_count + 1{latest} WHERE name = '{stats_name}';
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_delete AFTER DELETE ON {table}
+        BEGIN
+            UPDATE table_stats SET row_count = row_count - 1 WHERE name = '{stats_name}';
+        END""",
+    ]
+
+def _chunked(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    """把行序列切成最多size行的列表"""
+    chunk: List[tuple] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _oi_row(symbol: str, timestamp: datetime, open_interest: float, price: float,
+            value_usdt: Optional[float] = None, price_change: Optional[float] = None,
+            oi_change: Optional[float] = None) -> tuple:
+    """构造oi_history插入参数"""
+    return (symbol, to_epoch_ms(timestamp), open_interest, price, value_usdt,
+            price_change if price_change is not None else 0.0,
+            oi_change if oi_change is not None else 0.0)
+
+def _metric_row(metric_name: str, metric_value: float, symbol: Optional[str] = None) -> tuple:
+    """构造performance_metrics插入参数"""
+    return (metric_name, metric_value, symbol, now_epoch_ms())
+
+class WriteBatch:
+    """批量写入缓冲 - 收集一个监控周期内的所有写入，在一个事务中提交"""
+
+    def __init__(self):
+        self.rows: Dict[str, List[tuple]] = {table: [] for table in INSERT_SQL}
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self.rows.values())
+
+    def add_oi_data(self, symbol: str, timestamp: datetime, open_interest: float,
+                    price: float, value_usdt: Optional[float] = None,
+                    price_change: Optional[float] = None, oi_change: Optional[float] = None):
+        """添加一条持仓量数据，参数同DatabaseManager.save_oi_data"""
+        self.rows['oi_history'].append(
+            _oi_row(symbol, timestamp, open_interest, price, value_usdt, price_change, oi_change)
+        )
+
+    def add_metric(self, metric_name: str, metric_value: float, symbol: Optional[str] = None):
+        """添加一条性能指标，参数同DatabaseManager.record_metric"""
+        self.rows['performance_metrics'].append(_metric_row(metric_name, metric_value, symbol))
+
+class SQLiteConnectionPool:
+    """SQLite连接池 - 一个专用写连接和若干只读连接
+
+    每个连接只在创建时执行一次PRAGMA设置。SQLite同一时刻只允许一个写事务，
+    因此所有写操作共享同一个写连接（由锁串行化），读操作从读连接池中借出。
+    """
+
+    def __init__(self, db_path: str, max_readers: int = 4, checkout_timeout: float = 30.0):
+        """
+        初始化连接池
+
+        Args:
+            db_path: 数据库文件路径
+            max_readers: 最大只读连接数
+            checkout_timeout: 借出连接的等待超时（秒）
+        """
+        self.db_path = db_path
+        self.max_readers = max(1, max_readers)
+        self.checkout_timeout = checkout_timeout
+
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._readers: queue.LifoQueue = queue.LifoQueue()
+        self._readers_created = 0
+        self._readers_lock = threading.Lock()
+        self._closed = False
+
+        # 使用统计
+        self.stats = {
+            'connections_created': 0,
+            'writer_checkouts': 0,
+            'reader_checkouts': 0,
+            'checkout_waits': 0,
+            'checkout_timeouts': 0,
+            'total_wait_time': 0.0
+        }
+
+    def _create_connection(self, readonly: bool = False) -> sqlite3.Connection:
+        """创建新连接并执行一次性PRAGMA设置"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=30.0,  # 30秒超时
+            isolation_level=None,  # 自动提交模式
+            check_same_thread=False  # 允许多线程访问
+        )
+        conn.row_factory = sqlite3.Row  # 允许以字典方式访问行
+        if not readonly:
+            # 必须在设置日志模式之前执行，新数据库才会以增量回收模式创建
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # INSERT OR REPLACE替换旧行时也触发删除触发器，table_stats计数才准确
+            conn.execute("PRAGMA recursive_triggers=ON")
+        # 始终使用WAL模式：读写互不阻塞；DB Browser等工具应打开SnapshotExporter导出的快照
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # 平衡性能和安全性
+        conn.execute("PRAGMA cache_size=-10000")  # 10MB缓存
+        conn.execute("PRAGMA temp_store=memory")  # 临时表存储在内存中
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")  # 防止误用读连接写入
+
+        self.stats['connections_created'] += 1
+        return conn
+
+    def _record_wait(self, wait_start: float):
+        """记录等待时间"""
+        waited = time.time() - wait_start
+        if waited > 0.001:
+            self.stats['checkout_waits'] += 1
+            self.stats['total_wait_time'] += waited
+
+    @contextmanager
+    def writer(self):
+        """借出写连接（同一时刻只有一个持有者）"""
+        wait_start = time.time()
+        if not self._writer_lock.acquire(timeout=self.checkout_timeout):
+            self.stats['checkout_timeouts'] += 1
+            raise TimeoutError(f"获取数据库写连接超时（{self.checkout_timeout}秒）")
+
+        try:
+            self._record_wait(wait_start)
+            if self._closed:
+                raise sqlite3.ProgrammingError("连接池已关闭")
+            if self._writer is None:
+                self._writer = self._create_connection()
+            self.stats['writer_checkouts'] += 1
+            yield self._writer
+        finally:
+            self._writer_lock.release()
+
+    @contextmanager
+    def reader(self):
+        """借出只读连接"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("连接池已关闭")
+
+        conn = None
+        wait_start = time.time()
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._readers_lock:
+                if self._readers_created < self.max_readers:
+                    self._readers_created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._create_connection(readonly=True)
+                except Exception:
+                    with self._readers_lock:
+                        self._readers_created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._readers.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    self.stats['checkout_timeouts'] += 1
+                    raise TimeoutError(f"获取数据库读连接超时（{self.checkout_timeout}秒）")
+
+        self._record_wait(wait_start)
+        self.stats['reader_checkouts'] += 1
+        try:
+            yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._readers.put(conn)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池使用统计"""
+        stats = dict(self.stats)
+        stats['total_wait_time'] = round(stats['total_wait_time'], 3)
+        stats['readers_open'] = self._readers_created
+        stats['readers_idle'] = self._readers.qsize()
+        stats['max_readers'] = self.max_readers
+        return stats
+
+    def close(self):
+        """关闭所有连接"""
+        self._closed = True
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
 class DatabaseManager:
     """SQLite数据库管理器"""
 
-    def __init__(self, db_path: str = "binance_monitor.db", max_connections: int = 5, use_wal: bool = True):
+    def __init__(self, db_path: str = "binance_monitor.db", max_connections: int = 5, use_wal: bool = True,
+                 write_behind: bool = False, write_queue_size: int = 10000,
+                 write_batch_size: int = 500, write_flush_interval: float = 1.0,
+                 storage_layout: str = 'standard',
+                 tier_retention_days: Optional[Dict[str, Optional[int]]] = None,
+                 metrics_flush_interval: float = 60.0, metrics_percentiles=DEFAULT_PERCENTILES,
+                 vacuum_on_startup: bool = False):
         """
         初始化数据库管理器
 
         Args:
             db_path: 数据库文件路径
-            max_connections: 最大连接数
-            use_wal: 是否使用WAL模式（默认True，设为False以便DB Browser查看）
+            max_connections: 最大连接数（一个写连接，其余为只读连接）
+            use_wal: 已废弃，数据库始终使用WAL模式（查看数据请使用snapshot.SnapshotExporter导出的快照）
+            write_behind: 是否启用异步写入（写入先进入队列，由写线程批量提交）
+            write_queue_size: 异步写入队列最大长度
+            write_batch_size: 异步写入每批最多记录数
+            write_flush_interval: 异步写入最长刷新间隔（秒）
+            storage_layout: 持仓量数据存储布局（standard: 完整列的oi_history表;
+                            compact: 按(symbol_id, ts)聚簇的紧凑表;
+                            partitioned: 按天分区的紧凑表，过期分区整张删除）
+            tier_retention_days: 原始数据和各级汇总的保留天数（None表示永久保留），
+                                 用于为时间范围查询选择层级
+            metrics_flush_interval: 指标汇总写入间隔（秒）
+            metrics_percentiles: 直方图指标写入的百分位数
+            vacuum_on_startup: 已有数据库尚未启用增量空间回收时，启动时执行一次完整VACUUM切换
+                               （时间戳迁移后总会执行，无需设置）
         """
         self.db_path = db_path
+        self.vacuum_on_startup = vacuum_on_startup
         self.max_connections = max_connections
-        self.use_wal = use_wal
+        if not use_wal:
+            logger.warning("use_wal=False已废弃，数据库始终使用WAL模式；DB Browser请打开快照文件")
+        self.oi_storage = create_layout(storage_layout)
+        self.rollups = RollupManager(self)
+        self.tier_retention_days = {RAW_TIER: 30, '1h': 180, '1d': None}
+        self.tier_retention_days.update(tier_retention_days or {})
+        self.metrics = MetricsRegistry(flush_interval=metrics_flush_interval, percentiles=metrics_percentiles)
         self._ensure_db_directory()
+        self.pool = SQLiteConnectionPool(
+            db_path,
+            max_readers=max(1, max_connections - 1)
+        )
         self.init_database()
 
+        self.write_queue: Optional[WriteBehindQueue] = None
+        if write_behind:
+            self.write_queue = WriteBehindQueue(
+                partial(self.write_rows, raise_errors=True),
+                max_queue_size=write_queue_size,
+                batch_size=write_batch_size,
+                flush_interval=write_flush_interval
+            )
+            self.write_queue.start()
+
     def _ensure_db_directory(self):
         """确保数据库目录存在"""
         db_dir = os.path.dirname(self.db_path)
@@ -53,71 +490,80 @@ class DatabaseManager:
             logger.info(f"创建数据库目录: {db_dir}")
 
     @contextmanager
-    def get_connection(self):
-        """获取数据库连接上下文管理器"""
-        conn = None
-        try:
-            conn = sqlite3.connect(
-                self.db_path,
-                timeout=30.0,  # 30秒超时
-                isolation_level=None,  # 自动提交模式
-                check_same_thread=False  # 允许多线程访问
-            )
-            conn.row_factory = sqlite3.Row  # 允许以字典方式访问行
-            if self.use_wal:
-                conn.execute("PRAGMA journal_mode=WAL")  # 启用WAL模式提高并发性能
-            else:
-                conn.execute("PRAGMA journal_mode=DELETE")  # 使用传统日志模式，便于DB Browser查看
-            conn.execute("PRAGMA synchronous=NORMAL")  # 平衡性能和安全性
-            conn.execute("PRAGMA cache_size=-10000")  # 10MB缓存
-            conn.execute("PRAGMA temp_store=memory")  # 临时表存储在内存中
-            yield conn
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            logger.error(f"数据库连接错误: {e}")
-            raise
-        finally:
-            if conn:
-                conn.close()
+    def get_connection(self, readonly: bool = False):
+        """
+        从连接池获取数据库连接上下文管理器
 
-    def init_database(self):
-        """初始化数据库表结构和索引"""
+        Args:
+            readonly: 是否只需要读连接
+        """
+        checkout = self.pool.reader() if readonly else self.pool.writer()
+        with checkout as conn:
+            try:
+                yield conn
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                logger.error(f"数据库连接错误: {e}")
+                raise
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池和异步写入队列的使用统计"""
+        stats = self.pool.get_stats()
+        if self.write_queue:
+            stats['write_queue'] = self.write_queue.get_stats()
+        return stats
+
+    def flush(self):
+        """等待异步写入队列中的记录全部写入"""
+        if self.write_queue:
+            self.write_queue.flush()
+
+    def shutdown(self):
+        """写入未刷新的指标和队列中剩余的全部记录后关闭所有连接"""
+        self.flush_metrics(force=True)
+        if self.write_queue:
+            self.write_queue.shutdown()
+        self.pool.close()
+
+    def _insert(self, table: str, row: tuple) -> bool:
+        """写入一行：启用异步写入时入队，否则立即写入"""
+        if self.write_queue:
+            return self.write_queue.put(table, row)
+
+        with self.get_connection() as conn:
+            try:
+                self._execute_rows(conn.cursor(), table, [row])
+            except Exception:
+                self.oi_storage.reset()
+                raise
+        return True
+
+    def _execute_rows(self, cursor, table: str, rows: List[tuple]):
+        """执行插入，持仓量数据交给存储布局写入"""
+        if table == 'oi_history':
+            self.oi_storage.insert_rows(cursor, rows)
+            if self.oi_storage.stats_table is None:
+                self._bump_table_stats(cursor, 'oi_history', len(rows), max(row[1] for row in rows))
+        else:
+            cursor.executemany(INSERT_SQL[table], rows)
+
+    def init_database(self, migration_chunk_size: int = 50000):
+        """
+        初始化数据库表结构和索引，必要时把旧的文本时间戳迁移为整数时间戳
+
+        Args:
+            migration_chunk_size: 迁移时每个事务复制的行数
+        """
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
+                vacuum_pending = self._enable_incremental_vacuum(cursor)
+                cursor.execute("PRAGMA user_version")
+                upgrading = cursor.fetchone()[0] < SCHEMA_VERSION
 
-                # 创建监控数据表 - 存储持仓量和价格历史
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS oi_history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        symbol TEXT NOT NULL,
-                        timestamp DATETIME NOT NULL,
-                        open_interest REAL NOT NULL,
-                        price REAL NOT NULL,
-                        value_usdt REAL,
-                        price_change REAL DEFAULT 0.0,
-                        oi_change REAL DEFAULT 0.0,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-
-                # 创建警报记录表 - 存储触发的警报
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS alerts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        symbol TEXT NOT NULL,
-                        oi_change_percent REAL NOT NULL,
-                        price_change_percent REAL NOT NULL,
-                        current_oi REAL NOT NULL,
-                        old_oi REAL NOT NULL,
-                        current_price REAL NOT NULL,
-                        old_price REAL NOT NULL,
-                        total_value_usdt REAL,
-                        alert_time DATETIME NOT NULL,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+                for table, schema in TABLE_SCHEMAS.items():
+                    cursor.execute(schema.format(name=table))
 
                 # 创建系统状态表 - 存储系统运行状态
                 cursor.execute('''
@@ -144,42 +590,289 @@ class DatabaseManager:
                     )
                 ''')
 
-                # 创建性能指标表 - 存储监控性能数据
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS performance_metrics (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        metric_name TEXT NOT NULL,
-                        metric_value REAL NOT NULL,
-                        symbol TEXT,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+            # 旧版本数据库：分块迁移时间戳（可中断后继续）
+            self.migrate_timestamps(chunk_size=migration_chunk_size)
+
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                self.oi_storage.create_schema(cursor)
+                self.rollups.create_schema(cursor)
+
+            # 切换到紧凑或分区布局时，把oi_history中已有的数据分块移入新布局
+            moved = 0
+            if hasattr(self.oi_storage, 'import_standard'):
+                moved = self._import_standard_history(migration_chunk_size)
+
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
 
                 # 创建索引以提高查询性能
                 self._create_indexes(cursor)
+                self._create_views(cursor)
+                stats_created = self._create_table_stats(cursor)
+                cursor.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
 
                 logger.info("数据库表结构初始化完成")
 
+            # 首次创建统计表或迁移了布局时，按实际数据校正一次
+            if stats_created or moved:
+                self.reconcile_table_stats()
+
+            # 迁移后旧表空间已释放，顺带执行一次VACUUM切换到增量回收
+            if vacuum_pending and (upgrading or self.vacuum_on_startup):
+                self._vacuum_to_incremental()
+
         except Exception as e:
             logger.error(f"数据库初始化失败: {e}")
             raise
 
+    def _enable_incremental_vacuum(self, cursor) -> bool:
+        """
+        启用增量空间回收（auto_vacuum=INCREMENTAL）
+
+        Returns:
+            bool: 是否还需要一次完整VACUUM才能生效
+        """
+        # 新数据库在写连接创建时已经切换；已有数据的数据库需要一次完整VACUUM才能切换
+        cursor.execute("PRAGMA auto_vacuum")
+        if cursor.fetchone()[0] == 2:
+            return False
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        if not self.vacuum_on_startup:
+            logger.info("数据库尚未启用增量空间回收，将在时间戳迁移、vacuum_on_startup或optimize_database执行VACUUM后生效")
+        return True
+
+    def _vacuum_to_incremental(self) -> bool:
+        """执行一次完整VACUUM，使auto_vacuum=INCREMENTAL对已有数据库生效"""
+        try:
+            size_before = os.path.getsize(self.db_path)
+            start_time = time.time()
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                cursor.execute("VACUUM")
+                cursor.execute("PRAGMA auto_vacuum")
+                mode = cursor.fetchone()[0]
+            size_after = os.path.getsize(self.db_path)
+            if mode == 2:
+                logger.info(f"已切换到增量空间回收: VACUUM耗时 {time.time() - start_time:.1f} 秒, "
+                            f"数据库 {size_before / 1024 / 1024:.1f}MB -> {size_after / 1024 / 1024:.1f}MB")
+                return True
+            logger.warning(f"VACUUM完成但auto_vacuum仍为 {mode}，增量空间回收未生效")
+            return False
+        except Exception as e:
+            logger.error(f"切换增量空间回收失败: {e}")
+            return False
+
     def _create_indexes(self, cursor):
         """创建数据库索引"""
-        # 主表索引
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_oi_symbol_timestamp ON oi_history(symbol, timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_oi_timestamp ON oi_history(timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_time ON alerts(alert_time)')
+        # 主表索引（持仓量数据的索引由存储布局创建）
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts(alert_ts)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_symbol ON alerts(symbol)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_error_time ON error_logs(error_time)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_performance_time ON performance_metrics(timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_performance_ts ON performance_metrics(ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_metric_aggregates_ts ON metric_aggregates(ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_metric_aggregates_name_ts ON metric_aggregates(metric_name, ts)')
 
         # 复合索引
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_oi_symbol_created ON oi_history(symbol, created_at)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_symbol_time ON alerts(symbol, alert_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alerts_symbol_ts ON alerts(symbol, alert_ts)')
 
         logger.info("数据库索引创建完成")
 
+    def _create_views(self, cursor):
+        """创建带可读时间列的视图"""
+        views = dict(READABLE_VIEWS)
+        views[OI_READABLE_VIEW] = self.oi_storage.readable_view(_EPOCH_MS_TO_ISO_SQL)
+        for view, select_sql in views.items():
+            cursor.execute(f"DROP VIEW IF EXISTS {view}")
+            cursor.execute(f"CREATE VIEW {view} AS {select_sql}")
+
+    def _import_standard_history(self, chunk_size: int):
+        """把oi_history中的数据移动到当前存储布局（每块一个事务，中断后可继续）"""
+        total = 0
+        while True:
+            with self.get_connection() as conn:
+                moved = self.oi_storage.import_standard(conn.cursor(), chunk_size)
+            if moved <= 0:
+                break
+            total += moved
+            logger.info(f"oi_history 数据迁移到{self.oi_storage.name}布局: 已移动 {total} 行")
+        return total
+
+    def _create_table_stats(self, cursor) -> bool:
+        """
+        创建table_stats表和维护它的触发器
+
+        Returns:
+            bool: 是否有统计行是新建的（需要校正）
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS table_stats (
+                name TEXT PRIMARY KEY,
+                row_count INTEGER NOT NULL DEFAULT 0,
+                latest_ts INTEGER,
+                reconciled_at INTEGER
+            ) WITHOUT ROWID
+        ''')
+        created = False
+        for name in TABLE_STATS_COLUMNS:
+            cursor.execute("INSERT OR IGNORE INTO table_stats (name) VALUES (?)", (name,))
+            created = created or cursor.rowcount > 0
+
+        # oi_history表在所有布局下都安装触发器（布局迁移时从中删除的行同样计入）
+        triggers = {'oi_history': 'oi_history'}
+        if self.oi_storage.stats_table:
+            triggers[self.oi_storage.stats_table] = 'oi_history'
+        triggers.update({name: name for name in TABLE_STATS_COLUMNS if name != 'oi_history'})
+        for table, stats_name in triggers.items():
+            for sql in _stats_trigger_sql(table, stats_name, TABLE_STATS_COLUMNS[stats_name]):
+                cursor.execute(sql)
+        return created
+
+    def _bump_table_stats(self, cursor, name: str, delta: int, latest_ts: Optional[int] = None):
+        """没有触发器的表（分区布局）在写入和删除时更新table_stats"""
+        cursor.execute(
+            """UPDATE table_stats SET row_count = row_count + ?,
+                latest_ts = MAX(COALESCE(latest_ts, ?), COALESCE(?, latest_ts))
+            WHERE name = ?""",
+            (delta, latest_ts, latest_ts, name)
+        )
+
+    def reconcile_table_stats(self) -> Dict[str, int]:
+        """
+        按实际数据重新计算table_stats（全表计数，应低频执行）
+
+        触发器维护的行数在正常写入和删除时是准确的，校正用于修复
+        删除最新记录、手工修改数据或旧版本写入等造成的偏差。
+
+        Returns:
+            Dict[str, int]: 各表校正前后的行数差（记录值 - 实际值）
+        """
+        drift = {}
+        for name, time_column in TABLE_STATS_COLUMNS.items():
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    if name == 'oi_history':
+                        if hasattr(self.oi_storage, 'recount'):
+                            self.oi_storage.recount(cursor)
+                        count = self.oi_storage.count(cursor)
+                        latest = self.oi_storage.latest_ts(cursor)
+                    else:
+                        cursor.execute(f"SELECT COUNT(*) AS count FROM {name}")
+                        count = cursor.fetchone()['count']
+                        latest = None
+                        if time_column:
+                            cursor.execute(f"SELECT MAX({time_column}) AS latest FROM {name}")
+                            latest = cursor.fetchone()['latest']
+
+                    cursor.execute("SELECT row_count FROM table_stats WHERE name = ?", (name,))
+                    drift[name] = cursor.fetchone()['row_count'] - count
+                    cursor.execute(
+                        "UPDATE table_stats SET row_count = ?, latest_ts = ?, reconciled_at = ? WHERE name = ?",
+                        (count, latest, now_epoch_ms(), name)
+                    )
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+
+        if any(drift.values()):
+            logger.warning(f"表统计校正发现偏差: {drift}")
+        else:
+            logger.debug("表统计校正完成，无偏差")
+        return drift
+
+    def _table_columns(self, cursor, table: str) -> List[str]:
+        """获取表的列名"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [row['name'] for row in cursor.fetchall()]
+
+    def migrate_timestamps(self, chunk_size: int = 50000, max_chunks: Optional[int] = None) -> bool:
+        """
+        把旧版本的文本时间戳迁移为UTC毫秒整数
+
+        数据按id分块复制到新表，每块一个事务，不会长时间持有写锁；
+        中断后再次调用会从新表中已复制的最大id继续。
+        全部复制完成后在一个事务中用新表替换旧表。
+        无法解析的时间戳不会被迁移，原始行保存在{table}_unparsed_timestamps表中并记录警告。
+
+        Args:
+            chunk_size: 每个事务复制的行数
+            max_chunks: 本次调用最多复制的块数（None表示直到完成）
+
+        Returns:
+            bool: 是否已全部迁移完成
+        """
+        chunks_done = 0
+
+        for table, (legacy_column, new_column, columns) in TIMESTAMP_MIGRATIONS.items():
+            new_table = f"{table}_v2"
+            column_list = ", ".join(columns)
+            convert = _ISO_TO_EPOCH_MS_SQL.format(column=legacy_column)
+
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                if legacy_column not in self._table_columns(cursor, table):
+                    continue
+
+                # 视图引用了正在替换的表，迁移完成后由init_database重新创建
+                for view in [*READABLE_VIEWS, OI_READABLE_VIEW]:
+                    cursor.execute(f"DROP VIEW IF EXISTS {view}")
+                cursor.execute(TABLE_SCHEMAS[table].format(name=new_table))
+                cursor.execute(f"SELECT COUNT(*) AS total FROM {table}")
+                total = cursor.fetchone()['total']
+                logger.info(f"开始迁移 {table} 时间戳: 共 {total} 行")
+
+                # 无法解析的时间戳不能写入新表，保留原始行供人工处理（不能当作1970年被保留期清理掉）
+                cursor.execute(f"SELECT COUNT(*) AS unparsed FROM {table} WHERE {convert} IS NULL")
+                unparsed = cursor.fetchone()['unparsed']
+                if unparsed:
+                    rejects_table = f"{table}_unparsed_timestamps"
+                    cursor.execute(
+                        f"CREATE TABLE IF NOT EXISTS {rejects_table} AS SELECT * FROM {table} WHERE {convert} IS NULL"
+                    )
+                    cursor.execute(f"SELECT {legacy_column} AS value FROM {rejects_table} LIMIT 3")
+                    samples = [row['value'] for row in cursor.fetchall()]
+                    logger.warning(
+                        f"{table} 中有 {unparsed} 行时间戳无法解析（例如 {samples}），"
+                        f"不迁移，原始行已保存到 {rejects_table}"
+                    )
+
+            while True:
+                if max_chunks is not None and chunks_done >= max_chunks:
+                    return False
+
+                with self.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("BEGIN IMMEDIATE")
+                    cursor.execute(f"SELECT COALESCE(MAX(id), 0) AS last_id FROM {new_table}")
+                    last_id = cursor.fetchone()['last_id']
+                    cursor.execute(
+                        f"""INSERT INTO {new_table} ({column_list}, {new_column})
+                        SELECT {column_list}, {convert} FROM {table}
+                        WHERE id > ? AND {convert} IS NOT NULL ORDER BY id LIMIT ?""",
+                        (last_id, chunk_size)
+                    )
+                    copied = cursor.rowcount
+                    cursor.execute("COMMIT")
+
+                chunks_done += 1
+                if copied <= 0:
+                    break
+                logger.info(f"{table} 时间戳迁移进度: 本块复制 {copied} 行（id > {last_id}）")
+
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(f"DROP TABLE {table}")
+                cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+                cursor.execute("COMMIT")
+                logger.info(f"{table} 时间戳迁移完成")
+
+        return True
+
     def save_oi_data(self, symbol: str, timestamp: datetime, open_interest: float,
                     price: float, value_usdt: Optional[float] = None,
                     price_change: Optional[float] = None, oi_change: Optional[float] = None) -> bool:
@@ -199,21 +892,71 @@ class DatabaseManager:
             bool: 是否成功保存
         """
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    """INSERT INTO oi_history
-                    (symbol, timestamp, open_interest, price, value_usdt, price_change, oi_change)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                    (symbol, timestamp.isoformat(), open_interest, price, value_usdt,
-                     price_change if price_change is not None else 0.0,
-                     oi_change if oi_change is not None else 0.0)
-                )
-                return True
+            return self._insert(
+                'oi_history',
+                _oi_row(symbol, timestamp, open_interest, price, value_usdt, price_change, oi_change)
+            )
         except Exception as e:
             logger.error(f"保存持仓量数据失败 {symbol}: {e}")
             return False
 
+    def write_rows(self, rows_by_table: Dict[str, List[tuple]], raise_errors: bool = False) -> int:
+        """
+        在单个事务中批量写入多张表
+
+        Args:
+            rows_by_table: 表名到插入参数列表的映射（表名须在INSERT_SQL中）
+            raise_errors: 失败时是否抛出异常（异步写入队列需要据此重试）
+
+        Returns:
+            int: 写入的行数，失败时返回0
+        """
+        total = sum(len(rows) for rows in rows_by_table.values())
+        if total == 0:
+            return 0
+
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN")
+                for table, rows in rows_by_table.items():
+                    if rows:
+                        self._execute_rows(cursor, table, rows)
+                cursor.execute("COMMIT")
+                return total
+        except Exception as e:
+            self.oi_storage.reset()
+            logger.error(f"批量写入失败（{total} 行）: {e}")
+            if raise_errors:
+                raise
+            return 0
+
+    def write_batch(self, batch: WriteBatch) -> int:
+        """提交一个WriteBatch（启用异步写入时作为一个整体入队，仍在同一个事务中提交）"""
+        if self.write_queue:
+            return self.write_queue.put_batch(batch.rows)
+        return self.write_rows(batch.rows)
+
+    @contextmanager
+    def cycle_batch(self):
+        """
+        监控周期级别的批量写入上下文
+
+        用法:
+            with db.cycle_batch() as batch:
+                batch.add_oi_data(...)
+                batch.add_metric(...)
+
+        退出上下文时在一个事务中写入所有数据（周期中途出错时已收集的数据同样会写入）；
+        启用异步写入时整批入队，由写线程在一个事务中提交。
+        """
+        batch = WriteBatch()
+        try:
+            yield batch
+        finally:
+            written = self.write_batch(batch)
+            logger.debug(f"周期批量写入完成: {written} 行")
+
     def get_recent_oi_data(self, symbol: str, minutes: int = 15) -> List[Dict[str, Any]]:
         """
         获取最近指定分钟数的持仓量数据，优化版确保有足够对比数据
@@ -225,20 +968,22 @@ class DatabaseManager:
         Returns:
             List[Dict]: 历史数据列表，按时间升序排列
         """
+        source = self.oi_storage.source
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(readonly=True) as conn:
                 cursor = conn.cursor()
 
                 # 使用UTC+8时间确保一致性
                 # 调整截止时间以解决微秒精度问题 - 向前调整2秒确保包含边界数据
-                cutoff_time = (get_utc8_time() - timedelta(minutes=minutes) - timedelta(seconds=2)).isoformat()
+                now_ms = now_epoch_ms()
+                cutoff_time = now_ms - (minutes * 60 + 2) * 1000
 
                 # 首先检查是否有足够的数据
                 cursor.execute(
-                    """SELECT COUNT(*) as count, MIN(timestamp) as oldest_time, MAX(timestamp) as newest_time
-                    FROM oi_history
-                    WHERE symbol = ? AND timestamp <= ?""",
-                    (symbol, get_utc8_time().isoformat())
+                    f"""SELECT COUNT(*) as count, MIN(ts) as oldest_time, MAX(ts) as newest_time
+                    FROM {source}
+                    WHERE symbol = ? AND ts <= ?""",
+                    (symbol, now_ms)
                 )
                 stats = cursor.fetchone()
                 total_count = stats['count']
@@ -251,9 +996,9 @@ class DatabaseManager:
 
                 # 如果最近15分钟数据不足，扩大时间范围到30分钟或60分钟
                 cursor.execute(
-                    """SELECT COUNT(*) as recent_count
-                    FROM oi_history
-                    WHERE symbol = ? AND timestamp >= ?""",
+                    f"""SELECT COUNT(*) as recent_count
+                    FROM {source}
+                    WHERE symbol = ? AND ts >= ?""",
                     (symbol, cutoff_time)
                 )
                 recent_count = cursor.fetchone()['recent_count']
@@ -261,11 +1006,11 @@ class DatabaseManager:
                 if recent_count == 0:
                     # 扩大搜索范围到30分钟
                     extended_minutes = 30
-                    extended_cutoff = (get_utc8_time() - timedelta(minutes=extended_minutes)).isoformat()
+                    extended_cutoff = now_ms - extended_minutes * 60 * 1000
                     cursor.execute(
-                        """SELECT COUNT(*) as extended_count
-                        FROM oi_history
-                        WHERE symbol = ? AND timestamp >= ?""",
+                        f"""SELECT COUNT(*) as extended_count
+                        FROM {source}
+                        WHERE symbol = ? AND ts >= ?""",
                         (symbol, extended_cutoff)
                     )
                     extended_count = cursor.fetchone()['extended_count']
@@ -277,11 +1022,11 @@ class DatabaseManager:
                     else:
                         # 再扩大到60分钟
                         extended_minutes = 60
-                        extended_cutoff = (get_utc8_time() - timedelta(minutes=extended_minutes)).isoformat()
+                        extended_cutoff = now_ms - extended_minutes * 60 * 1000
                         cursor.execute(
-                            """SELECT COUNT(*) as extended_count
-                            FROM oi_history
-                            WHERE symbol = ? AND timestamp >= ?""",
+                            f"""SELECT COUNT(*) as extended_count
+                            FROM {source}
+                            WHERE symbol = ? AND ts >= ?""",
                             (symbol, extended_cutoff)
                         )
                         extended_count = cursor.fetchone()['extended_count']
@@ -296,10 +1041,10 @@ class DatabaseManager:
 
                 # 获取数据，按时间升序排列（确保最老的数据在前）
                 cursor.execute(
-                    """SELECT timestamp, open_interest, price, value_usdt
-                    FROM oi_history
-                    WHERE symbol = ? AND timestamp >= ?
-                    ORDER BY timestamp ASC""",
+                    f"""SELECT ts, open_interest, price, value_usdt
+                    FROM {source}
+                    WHERE symbol = ? AND ts >= ?
+                    ORDER BY ts ASC""",
                     (symbol, cutoff_time)
                 )
                 rows = cursor.fetchall()
@@ -308,10 +1053,10 @@ class DatabaseManager:
                 if not rows and minutes > 15:
                     # 回退到使用最近的一条记录作为基准，而不是使用非常老的数据
                     cursor.execute(
-                        """SELECT timestamp, open_interest, price, value_usdt
-                        FROM oi_history
+                        f"""SELECT ts, open_interest, price, value_usdt
+                        FROM {source}
                         WHERE symbol = ?
-                        ORDER BY timestamp DESC
+                        ORDER BY ts DESC
                         LIMIT 1""",
                         (symbol,)
                     )
@@ -319,14 +1064,14 @@ class DatabaseManager:
                     if fallback_row:
                         # 使用最近的一条记录，但将其时间戳调整为当前时间前15分钟
                         # 这样可以避免使用过老的数据作为基准
-                        adjusted_timestamp = (get_utc8_time() - timedelta(minutes=15)).isoformat()
                         rows = [fallback_row]
-                        logger.info(f"{symbol} 使用最近历史数据作为15分钟基准: {fallback_row['timestamp']}")
+                        logger.info(f"{symbol} 使用最近历史数据作为15分钟基准: {epoch_ms_to_iso(fallback_row['ts'])}")
 
                 result = []
                 for row in rows:
                     result.append({
-                        'timestamp': row['timestamp'],
+                        'timestamp': epoch_ms_to_iso(row['ts']),
+                        'ts': row['ts'],
                         'open_interest': row['open_interest'],
                         'price': row['price'],
                         'value_usdt': row['value_usdt']
@@ -339,6 +1084,156 @@ class DatabaseManager:
             logger.error(f"获取历史数据失败 {symbol}: {e}")
             return []
 
+    def get_baselines(self, minutes: int = 15, symbols: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        一次查询获取所有交易对的比较基准
+
+        每个交易对取最近指定分钟内最早的一条记录，窗口内无数据时依次扩大到30、60分钟，
+        与get_recent_oi_data返回结果的第一条一致。监控周期从内存缓存取基准
+        （HistoryCache.get_window_baselines），本方法供不持有缓存的脚本直接查询数据库。
+
+        Args:
+            minutes: 时间范围（分钟）
+            symbols: 只查询这些交易对（可选，默认全部）
+
+        Returns:
+            Dict[str, Dict]: 交易对到基准记录的映射，无可用数据的交易对不包含在内
+        """
+        now_ms = now_epoch_ms()
+        # 与get_recent_oi_data一致，向前调整2秒确保包含边界数据
+        cutoffs = [now_ms - (minutes * 60 + 2) * 1000]
+        cutoffs += [now_ms - extended * 60 * 1000 for extended in (30, 60) if extended > minutes]
+
+        # 按窗口从小到大依次回退：COALESCE(窗口1内最早时间, 窗口2内最早时间, ...)
+        tiers = ", ".join(["MIN(CASE WHEN ts >= ? THEN ts END)"] * (len(cutoffs) - 1) + ["MIN(ts)"])
+        params: List[Any] = cutoffs[:-1] + [cutoffs[-1], now_ms]
+
+        source = self.oi_storage.source
+        symbol_filter = ""
+        if symbols is not None:
+            if not symbols:
+                return {}
+            symbol_filter = f"AND symbol IN ({', '.join('?' * len(symbols))})"
+            params += list(symbols)
+
+        try:
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"""WITH baseline AS (
+                        SELECT symbol, COALESCE({tiers}) AS baseline_time
+                        FROM {source}
+                        WHERE ts >= ? AND ts <= ? {symbol_filter}
+                        GROUP BY symbol
+                    )
+                    SELECT h.symbol, h.ts, h.open_interest, h.price, h.value_usdt
+                    FROM baseline b
+                    JOIN {source} h ON h.symbol = b.symbol AND h.ts = b.baseline_time""",
+                    params
+                )
+
+                result = {}
+                for row in cursor.fetchall():
+                    result.setdefault(row['symbol'], {
+                        'timestamp': epoch_ms_to_iso(row['ts']),
+                        'ts': row['ts'],
+                        'open_interest': row['open_interest'],
+                        'price': row['price'],
+                        'value_usdt': row['value_usdt']
+                    })
+                return result
+
+        except Exception as e:
+            logger.error(f"批量获取基准数据失败: {e}")
+            return {}
+
+    def get_oi_history_since(self, hours: float, symbols: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        获取所有交易对最近指定小时数的持仓量数据（用于预热内存缓存）
+
+        Args:
+            hours: 时间范围（小时）
+            symbols: 只查询这些交易对（可选，默认全部）
+
+        Returns:
+            List[Dict]: 历史数据列表，按交易对和时间升序排列
+        """
+        source = self.oi_storage.source
+        cutoff_time = now_epoch_ms() - int(hours * 3600 * 1000)
+        params: List[Any] = [cutoff_time]
+        symbol_filter = ""
+        if symbols is not None:
+            if not symbols:
+                return []
+            symbol_filter = f"AND symbol IN ({', '.join('?' * len(symbols))})"
+            params += list(symbols)
+
+        try:
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"""SELECT symbol, ts, open_interest, price, value_usdt
+                    FROM {source}
+                    WHERE ts >= ? {symbol_filter}
+                    ORDER BY symbol, ts ASC""",
+                    params
+                )
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"获取历史数据失败: {e}")
+            return []
+
+    def update_rollups(self, max_buckets: int = 48) -> Dict[str, int]:
+        """
+        增量更新小时和日线汇总
+
+        Args:
+            max_buckets: 每个层级本次最多汇总的时间段数
+
+        Returns:
+            Dict[str, int]: 各层级写入的汇总行数
+        """
+        try:
+            return self.rollups.update(now_epoch_ms(), max_buckets=max_buckets)
+        except Exception as e:
+            logger.error(f"更新汇总数据失败: {e}")
+            return {}
+
+    def get_oi_series(self, symbol: str, start: datetime, end: Optional[datetime] = None,
+                      max_points: int = 500) -> Dict[str, Any]:
+        """
+        获取一个交易对在时间范围内的持仓量和价格序列
+
+        自动选择层级：短范围使用原始数据，长范围使用小时或日线汇总，
+        超出原始数据保留期的范围只能由汇总表提供。
+
+        Args:
+            symbol: 交易对符号
+            start: 开始时间
+            end: 结束时间（默认当前时间）
+            max_points: 期望返回的最多点数
+
+        Returns:
+            Dict: {'tier': 层级名称, 'bucket_ms': 每个点的时间跨度, 'rows': OHLC记录列表}
+        """
+        now_ms = now_epoch_ms()
+        start_ms = to_epoch_ms(start)
+        end_ms = to_epoch_ms(end) if end is not None else now_ms
+        tier = self.rollups.choose_tier(start_ms, end_ms, now_ms, max_points, self.tier_retention_days)
+
+        try:
+            with self.get_connection(readonly=True) as conn:
+                rows = self.rollups.query(conn.cursor(), tier, symbol, start_ms, end_ms)
+        except Exception as e:
+            logger.error(f"获取持仓量序列失败 {symbol}: {e}")
+            rows = []
+
+        for row in rows:
+            row['timestamp'] = epoch_ms_to_iso(row['bucket'])
+
+        logger.debug(f"{symbol} 序列查询使用 {tier} 层级: {len(rows)} 个点")
+        return {'tier': tier, 'bucket_ms': self.rollups.bucket_ms(tier), 'rows': rows}
+
     def save_alert(self, symbol: str, oi_change_percent: float, price_change_percent: float,
                   current_oi: float, old_oi: float, current_price: float, old_price: float,
                   total_value_usdt: Optional[float] = None) -> bool:
@@ -359,17 +1254,11 @@ class DatabaseManager:
             bool: 是否成功保存
         """
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    """INSERT INTO alerts
-                    (symbol, oi_change_percent, price_change_percent, current_oi, old_oi,
-                     current_price, old_price, total_value_usdt, alert_time)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (symbol, oi_change_percent, price_change_percent, current_oi, old_oi,
-                     current_price, old_price, total_value_usdt, get_utc8_time().isoformat())
-                )
-                return True
+            return self._insert(
+                'alerts',
+                (symbol, oi_change_percent, price_change_percent, current_oi, old_oi,
+                 current_price, old_price, total_value_usdt, now_epoch_ms())
+            )
         except Exception as e:
             logger.error(f"保存警报记录失败 {symbol}: {e}")
             return False
@@ -386,27 +1275,32 @@ class DatabaseManager:
             List[Dict]: 警报记录列表
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(readonly=True) as conn:
                 cursor = conn.cursor()
-                cutoff_time = (get_utc8_time() - timedelta(hours=hours)).isoformat()
+                cutoff_time = now_epoch_ms() - hours * 3600 * 1000
 
                 if symbol:
                     cursor.execute(
                         """SELECT * FROM alerts
-                        WHERE symbol = ? AND alert_time >= ?
-                        ORDER BY alert_time DESC""",
+                        WHERE symbol = ? AND alert_ts >= ?
+                        ORDER BY alert_ts DESC""",
                         (symbol, cutoff_time)
                     )
                 else:
                     cursor.execute(
                         """SELECT * FROM alerts
-                        WHERE alert_time >= ?
-                        ORDER BY alert_time DESC""",
+                        WHERE alert_ts >= ?
+                        ORDER BY alert_ts DESC""",
                         (cutoff_time,)
                     )
 
                 rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                result = []
+                for row in rows:
+                    alert = dict(row)
+                    alert['alert_time'] = epoch_ms_to_iso(alert['alert_ts'])
+                    result.append(alert)
+                return result
         except Exception as e:
             logger.error(f"获取警报记录失败: {e}")
             return []
@@ -426,22 +1320,19 @@ class DatabaseManager:
             bool: 是否成功记录
         """
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    """INSERT INTO error_logs
-                    (error_type, error_message, symbol, context, error_time)
-                    VALUES (?, ?, ?, ?, ?)""",
-                    (error_type, error_message, symbol, context, get_utc8_time().isoformat())
-                )
-                return True
+            return self._insert(
+                'error_logs',
+                (error_type, error_message, symbol, context, get_utc8_time().isoformat())
+            )
         except Exception as e:
             logger.error(f"记录错误日志失败: {e}")
             return False
 
     def record_metric(self, metric_name: str, metric_value: float, symbol: Optional[str] = None) -> bool:
         """
-        记录性能指标
+        记录性能指标（作为直方图观测值进入指标注册表，按刷新间隔汇总写入）
+
+        计数和状态类指标应直接使用self.metrics.increment()和self.metrics.set_gauge()。
 
         Args:
             metric_name: 指标名称
@@ -452,22 +1343,44 @@ class DatabaseManager:
             bool: 是否成功记录
         """
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    """INSERT INTO performance_metrics
-                    (metric_name, metric_value, symbol, timestamp)
-                    VALUES (?, ?, ?, ?)""",
-                    (metric_name, metric_value, symbol, get_utc8_time().isoformat())
-                )
-                return True
+            self.metrics.observe(metric_name, metric_value, symbol)
+            return True
         except Exception as e:
             logger.error(f"记录性能指标失败: {e}")
             return False
 
+    def flush_metrics(self, force: bool = False) -> int:
+        """
+        刷新间隔结束时把指标注册表的汇总写入metric_aggregates
+
+        Args:
+            force: 不等间隔结束立即写入（关闭时使用）
+
+        Returns:
+            int: 写入（或入队）的汇总行数
+        """
+        if not force and not self.metrics.flush_due():
+            return 0
+
+        rows = self.metrics.collect()
+        if not rows:
+            return 0
+
+        try:
+            if self.write_queue:
+                return self.write_queue.put_many('metric_aggregates', rows)
+            return self.write_rows({'metric_aggregates': rows})
+        except Exception as e:
+            logger.error(f"写入指标汇总失败: {e}")
+            return 0
+
     def cleanup_old_data(self, data_retention_days: int = 30, alert_retention_days: int = 90) -> Dict[str, int]:
         """
-        清理旧数据
+        清理旧数据（一次执行到完成）
+
+        过期数据分块删除，每块一个短事务，随后用incremental_vacuum回收空闲页，
+        不再执行会锁住整个数据库的完整VACUUM。监控循环中应使用RetentionEngine
+        在每个周期的时间预算内推进清理。
 
         Args:
             data_retention_days: 监控数据保留天数
@@ -477,88 +1390,199 @@ class DatabaseManager:
             Dict[str, int]: 清理统计信息
         """
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
+            engine = RetentionEngine(
+                self,
+                data_retention_days=data_retention_days,
+                alert_retention_days=alert_retention_days
+            )
+            stats = engine.run_to_completion()
+            result = {key: stats[key] for key in RETENTION_RESULT_KEYS.values()}
 
-                # 清理oi_history表中的旧数据
-                oi_cutoff = (get_utc8_time() - timedelta(days=data_retention_days)).isoformat()
-                cursor.execute("DELETE FROM oi_history WHERE timestamp < ?", (oi_cutoff,))
-                oi_deleted = cursor.rowcount
+            logger.info(f"数据清理完成: {result}, 回收 {stats['pages_freed']} 页")
+            return result
 
-                # 清理alerts表中的旧数据
-                alert_cutoff = (get_utc8_time() - timedelta(days=alert_retention_days)).isoformat()
-                cursor.execute("DELETE FROM alerts WHERE alert_time < ?", (alert_cutoff,))
-                alert_deleted = cursor.rowcount
+        except Exception as e:
+            logger.error(f"清理旧数据时发生错误: {e}")
+            return {key: 0 for key in RETENTION_RESULT_KEYS.values()}
 
-                # 清理错误日志（保留7天）
-                error_cutoff = (get_utc8_time() - timedelta(days=7)).isoformat()
-                cursor.execute("DELETE FROM error_logs WHERE error_time < ?", (error_cutoff,))
-                error_deleted = cursor.rowcount
+    def retention_cutoff(self, table: str, days: int) -> Any:
+        """
+        计算表的保留截止时间
 
-                # 清理性能指标（保留30天）
-                metric_cutoff = (get_utc8_time() - timedelta(days=30)).isoformat()
-                cursor.execute("DELETE FROM performance_metrics WHERE timestamp < ?", (metric_cutoff,))
-                metric_deleted = cursor.rowcount
+        Args:
+            table: 表名
+            days: 保留天数
 
-                # 执行VACUUM以释放磁盘空间
-                cursor.execute("VACUUM")
+        Returns:
+            截止时间（error_logs为ISO文本，其余为UTC毫秒）
+        """
+        if table == 'error_logs':
+            return (get_utc8_time() - timedelta(days=days)).isoformat()
+        return now_epoch_ms() - days * 86400 * 1000
 
-                result = {
-                    'oi_records_deleted': oi_deleted,
-                    'alert_records_deleted': alert_deleted,
-                    'error_logs_deleted': error_deleted,
-                    'performance_metrics_deleted': metric_deleted
-                }
+    def delete_expired(self, table: str, cutoff: Any, limit: int) -> int:
+        """
+        在一个事务中删除一块过期数据
 
-                logger.info(f"数据清理完成: {result}")
-                return result
+        Args:
+            table: 表名
+            cutoff: 截止时间（见retention_cutoff）
+            limit: 最多删除的行数
 
-        except Exception as e:
-            logger.error(f"清理旧数据时发生错误: {e}")
-            return {'oi_records_deleted': 0, 'alert_records_deleted': 0, 'error_logs_deleted': 0, 'performance_metrics_deleted': 0}
+        Returns:
+            int: 删除的行数
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if table == 'oi_history':
+                deleted = self.oi_storage.delete_before(cursor, cutoff, limit)
+                if self.oi_storage.stats_table is None and deleted:
+                    self._bump_table_stats(cursor, 'oi_history', -deleted)
+                return deleted
+            cursor.execute(RETENTION_DELETE_SQL[table], (cutoff, limit))
+            return cursor.rowcount
+
+    def bulk_load_oi(self, rows: Iterable[tuple], chunk_size: int = 50000) -> int:
+        """
+        在一个事务中批量导入持仓量数据（用于回填和导入），已存在的(symbol, ts)跳过
+
+        rows可以是生成器，按chunk_size分块executemany，不需要一次性生成全部参数；
+        导入期间持有写锁，其他写入会等待事务结束。
 
-    def get_database_stats(self) -> Dict[str, Any]:
+        Args:
+            rows: 与INSERT_SQL['oi_history']格式相同的插入参数
+            chunk_size: 每次executemany的行数
+
+        Returns:
+            int: 实际写入的行数
+        """
+        inserted = 0
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for chunk in _chunked(rows, chunk_size):
+                    written = self.oi_storage.insert_missing_rows(cursor, chunk)
+                    inserted += written
+                    if self.oi_storage.stats_table is None and written:
+                        self._bump_table_stats(cursor, 'oi_history', written, max(row[1] for row in chunk))
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                self.oi_storage.reset()
+                raise
+        return inserted
+
+    def get_oi_latest_ts(self) -> Optional[int]:
+        """最新一条持仓量记录的时间戳（UTC毫秒，读取table_stats），没有数据时返回None"""
+        with self.get_connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT latest_ts FROM table_stats WHERE name = 'oi_history'")
+            row = cursor.fetchone()
+            return row['latest_ts'] if row else None
+
+    def get_oi_symbols(self) -> List[str]:
+        """有持仓量数据的交易对列表"""
+        with self.get_connection(readonly=True) as conn:
+            return self.oi_storage.symbols(conn.cursor())
+
+    def get_oi_earliest_ts(self) -> Optional[int]:
+        """最早一条持仓量记录的时间戳（UTC毫秒），没有数据时返回None"""
+        with self.get_connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT MIN(ts) AS earliest FROM {self.oi_storage.source}")
+            return cursor.fetchone()['earliest']
+
+    def get_oi_rows_between(self, start_ms: int, end_ms: int) -> List[tuple]:
+        """
+        读取时间范围内的原始持仓量数据（用于冷数据归档）
+
+        Args:
+            start_ms: 开始时间（UTC毫秒，含）
+            end_ms: 结束时间（UTC毫秒，不含）
+
+        Returns:
+            List[tuple]: (symbol, ts, open_interest, price) 记录
+        """
+        with self.get_connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""SELECT symbol, ts, open_interest, price FROM {self.oi_storage.source}
+                WHERE ts >= ? AND ts < ?""",
+                (start_ms, end_ms)
+            )
+            return [tuple(row) for row in cursor.fetchall()]
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """
+        回收最多pages个空闲页
+
+        Args:
+            pages: 本次最多回收的页数
+
+        Returns:
+            int: 实际回收的页数（未启用增量回收时为0）
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA freelist_count")
+            before = cursor.fetchone()[0]
+            if before == 0:
+                return 0
+            # execute()对不返回结果的语句只单步执行一次（只回收一页），executescript会执行到完成
+            cursor.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            cursor.execute("PRAGMA freelist_count")
+            return before - cursor.fetchone()[0]
+
+    def get_database_stats(self, detailed: bool = False) -> Dict[str, Any]:
         """
         获取数据库统计信息
 
+        行数和最新时间读取由触发器维护的table_stats，不扫描数据表。
+
+        Args:
+            detailed: 是否统计各分区占用的空间（需要扫描dbstat，耗时与数据库大小成正比）
+
         Returns:
             Dict: 数据库统计信息
         """
         try:
-            with self.get_connection() as conn:
+            with self.get_connection(readonly=True) as conn:
                 cursor = conn.cursor()
 
-                # 获取各表记录数
-                cursor.execute("SELECT COUNT(*) as count FROM oi_history")
-                oi_count = cursor.fetchone()['count']
-
-                cursor.execute("SELECT COUNT(*) as count FROM alerts")
-                alert_count = cursor.fetchone()['count']
-
-                cursor.execute("SELECT COUNT(*) as count FROM error_logs")
-                error_count = cursor.fetchone()['count']
-
-                cursor.execute("SELECT COUNT(*) as count FROM performance_metrics")
-                metric_count = cursor.fetchone()['count']
+                # 获取各表记录数和最新时间
+                cursor.execute("SELECT name, row_count, latest_ts, reconciled_at FROM table_stats")
+                table_stats = {row['name']: row for row in cursor.fetchall()}
 
                 # 获取数据库文件大小
                 import os
                 db_size = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
 
                 # 获取最近的数据时间
-                cursor.execute("SELECT MAX(timestamp) as latest FROM oi_history")
-                latest_data = cursor.fetchone()['latest']
-
-                return {
-                    'oi_history_records': oi_count,
-                    'alert_records': alert_count,
-                    'error_logs': error_count,
-                    'performance_metrics': metric_count,
+                latest_data = epoch_ms_to_iso(table_stats['oi_history']['latest_ts'])
+
+                # 分区布局：各分区的行数和大小
+                partitions = None
+                if hasattr(self.oi_storage, 'partition_stats'):
+                    partitions = self.oi_storage.partition_stats(cursor, with_sizes=detailed)
+
+                stats = {
+                    'oi_history_records': table_stats['oi_history']['row_count'],
+                    'alert_records': table_stats['alerts']['row_count'],
+                    'error_logs': table_stats['error_logs']['row_count'],
+                    'performance_metrics': table_stats['performance_metrics']['row_count'],
+                    'metric_aggregates': table_stats['metric_aggregates']['row_count'],
                     'database_size_bytes': db_size,
                     'database_size_mb': round(db_size / (1024 * 1024), 2),
                     'latest_data_time': latest_data,
-                    'database_path': self.db_path
+                    'database_path': self.db_path,
+                    'schema_version': SCHEMA_VERSION,
+                    'storage_layout': self.oi_storage.name,
+                    'stats_reconciled_at': epoch_ms_to_iso(table_stats['oi_history']['reconciled_at'])
                 }
+                if partitions is not None:
+                    stats['oi_partitions'] = partitions
+                return stats
 
         except Exception as e:
             logger.error(f"获取数据库统计信息失败: {e}")
@@ -25,7 +25,7 @@ def check_athusdt_data():
     # 检查最新的数据
     cursor.execute("""
         SELECT symbol, timestamp, open_interest, price, value_usdt
-        FROM oi_history
+        FROM oi_history_readable
         WHERE symbol = 'ATHUSDT'
         ORDER BY timestamp DESC
         LIMIT 5
@@ -45,7 +45,7 @@ def check_athusdt_data():
         current_time = recent_data[0]['timestamp']
         cursor.execute("""
             SELECT symbol, timestamp, open_interest, price, value_usdt
-            FROM oi_history
+            FROM oi_history_readable
             WHERE symbol = 'ATHUSDT'
             AND timestamp < ?
             ORDER BY timestamp DESC
@@ -104,7 +104,7 @@ def check_alert_logs():
     print(f"总警报数量: {alert_count}")
 
     if alert_count > 0:
-        cursor.execute("SELECT * FROM alerts ORDER BY alert_time DESC LIMIT 5")
+        cursor.execute("SELECT * FROM alerts_readable ORDER BY alert_ts DESC LIMIT 5")
         alerts = cursor.fetchall()
         print("\n最近警报:")
         for alert in alerts:
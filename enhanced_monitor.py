@@ -9,16 +9,31 @@ import time
 import threading
 from datetime import datetime, timedelta
 import pytz
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import websocket
 import json
 import os
 import random
 from dataclasses import dataclass
 from enum import Enum
+from urllib.parse import urlparse
+
+import numpy as np
 
 # 导入自定义模块
 from database_manager import DatabaseManager
+from oi_fetcher import OpenInterestFetcher
+from rate_limiter import WeightRateLimiter, get_endpoint_weight
+from http_client import HttpClient, get_http_client
+from symbol_cache import SymbolUniverseCache, SymbolUniverseDiff
+from price_gate import PriceGate
+from history_cache import BASELINE_FALLBACK_FACTOR, HistoryCache, baseline_lookback_seconds
+from rolling_stats import RollingStats
+from retention import RetentionEngine
+from archive import ColdArchive
+from snapshot import SnapshotExporter
+from backfill import OIBackfiller
+from alert_evaluator import ALERT_LEVEL_THRESHOLDS, apply_zscore_gate, evaluate_windows, select_windows
 from logger_manager import get_logger_manager, get_logger
 from config import Config
 
@@ -47,6 +62,18 @@ MONITOR_INTERVAL_MINUTES = 15  # 15分钟监控间隔
 DATA_RETENTION_DAYS = 30  # 数据保留30天
 ALERT_RETENTION_DAYS = 90  # 警报记录保留90天
 CLEANUP_INTERVAL_HOURS = 24  # 24小时清理间隔
+SYMBOL_CACHE_TTL_MINUTES = 360  # 交易对列表缓存6小时
+ALERT_COOLDOWN_SECONDS = 3600  # 同一交易对两次警报的最短间隔（1小时）
+HISTORY_CACHE_HOURS = 2  # 内存中保留2小时历史数据（不足以覆盖最长比较窗口时自动延长）
+
+# 比较窗口：(窗口分钟数, 持仓量变化阈值, 价格变化阈值)，阈值为None时使用
+# MonitoringConfig中的oi_change_threshold和price_change_threshold。
+# 默认只比较15分钟，其他窗口需要显式配置，例如：
+#     change_windows=((15, None, None), (60, 0.08, 0.03), (240, 0.12, 0.05))
+# 窗口不能短于监控间隔（否则按时间点查找不到基准）
+CHANGE_WINDOWS = (
+    (15, None, None),
+)
 
 class AlertLevel(Enum):
     """警报级别"""
@@ -55,6 +82,52 @@ class AlertLevel(Enum):
     HIGH = "high"
     CRITICAL = "critical"
 
+# 与alert_evaluator中的级别编号对应
+ALERT_LEVEL_ORDER = (AlertLevel.LOW, AlertLevel.MEDIUM, AlertLevel.HIGH, AlertLevel.CRITICAL)
+
+def format_window(minutes: float) -> str:
+    """窗口长度的显示文本：15 -> 15分钟，240 -> 4小时"""
+    if minutes >= 60 and minutes % 60 == 0:
+        return f"{minutes // 60:g}小时"
+    return f"{minutes:g}分钟"
+
+def resolve_change_windows(config: 'MonitoringConfig') -> List[Tuple[float, float, float]]:
+    """
+    解析配置的比较窗口（按长度升序），未指定阈值的窗口使用默认阈值
+
+    Returns:
+        List[Tuple[float, float, float]]: (窗口分钟数, 持仓量变化阈值, 价格变化阈值)
+    """
+    windows = sorted(
+        (minutes,
+         config.oi_change_threshold if oi_threshold is None else oi_threshold,
+         config.price_change_threshold if price_threshold is None else price_threshold)
+        for minutes, oi_threshold, price_threshold in config.change_windows
+    )
+    if not windows:
+        raise ValueError("至少需要配置一个比较窗口")
+    too_short = [minutes for minutes, _, _ in windows if minutes < config.monitor_interval_minutes]
+    if too_short:
+        raise ValueError(
+            f"比较窗口 {too_short} 分钟短于监控间隔 {config.monitor_interval_minutes} 分钟，"
+            f"找不到对应时间点的基准"
+        )
+    if config.change_rate_window_minutes not in [minutes for minutes, _, _ in windows]:
+        raise ValueError(
+            f"change_rate_window_minutes={config.change_rate_window_minutes} 不在比较窗口中"
+        )
+    if config.price_gated_oi_fetch:
+        # 门控跳过的交易对没有 now - 窗口长度 附近的持仓量记录，价格突破时只能使用回退基准
+        # （上一次后台刷新的记录），因此后台刷新间隔不能超过最短窗口的回退范围
+        refresh_minutes = config.oi_background_refresh_cycles * config.monitor_interval_minutes
+        reach_minutes = windows[0][0] * BASELINE_FALLBACK_FACTOR
+        if not config.baseline_fallback or refresh_minutes > reach_minutes:
+            raise ValueError(
+                f"price_gated_oi_fetch需要baseline_fallback=True，且后台刷新间隔 {refresh_minutes:g} 分钟"
+                f"不超过最短窗口的回退范围 {reach_minutes:g} 分钟"
+            )
+    return windows
+
 @dataclass
 class MonitoringConfig:
     """监控配置"""
@@ -65,20 +138,62 @@ class MonitoringConfig:
     alert_retention_days: int = ALERT_RETENTION_DAYS
     cleanup_interval_hours: int = CLEANUP_INTERVAL_HOURS
     telegram_enabled: bool = bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
-    max_requests_per_minute: int = 1200
+    max_weight_per_minute: int = 2400
+    rate_limit_safety_margin: float = 0.95
+    oi_fetch_concurrency: int = 20
+    symbol_cache_ttl_minutes: int = SYMBOL_CACHE_TTL_MINUTES
+    price_gated_oi_fetch: bool = False  # 仅为价格变化达到阈值的交易对优先获取持仓量（被跳过的周期不写入oi_history，汇总和回测的数据更稀疏）
+    oi_background_refresh_cycles: int = 4  # 未通过价格门控的交易对每隔N个周期刷新一次（N×监控间隔不能超过最短窗口的4倍，突破时使用回退基准）
+    history_cache_hours: float = HISTORY_CACHE_HOURS
+    change_windows: Tuple[Tuple[float, Optional[float], Optional[float]], ...] = CHANGE_WINDOWS  # 阈值为None时使用上面的默认阈值
+    change_rate_window_minutes: float = 15  # 写入oi_history的变化率使用的窗口
+    baseline_fallback: bool = True  # 比较时间点附近没有记录时回退到之前最近的记录（最多窗口长度的4倍之前），False时该窗口不评估
+    rolling_stats_enabled: bool = True  # 按交易对维护各窗口变化率的滚动均值、方差和EWMA
+    rolling_stats_path: str = "data/rolling_stats.npz"
+    rolling_stats_halflife_cycles: float = 96  # EWMA半衰期（周期数，15分钟周期约为1天）
+    adaptive_thresholds: bool = False  # 用z分数代替固定阈值判断触发（样本不足的交易对仍用固定阈值）
+    zscore_oi_threshold: float = 4.0
+    zscore_price_threshold: float = 3.0
+    zscore_min_samples: int = 32  # z分数可用所需的最少样本数
+    db_write_behind: bool = True  # 数据库写入由后台线程批量完成
+    db_write_batch_size: int = 500
+    db_write_flush_interval: float = 1.0
+    db_storage_layout: str = 'standard'  # 持仓量数据存储布局：standard / compact / partitioned
+    db_vacuum_on_startup: bool = False  # 已有数据库启动时执行一次VACUUM以启用增量空间回收（数据量大时较慢）
+    retention_chunk_size: int = 5000  # 每个清理事务最多删除的行数
+    retention_time_budget: float = 0.5  # 每个周期用于数据清理的最长时间（秒）
+    rollups_enabled: bool = True  # 把原始数据汇总为小时和日线OHLC
+    rollup_1h_retention_days: Optional[int] = 180  # 小时汇总保留天数（None表示永久保留）
+    rollup_1d_retention_days: Optional[int] = None  # 日线汇总保留天数（None表示永久保留）
+    archive_enabled: bool = False  # 过期的持仓量数据先按天归档为列式文件再删除（需要pyarrow）
+    archive_dir: str = "data/archive"
+    archive_format: str = 'parquet'  # parquet / arrow
+    snapshot_enabled: bool = True  # 定期导出只读快照（DELETE日志模式）供DB Browser查看
+    snapshot_interval_minutes: float = 5.0
+    snapshot_path: Optional[str] = None  # 默认 data/binance_monitor_browser.db
+    snapshot_pages_per_step: int = 100  # 在线备份每步复制的页数
+    backfill_on_startup: bool = True  # 启动时用openInterestHist补齐停机期间缺失的数据
+    backfill_max_hours: float = 24.0  # 启动回填最多补齐的小时数
+    backfill_period: str = '5m'
+    backfill_concurrency: int = 8
+    stats_reconcile_interval_hours: float = 24.0  # 按实际数据校正表统计计数的间隔
+    metrics_flush_interval_seconds: float = 60.0  # 指标在内存中汇总，每个间隔每个指标写入一行
+    metrics_percentiles: Tuple[float, ...] = (50, 90, 99)  # 耗时类指标写入的百分位数
     websocket_enabled: bool = True
 
 class EnhancedBinanceMonitor:
     """增强版Binance持仓量监控器"""
 
-    def __init__(self, config: Optional[MonitoringConfig] = None):
+    def __init__(self, config: Optional[MonitoringConfig] = None, http_client: Optional[HttpClient] = None):
         """
         初始化增强版监控器
 
         Args:
             config: 监控配置（可选，使用默认配置）
+            http_client: HTTP客户端（可选，默认使用全局连接池）
         """
         self.config = config or MonitoringConfig()
+        self.http = http_client or get_http_client()
 
         # 初始化日志管理器
         self.logger_manager = get_logger_manager(
@@ -94,7 +209,19 @@ class EnhancedBinanceMonitor:
         # 初始化数据库管理器
         self.db = DatabaseManager(
             db_path="data/binance_monitor.db",
-            max_connections=5
+            max_connections=5,
+            write_behind=self.config.db_write_behind,
+            write_batch_size=self.config.db_write_batch_size,
+            write_flush_interval=self.config.db_write_flush_interval,
+            storage_layout=self.config.db_storage_layout,
+            tier_retention_days={
+                'raw': self.config.data_retention_days,
+                '1h': self.config.rollup_1h_retention_days,
+                '1d': self.config.rollup_1d_retention_days
+            },
+            metrics_flush_interval=self.config.metrics_flush_interval_seconds,
+            metrics_percentiles=self.config.metrics_percentiles,
+            vacuum_on_startup=self.config.db_vacuum_on_startup
         )
 
         # API配置
@@ -106,8 +233,11 @@ class EnhancedBinanceMonitor:
 
         # 运行时数据
         self.alert_cooldown: Dict[str, float] = {}
-        self.cooldown_period = 3600  # 1小时冷却时间
-        self.request_timestamps = []
+        self.cooldown_period = ALERT_COOLDOWN_SECONDS  # 1小时冷却时间
+        self.rate_limiter = WeightRateLimiter(
+            max_weight_per_minute=self.config.max_weight_per_minute,
+            safety_margin=self.config.rate_limit_safety_margin
+        )
         self.ws_connections = []
         self.ws_connected = False
         self.ws_price_data = {}
@@ -117,19 +247,115 @@ class EnhancedBinanceMonitor:
         self.total_symbols_monitored = 0
         self.total_alerts_sent = 0
         self.last_cleanup_time = time.time()
+        self.last_stats_reconcile_time = time.time()
         self.start_time = get_utc8_time()
 
+        # 只读快照导出（后台线程，不阻塞监控写入）
+        self.snapshot: Optional[SnapshotExporter] = None
+        if self.config.snapshot_enabled:
+            self.snapshot = SnapshotExporter(
+                self.db.db_path,
+                snapshot_path=self.config.snapshot_path,
+                interval_seconds=self.config.snapshot_interval_minutes * 60,
+                pages_per_step=self.config.snapshot_pages_per_step,
+                metrics=self.db.metrics
+            )
+            self.snapshot.start()
+
+        # 冷数据归档
+        self.archive = None
+        if self.config.archive_enabled:
+            archive = ColdArchive(self.config.archive_dir, fmt=self.config.archive_format)
+            if archive.available:
+                self.archive = archive
+            else:
+                self.logger.warning("未安装pyarrow，冷数据归档已禁用，过期数据将直接删除")
+
+        # 增量数据清理，每个周期在时间预算内推进一部分
+        self.retention = RetentionEngine(
+            self.db,
+            data_retention_days=self.config.data_retention_days,
+            alert_retention_days=self.config.alert_retention_days,
+            hourly_retention_days=self.config.rollup_1h_retention_days,
+            daily_retention_days=self.config.rollup_1d_retention_days,
+            chunk_size=self.config.retention_chunk_size,
+            time_budget=self.config.retention_time_budget,
+            archiver=self.archive
+        )
+
+        # 交易对列表缓存
+        self.symbol_cache = SymbolUniverseCache(
+            self.get_all_perpetual_symbols,
+            ttl_seconds=self.config.symbol_cache_ttl_minutes * 60
+        )
+
+        # 历史数据回填：补齐停机期间的缺口后再预热历史缓存
+        self.backfiller = OIBackfiller(
+            self._make_rate_limited_request,
+            self.db,
+            base_url=self.base_url,
+            period=self.config.backfill_period,
+            max_concurrency=self.config.backfill_concurrency
+        )
+        if self.config.backfill_on_startup:
+            self.perform_startup_backfill()
+
+        # 比较窗口（按长度升序）和各窗口阈值
+        self.change_windows = self._resolve_change_windows()
+        self.window_minutes = [minutes for minutes, _, _ in self.change_windows]
+        self.change_rate_window = self.window_minutes.index(self.config.change_rate_window_minutes)
+
+        # 内存历史缓存，启动时从数据库预热；保留时长至少覆盖最长窗口的基准查找范围（含回退）
+        self.history_cache_hours = max(
+            self.config.history_cache_hours,
+            baseline_lookback_seconds(self.window_minutes[-1], self.config.baseline_fallback) / 3600
+        )
+        self.history_cache = HistoryCache(retention_hours=self.history_cache_hours)
+        self.history_cache.warm(self.db.get_oi_history_since(self.history_cache_hours))
+
+        # 各交易对变化率的滚动统计，从上次保存的文件继续累计
+        self.rolling_stats: Optional[RollingStats] = None
+        if self.config.rolling_stats_enabled or self.config.adaptive_thresholds:
+            self.rolling_stats = RollingStats(
+                self.window_minutes,
+                halflife_cycles=self.config.rolling_stats_halflife_cycles,
+                min_samples=self.config.zscore_min_samples
+            )
+            self.rolling_stats.load(self.config.rolling_stats_path)
+
+        # 价格门控：与警报使用相同的比较窗口，任一窗口的价格阈值被突破即优先获取
+        self.price_gate = PriceGate(
+            windows=[(minutes, price_threshold) for minutes, _, price_threshold in self.change_windows],
+            background_refresh_cycles=self.config.oi_background_refresh_cycles,
+            fallback=self.config.baseline_fallback
+        )
+
+        # 持仓量并发获取引擎
+        self.oi_fetcher = OpenInterestFetcher(
+            self.get_open_interest,
+            max_concurrency=self.config.oi_fetch_concurrency
+        )
+
         self.logger.info("增强版监控器初始化完成", extra={
             'config': self.config.__dict__,
             'telegram_enabled': self.config.telegram_enabled,
             'websocket_enabled': self.config.websocket_enabled
         })
 
+    def _resolve_change_windows(self) -> List[Tuple[float, float, float]]:
+        """解析配置的比较窗口并记录到日志"""
+        windows = resolve_change_windows(self.config)
+        self.logger.info("比较窗口: " + ", ".join(
+            f"{format_window(minutes)}(持仓量 {oi_threshold:.1%}, 价格 {price_threshold:.1%})"
+            for minutes, oi_threshold, price_threshold in windows
+        ))
+        return windows
+
     def get_all_perpetual_symbols(self) -> List[str]:
         """获取所有永续合约交易对"""
         start_time = time.time()
         try:
-            response = requests.get(f"{self.base_url}{self.exchange_info_endpoint}", timeout=30)
+            response = self.http.get(f"{self.base_url}{self.exchange_info_endpoint}", timeout=30)
             response.raise_for_status()
             data = response.json()
 
@@ -165,34 +391,64 @@ class EnhancedBinanceMonitor:
             )
             return []
 
-    def _make_rate_limited_request(self, url: str, params: dict = None, max_retries: int = 3) -> Optional[requests.Response]:
-        """智能速率限制的请求方法，带指数退避重试"""
-        # 清理过期的请求记录
-        now = time.time()
-        self.request_timestamps = [ts for ts in self.request_timestamps if now - ts < 60]
+    def perform_startup_backfill(self):
+        """启动时检测数据缺口并回填（失败不影响监控启动）"""
+        try:
+            gap = self.backfiller.detect_gap(max_hours=self.config.backfill_max_hours)
+            if gap is None:
+                self.logger.info("历史数据无缺口，跳过回填")
+                return
 
-        # 检查速率限制
-        if len(self.request_timestamps) >= self.config.max_requests_per_minute:
-            oldest_request = min(self.request_timestamps)
-            wait_time = 60 - (now - oldest_request)
-            if wait_time > 0:
-                self.logger.warning(f"速率限制接近，等待 {wait_time:.2f} 秒")
-                time.sleep(wait_time)
-                now = time.time()
-                self.request_timestamps = [ts for ts in self.request_timestamps if now - ts < 60]
+            symbols = self.symbol_cache.get_symbols()
+            if not symbols:
+                self.logger.warning("无法获取交易对列表，跳过回填")
+                return
 
-        # 记录请求时间
-        self.request_timestamps.append(time.time())
+            gap_hours = (gap[1] - gap[0]) / 3600000
+            self.logger.info(f"检测到 {gap_hours:.1f} 小时的数据缺口，开始回填")
+            stats = self.backfiller.run(symbols, *gap)
+            self.db.metrics.increment("backfill_rows_inserted", stats['rows_inserted'])
+            self.db.metrics.observe("backfill_duration", stats['duration'])
+
+        except Exception as e:
+            self.logger_manager.log_error_with_context(
+                error_type="BACKFILL_ERROR",
+                error_message=str(e)
+            )
+
+    def handle_symbol_universe_change(self, diff: SymbolUniverseDiff):
+        """处理交易对新增和下架"""
+        for symbol in diff.removed:
+            self.alert_cooldown.pop(symbol, None)
+        self.price_gate.forget(diff.removed)
+        self.history_cache.forget(diff.removed)
+        if self.rolling_stats:
+            self.rolling_stats.forget(diff.removed)
+
+        self.logger_manager.log_monitor_event(
+            event_type="symbol_universe_changed",
+            symbol="ALL",
+            data={'added': diff.added, 'removed': diff.removed}
+        )
+
+    def _make_rate_limited_request(self, url: str, params: dict = None, max_retries: int = 3,
+                                   weight: Optional[int] = None) -> Optional[requests.Response]:
+        """按接口权重限流的请求方法，带指数退避重试（线程安全）"""
+        if weight is None:
+            weight = get_endpoint_weight(urlparse(url).path, params)
 
         # 指数退避重试机制
         for attempt in range(max_retries):
             try:
-                response = requests.get(url, params=params, timeout=30)
+                # 每次实际发送请求都消耗权重
+                self.rate_limiter.acquire(weight)
+                response = self.http.get(url, params=params, timeout=30)
+                self.rate_limiter.update_from_headers(response.headers)
 
-                if response.status_code == 429:
+                if response.status_code in (418, 429):
                     retry_after = int(response.headers.get('Retry-After', 5))
+                    self.rate_limiter.pause(retry_after)
                     self.logger.warning(f"API速率限制触发，等待 {retry_after} 秒 (尝试 {attempt + 1}/{max_retries})")
-                    time.sleep(retry_after)
                     continue
 
                 response.raise_for_status()
@@ -314,7 +570,7 @@ class EnhancedBinanceMonitor:
     def calculate_oi_change_rate(self, symbol: str, current_oi: float, historical_data: Optional[List[Dict]] = None) -> Optional[float]:
         """计算持仓量变化率"""
         if historical_data is None:
-            historical_data = self.db.get_recent_oi_data(symbol, minutes=15)
+            historical_data = self.history_cache.get_recent(symbol, minutes=15)
 
         if not historical_data:
             self.logger.debug(f"{symbol} 无历史数据，无法计算变化率")
@@ -334,7 +590,7 @@ class EnhancedBinanceMonitor:
     def calculate_price_change_rate(self, symbol: str, current_price: float, historical_data: Optional[List[Dict]] = None) -> Optional[float]:
         """计算价格变化率"""
         if historical_data is None:
-            historical_data = self.db.get_recent_oi_data(symbol, minutes=15)
+            historical_data = self.history_cache.get_recent(symbol, minutes=15)
 
         if not historical_data:
             self.logger.debug(f"{symbol} 无历史数据，无法计算价格变化率")
@@ -362,23 +618,21 @@ class EnhancedBinanceMonitor:
         return (current_time - last_alert_time) > self.cooldown_period
 
     def determine_alert_level(self, oi_change_percent: float, price_change_percent: float) -> AlertLevel:
-        """确定警报级别"""
-        if oi_change_percent >= 0.15 or price_change_percent >= 0.05:
-            return AlertLevel.CRITICAL
-        elif oi_change_percent >= 0.12 or price_change_percent >= 0.04:
-            return AlertLevel.HIGH
-        elif oi_change_percent >= 0.10 or price_change_percent >= 0.03:
-            return AlertLevel.MEDIUM
-        else:
-            return AlertLevel.LOW
+        """确定警报级别（与alert_evaluator.compute_alert_levels使用相同阈值）"""
+        for level, oi_threshold, price_threshold in ALERT_LEVEL_THRESHOLDS:
+            if oi_change_percent >= oi_threshold or price_change_percent >= price_threshold:
+                return ALERT_LEVEL_ORDER[level]
+        return AlertLevel.LOW
 
     def send_alert(self, symbol: str, oi_change_rate: float, price_change_rate: float,
                   current_oi: float, old_oi: float, current_price: float, old_price: float,
-                  total_value_usdt: Optional[float] = None):
+                  total_value_usdt: Optional[float] = None, alert_level: Optional[AlertLevel] = None,
+                  window_minutes: float = 15):
         """发送警报"""
         oi_change_percent = oi_change_rate * 100
         price_change_percent = price_change_rate * 100
-        alert_level = self.determine_alert_level(abs(oi_change_percent), abs(price_change_percent))
+        if alert_level is None:
+            alert_level = self.determine_alert_level(abs(oi_change_percent), abs(price_change_percent))
 
         # 准备警报数据
         alert_data = {
@@ -391,6 +645,7 @@ class EnhancedBinanceMonitor:
             'old_price': old_price,
             'total_value_usdt': total_value_usdt,
             'alert_level': alert_level.value,
+            'window_minutes': window_minutes,
             'timestamp': get_utc8_time().isoformat()
         }
 
@@ -423,6 +678,7 @@ class EnhancedBinanceMonitor:
             oi_change = alert_data['oi_change_percent']
             price_change = alert_data['price_change_percent']
             alert_level = AlertLevel(alert_data['alert_level'])
+            window = format_window(alert_data.get('window_minutes', 15))
 
             # 根据警报级别选择不同的表情符号
             level_emoji = {
@@ -439,10 +695,10 @@ class EnhancedBinanceMonitor:
                 f"📊 \u003cb\u003e交易对:\u003c/b\u003e {symbol}\n\n"
                 f"📈 \u003cb\u003e持仓量变化:\u003c/b\u003e {oi_change:.2f}%\n"
                 f"💰 \u003cb\u003e当前持仓量:\u003c/b\u003e {alert_data['current_oi']:,.0f}\n"
-                f"📊 \u003cb\u003e15分钟前持仓量:\u003c/b\u003e {alert_data['old_oi']:,.0f}\n\n"
+                f"📊 \u003cb\u003e{window}前持仓量:\u003c/b\u003e {alert_data['old_oi']:,.0f}\n\n"
                 f"💹 \u003cb\u003e价格变化:\u003c/b\u003e {price_change:.2f}%\n"
                 f"💰 \u003cb\u003e当前价格:\u003c/b\u003e ${alert_data['current_price']:.6f}\n"
-                f"📊 \u003cb\u003e15分钟前价格:\u003c/b\u003e ${alert_data['old_price']:.6f}\n"
+                f"📊 \u003cb\u003e{window}前价格:\u003c/b\u003e ${alert_data['old_price']:.6f}\n"
             )
 
             if alert_data.get('total_value_usdt'):
@@ -460,7 +716,7 @@ class EnhancedBinanceMonitor:
                 'parse_mode': 'HTML'
             }
 
-            response = requests.post(url, params=params, timeout=30)
+            response = self.http.post(url, params=params, timeout=30)
             response.raise_for_status()
 
             self.logger.info(f"Telegram警报消息已发送: {symbol}")
@@ -475,34 +731,34 @@ class EnhancedBinanceMonitor:
             return False
 
     def perform_periodic_cleanup(self):
-        """执行定期数据清理"""
+        """执行定期数据清理（一轮清理分散到多个周期，每个周期不超过时间预算）"""
         current_time = time.time()
-        if current_time - self.last_cleanup_time < self.config.cleanup_interval_hours * 3600:
-            return
+        if not self.retention.active:
+            if current_time - self.last_cleanup_time < self.config.cleanup_interval_hours * 3600:
+                return
+            self.logger.info("开始定期数据清理")
+            self.retention.start_pass()
+            self.last_cleanup_time = current_time
 
         cleanup_start = time.time()
-        self.logger.info("开始定期数据清理")
 
         try:
-            # 执行数据库清理
-            cleanup_stats = self.db.cleanup_old_data(
-                data_retention_days=self.config.data_retention_days,
-                alert_retention_days=self.config.alert_retention_days
-            )
+            # 在时间预算内推进数据库清理
+            self.retention.step()
 
             # 记录性能指标
             cleanup_duration = time.time() - cleanup_start
-            self.db.record_metric("cleanup_duration", cleanup_duration)
+            self.db.metrics.observe("cleanup_duration", cleanup_duration)
 
-            # 记录清理操作
-            self.logger_manager.log_cleanup_operation(
-                operation_type="periodic_cleanup",
-                records_deleted=sum(cleanup_stats.values()),
-                duration=cleanup_duration
-            )
+            if not self.retention.active:
+                # 记录清理操作
+                self.logger_manager.log_cleanup_operation(
+                    operation_type="periodic_cleanup",
+                    records_deleted=self.retention.rows_deleted,
+                    duration=self.retention.last_pass_duration
+                )
 
-            self.logger.info(f"定期数据清理完成: {cleanup_stats}")
-            self.last_cleanup_time = current_time
+                self.logger.info(f"定期数据清理完成: {self.retention.pass_stats}")
 
         except Exception as e:
             self.logger_manager.log_error_with_context(
@@ -510,6 +766,79 @@ class EnhancedBinanceMonitor:
                 error_message=str(e)
             )
 
+    def perform_rollup_update(self):
+        """增量更新小时和日线汇总（只处理已经结束的时间段，通常每小时才有新数据）"""
+        if not self.config.rollups_enabled:
+            return
+
+        rollup_start = time.time()
+        written = self.db.update_rollups()
+        if any(written.values()):
+            self.db.metrics.increment("rollup_rows_written", sum(written.values()))
+            self.db.metrics.observe("rollup_duration", time.time() - rollup_start)
+            self.logger.info(f"汇总数据更新完成: {written}")
+
+    def perform_stats_reconciliation(self):
+        """定期按实际数据校正表统计计数（全表计数，低频执行）"""
+        current_time = time.time()
+        if current_time - self.last_stats_reconcile_time < self.config.stats_reconcile_interval_hours * 3600:
+            return
+        self.last_stats_reconcile_time = current_time
+
+        try:
+            drift = self.db.reconcile_table_stats()
+            self.db.metrics.set_gauge("table_stats_drift", sum(abs(value) for value in drift.values()))
+            self.db.metrics.observe("stats_reconcile_duration", time.time() - current_time)
+        except Exception as e:
+            self.logger_manager.log_error_with_context(
+                error_type="STATS_RECONCILE_ERROR",
+                error_message=str(e)
+            )
+
+    def save_rolling_stats(self):
+        """保存滚动统计，重启后继续累计"""
+        if not self.rolling_stats:
+            return
+        try:
+            self.rolling_stats.save(self.config.rolling_stats_path)
+        except Exception as e:
+            self.logger.error(f"保存滚动统计失败: {e}")
+
+    def fetch_oi_snapshot(self, symbols: List[str], all_prices: Dict[str, float]) -> Tuple[List[str], Dict[str, float]]:
+        """
+        获取本周期的持仓量快照
+
+        价格门控模式下，价格变化达到阈值的交易对优先获取，
+        其余交易对按后台节奏刷新，本周期不需要的交易对直接跳过。
+
+        Args:
+            symbols: 交易对列表
+            all_prices: 批量获取的价格
+
+        Returns:
+            Tuple[List[str], Dict[str, float]]: (本周期处理的交易对, 持仓量快照)
+        """
+        now = time.time()
+
+        if not (self.config.price_gated_oi_fetch and all_prices):
+            self.price_gate.record_prices(all_prices, now)
+            return symbols, self.oi_fetcher.fetch_all(symbols)
+
+        priority, background = self.price_gate.select(symbols, all_prices, now)
+        self.price_gate.record_prices(all_prices, now)
+
+        # 一次扇出（优先列表在前，先提交），耗时和失败统计覆盖本周期的全部请求
+        oi_snapshot = self.oi_fetcher.fetch_all(priority + background)
+        self.price_gate.mark_fetched(oi_snapshot.keys())
+
+        skipped = len(symbols) - len(priority) - len(background)
+        self.db.metrics.increment("oi_requests_skipped", skipped)
+        self.logger.info(
+            f"价格门控: 优先获取 {len(priority)} 个, 后台刷新 {len(background)} 个, 跳过 {skipped} 个"
+        )
+
+        return priority + background, oi_snapshot
+
     def monitor_once(self) -> bool:
         """执行一次监控循环"""
         self.logger.info("开始监控循环")
@@ -519,24 +848,48 @@ class EnhancedBinanceMonitor:
             # 执行定期清理
             self.perform_periodic_cleanup()
 
-            # 获取所有永续合约交易对
-            symbols = self.get_all_perpetual_symbols()
+            # 更新小时和日线汇总
+            self.perform_rollup_update()
+
+            # 定期校正表统计计数
+            self.perform_stats_reconciliation()
+
+            # 获取所有永续合约交易对（使用缓存，TTL到期或获取失败时刷新）
+            symbols = self.symbol_cache.get_symbols()
             if not symbols:
                 self.logger.error("无法获取交易对列表")
                 return False
 
+            diff = self.symbol_cache.pop_diff()
+            if diff:
+                self.handle_symbol_universe_change(diff)
+
             self.total_symbols_monitored = len(symbols)
 
             # 批量获取价格
             all_prices = self.get_all_prices() or {}
 
+            # 并发获取持仓量快照（价格门控模式下只获取需要的交易对）
+            symbols, oi_snapshot = self.fetch_oi_snapshot(symbols, all_prices)
+            current_time = get_utc8_time()
+
+            # 内存缓存中没有历史数据的交易对（如新上线），一次查询从数据库补齐到缓存，所有窗口共用
+            missing = [symbol for symbol in symbols if symbol not in self.history_cache]
+            if missing:
+                self.history_cache.warm(self.db.get_oi_history_since(self.history_cache_hours, symbols=missing))
+
+            # 第一阶段：收集本周期所有交易对的当前值
             success_count = 0
             error_count = 0
+            cycle_symbols: List[str] = []
+            current_ois: List[float] = []
+            current_prices: List[float] = []
+            now_ts = current_time.timestamp()
 
             for symbol in symbols:
                 try:
-                    # 获取持仓量
-                    current_oi = self.get_open_interest(symbol)
+                    # 从快照中读取持仓量
+                    current_oi = oi_snapshot.get(symbol)
                     if current_oi is None:
                         error_count += 1
                         continue
@@ -550,49 +903,90 @@ class EnhancedBinanceMonitor:
                         self.logger.warning(f"无法获取 {symbol} 的价格，跳过")
                         continue
 
-                    # 计算USDT价值
-                    total_value_usdt = current_oi * current_price
-                    current_time = get_utc8_time()
-
-                    # 获取历史数据用于变化率计算（在保存当前数据之前）
-                    historical_data = self.db.get_recent_oi_data(symbol, minutes=15)
-
-                    # 计算变化率（使用预获取的历史数据）
-                    oi_change_rate = self.calculate_oi_change_rate(symbol, current_oi, historical_data)
-                    price_change_rate = self.calculate_price_change_rate(symbol, current_price, historical_data)
-
-                    # 保存数据，包含计算出的变化率
-                    price_change_val = price_change_rate if price_change_rate is not None else 0.0
-                    oi_change_val = oi_change_rate if oi_change_rate is not None else 0.0
-                    self.db.save_oi_data(symbol, current_time, current_oi, current_price, total_value_usdt, price_change_val, oi_change_val)
+                    cycle_symbols.append(symbol)
+                    current_ois.append(current_oi)
+                    current_prices.append(current_price)
 
-                    if oi_change_rate is not None and price_change_rate is not None:
-                        oi_change_percent = abs(oi_change_rate * 100)
-                        price_change_percent = abs(price_change_rate * 100)
+                except Exception as e:
+                    error_count += 1
+                    self.logger_manager.log_error_with_context(
+                        error_type="MONITOR_ERROR",
+                        error_message=str(e),
+                        symbol=symbol
+                    )
 
-                        # 检查警报条件
-                        if (oi_change_percent >= (self.config.oi_change_threshold * 100) and
-                            price_change_percent >= (self.config.price_change_threshold * 100)):
+            # 第二阶段：从内存缓存按时间点取出所有窗口的基准（在保存当前数据之前），
+            # 向量化计算所有窗口、所有交易对的变化率、阈值判断和警报级别
+            baseline_oi, baseline_price = self.history_cache.get_window_baselines(
+                cycle_symbols, self.window_minutes, now=now_ts, fallback=self.config.baseline_fallback
+            )
+            evaluation = evaluate_windows(
+                np.array(current_ois, dtype=np.float64),
+                np.array(current_prices, dtype=np.float64),
+                baseline_oi,
+                baseline_price,
+                [oi_threshold for _, oi_threshold, _ in self.change_windows],
+                [price_threshold for _, _, price_threshold in self.change_windows]
+            )
+            if self.rolling_stats:
+                # z分数按更新前的统计量计算，避免本周期的异常值抬高自身的标准差
+                if self.config.adaptive_thresholds:
+                    oi_z, price_z, ready = self.rolling_stats.zscores(
+                        cycle_symbols, evaluation.oi_change, evaluation.price_change
+                    )
+                    evaluation = apply_zscore_gate(
+                        evaluation, oi_z, price_z, ready,
+                        self.config.zscore_oi_threshold, self.config.zscore_price_threshold
+                    )
+                self.rolling_stats.update(cycle_symbols, evaluation.oi_change, evaluation.price_change)
+
+            alert_windows = select_windows(evaluation)
+            rate_row = self.change_rate_window
+
+            # 第三阶段：保存数据并处理触发的警报，所有写入在一个事务中批量提交
+            with self.db.cycle_batch() as batch:
+                for index, symbol in enumerate(cycle_symbols):
+                    try:
+                        current_oi = current_ois[index]
+                        current_price = current_prices[index]
+                        total_value_usdt = current_oi * current_price
+
+                        # 写入数据库的变化率固定使用change_rate_window_minutes窗口
+                        valid = bool(evaluation.valid[rate_row, index])
+                        oi_change_rate = float(evaluation.oi_change[rate_row, index]) if valid else None
+                        price_change_rate = float(evaluation.price_change[rate_row, index]) if valid else None
+
+                        # 保存数据，包含计算出的变化率
+                        batch.add_oi_data(symbol, current_time, current_oi, current_price, total_value_usdt,
+                                          price_change_rate, oi_change_rate)
+                        self.history_cache.append(symbol, now_ts, current_oi, current_price, total_value_usdt)
+
+                        window = int(alert_windows[index])
+                        if window >= 0:
+                            # 任一窗口触发：按选中的窗口（级别最高、同级取较短）发送警报
+                            window_minutes = self.window_minutes[window]
+                            window_oi_change = float(evaluation.oi_change[window, index])
+                            window_price_change = float(evaluation.price_change[window, index])
 
                             if self.should_alert(symbol):
-                                # 使用之前获取的历史数据发送警报（避免再次获取导致包含当前数据）
-                                if historical_data:
-                                    oldest_data = historical_data[0]
-                                    self.send_alert(
-                                        symbol, oi_change_rate, price_change_rate,
-                                        current_oi, oldest_data['open_interest'],
-                                        current_price, oldest_data['price'], total_value_usdt
-                                    )
+                                self.send_alert(
+                                    symbol, window_oi_change, window_price_change,
+                                    current_oi, float(baseline_oi[window, index]),
+                                    current_price, float(baseline_price[window, index]), total_value_usdt,
+                                    alert_level=ALERT_LEVEL_ORDER[evaluation.levels[window, index]],
+                                    window_minutes=window_minutes
+                                )
                             else:
                                 self.logger.info(
-                                    f"{symbol} 满足警报条件但在冷却期，不发送警报",
+                                    f"{symbol} 满足{format_window(window_minutes)}窗口警报条件但在冷却期，不发送警报",
                                     extra={
                                         'symbol': symbol,
-                                        'oi_change_percent': oi_change_percent,
-                                        'price_change_percent': price_change_percent
+                                        'window_minutes': window_minutes,
+                                        'oi_change_percent': abs(window_oi_change * 100),
+                                        'price_change_percent': abs(window_price_change * 100)
                                     }
                                 )
-                        else:
+                        elif valid:
                             # 记录正常数据更新
                             self.logger_manager.log_monitor_event(
                                 event_type="data_update",
@@ -601,33 +995,32 @@ class EnhancedBinanceMonitor:
                                     'open_interest': current_oi,
                                     'price': current_price,
                                     'value_usdt': total_value_usdt,
-                                    'oi_change_percent': oi_change_percent,
-                                    'price_change_percent': price_change_percent
+                                    'oi_change_percent': abs(oi_change_rate * 100),
+                                    'price_change_percent': abs(price_change_rate * 100)
                                 }
                             )
+                        else:
+                            self.logger.debug(f"{symbol} 无可用历史数据，无法计算变化率")
 
-                    success_count += 1
-
-                    # 记录性能指标
-                    self.db.record_metric("api_request_success", 1, symbol)
-
-                    # 添加微小延迟避免请求过快
-                    time.sleep(0.05)
+                        success_count += 1
 
-                except Exception as e:
-                    error_count += 1
-                    self.logger_manager.log_error_with_context(
-                        error_type="MONITOR_ERROR",
-                        error_message=str(e),
-                        symbol=symbol
-                    )
-                    continue
+                    except Exception as e:
+                        error_count += 1
+                        self.logger_manager.log_error_with_context(
+                            error_type="MONITOR_ERROR",
+                            error_message=str(e),
+                            symbol=symbol
+                        )
 
-            # 记录监控循环统计
+            # 记录监控循环统计（内存汇总，刷新间隔结束时每个指标写入一行）
             cycle_duration = time.time() - start_time
-            self.db.record_metric("monitor_cycle_duration", cycle_duration)
-            self.db.record_metric("symbols_processed", success_count)
-            self.db.record_metric("symbols_failed", error_count)
+            self.db.metrics.increment("api_request_success", success_count)
+            self.db.metrics.observe("monitor_cycle_duration", cycle_duration)
+            self.db.metrics.observe("oi_fetch_duration", self.oi_fetcher.last_duration)
+            self.db.metrics.set_gauge("symbols_processed", success_count)
+            self.db.metrics.set_gauge("symbols_failed", error_count)
+            self.db.flush_metrics()
+            self.save_rolling_stats()
 
             self.logger.info(
                 f"监控循环完成: 成功 {success_count} 个, 失败 {error_count} 个, 耗时 {cycle_duration:.2f}秒"
@@ -680,10 +1073,20 @@ class EnhancedBinanceMonitor:
                 'runtime_hours': round(runtime_duration, 2),
                 'total_symbols_monitored': self.total_symbols_monitored,
                 'total_alerts_sent': self.total_alerts_sent,
+                'rate_limiter_stats': self.rate_limiter.get_stats(),
+                'http_stats': self.http.get_stats(),
                 'database_stats': db_stats,
+                'db_pool_stats': self.db.get_pool_stats(),
+                'snapshot_stats': self.snapshot.get_stats() if self.snapshot else None,
+                'metrics_stats': self.db.metrics.get_stats(),
+                'rolling_stats': self.rolling_stats.get_stats() if self.rolling_stats else None,
                 'log_stats': log_stats
             }
 
+            if self.snapshot:
+                self.snapshot.stop()
+            self.save_rolling_stats()
+            self.db.shutdown()
             self.logger.info("监控器关闭完成", extra=shutdown_info)
 
         except Exception as e:
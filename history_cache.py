@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+内存历史数据缓存 - 按交易对保存最近N小时的持仓量和价格
+使用紧凑数组存储，O(1)追加、O(log n)按时间查找基准，避免每个周期查询数据库
+多个比较窗口的基准通过按时间点（as-of）查找一次取出，不需要额外的数据库查询；
+时间点附近没有记录时可回退到之前最近的一条记录
+"""
+
+import bisect
+import logging
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# 时区设置
+UTC8 = pytz.timezone('Asia/Shanghai')
+
+# 基准查找的回退窗口（分钟），与DatabaseManager.get_recent_oi_data保持一致
+FALLBACK_WINDOWS_MINUTES = (30, 60)
+
+# 按时间点查找基准时允许的偏差：窗口长度的比例（周期调度会有几十秒的漂移），至少2秒
+ASOF_TOLERANCE_FRACTION = 0.2
+ASOF_MIN_TOLERANCE_SECONDS = 2
+
+# 回退基准最早可以是窗口长度的多少倍之前（15分钟窗口最多回退到60分钟前，与FALLBACK_WINDOWS_MINUTES的范围一致）
+BASELINE_FALLBACK_FACTOR = 4
+
+# 已过期数据超过该数量且超过一半时压缩数组
+COMPACT_THRESHOLD = 256
+
+
+def asof_tolerance(minutes: float) -> float:
+    """按时间点查找窗口基准时允许的偏差（秒）"""
+    return max(ASOF_MIN_TOLERANCE_SECONDS, minutes * 60 * ASOF_TOLERANCE_FRACTION)
+
+
+def baseline_lookback_seconds(minutes: float, fallback: bool = True) -> float:
+    """查找窗口基准最远需要回看的时间（秒），用于确定历史数据的保留时长"""
+    factor = BASELINE_FALLBACK_FACTOR if fallback else 1
+    return minutes * 60 * factor + asof_tolerance(minutes)
+
+
+class SymbolHistory:
+    """单个交易对的时间序列（按时间升序）
+
+    过期数据通过移动起始下标逻辑删除，积累到一定数量后再整体压缩，
+    因此追加和裁剪的均摊复杂度都是O(1)。
+    """
+
+    __slots__ = ('timestamps', 'open_interest', 'prices', 'values', 'start')
+
+    def __init__(self):
+        self.timestamps = array('d')
+        self.open_interest = array('d')
+        self.prices = array('d')
+        self.values = array('d')
+        self.start = 0
+
+    def __len__(self) -> int:
+        return len(self.timestamps) - self.start
+
+    def append(self, ts: float, open_interest: float, price: float, value_usdt: float):
+        """追加一条记录，乱序数据按时间插入到正确位置"""
+        if not self.timestamps or ts >= self.timestamps[-1]:
+            self.timestamps.append(ts)
+            self.open_interest.append(open_interest)
+            self.prices.append(price)
+            self.values.append(value_usdt)
+            return
+
+        index = bisect.bisect_right(self.timestamps, ts, lo=self.start)
+        self.timestamps.insert(index, ts)
+        self.open_interest.insert(index, open_interest)
+        self.prices.insert(index, price)
+        self.values.insert(index, value_usdt)
+
+    def trim(self, cutoff: float):
+        """丢弃早于cutoff的记录"""
+        self.start = bisect.bisect_left(self.timestamps, cutoff, lo=self.start)
+        if self.start >= COMPACT_THRESHOLD and self.start * 2 >= len(self.timestamps):
+            for column in (self.timestamps, self.open_interest, self.prices, self.values):
+                del column[:self.start]
+            self.start = 0
+
+    def index_at_or_after(self, ts: float) -> int:
+        """返回第一条时间不早于ts的记录下标"""
+        return bisect.bisect_left(self.timestamps, ts, lo=self.start)
+
+    def index_after(self, ts: float) -> int:
+        """返回第一条时间晚于ts的记录下标"""
+        return bisect.bisect_right(self.timestamps, ts, lo=self.start)
+
+    def asof_index(self, target: float, tolerance: float) -> int:
+        """返回时间最接近target且相差不超过tolerance的记录下标，没有时返回-1"""
+        index = bisect.bisect_left(self.timestamps, target, lo=self.start)
+        best = -1
+        best_gap = tolerance
+        # 只需比较target前后相邻的两条记录，相差相同时取较早的一条
+        for candidate in (index - 1, index):
+            if self.start <= candidate < len(self.timestamps):
+                gap = abs(self.timestamps[candidate] - target)
+                if gap <= best_gap and (best < 0 or gap < best_gap):
+                    best = candidate
+                    best_gap = gap
+        return best
+
+    def baseline_index(self, now: float, minutes: float, fallback: bool = True) -> int:
+        """
+        查找窗口基准的记录下标
+
+        基准是时间最接近 now - 窗口长度 的记录（允许偏差见asof_tolerance）。偏差范围内没有记录时
+        （漏掉周期、重启或价格门控跳过了该交易对），fallback为True则取目标时间之前最近的一条，
+        最早不超过窗口长度的BASELINE_FALLBACK_FACTOR倍；不会用比目标时间更近的数据代替。
+
+        Returns:
+            int: 记录下标，没有基准时返回-1
+        """
+        target = now - minutes * 60
+        tolerance = asof_tolerance(minutes)
+        index = self.asof_index(target, tolerance)
+        if index < 0 and fallback:
+            index = bisect.bisect_right(self.timestamps, target, lo=self.start) - 1
+            if index < self.start or self.timestamps[index] < now - baseline_lookback_seconds(minutes):
+                index = -1
+        return index
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """以数据库查询结果相同的格式返回一条记录"""
+        return {
+            'timestamp': datetime.fromtimestamp(self.timestamps[index], UTC8).isoformat(),
+            'open_interest': self.open_interest[index],
+            'price': self.prices[index],
+            'value_usdt': self.values[index]
+        }
+
+
+class HistoryCache:
+    """按交易对组织的内存历史缓存"""
+
+    def __init__(self, retention_hours: float = 2):
+        """
+        初始化历史缓存
+
+        Args:
+            retention_hours: 在内存中保留的小时数
+        """
+        self.retention_seconds = retention_hours * 3600
+        self._series: Dict[str, SymbolHistory] = {}
+
+    def __contains__(self, symbol: str) -> bool:
+        series = self._series.get(symbol)
+        return bool(series)
+
+    def append(self, symbol: str, ts: float, open_interest: float, price: float,
+               value_usdt: Optional[float] = None):
+        """
+        追加一条记录
+
+        Args:
+            symbol: 交易对符号
+            ts: 时间戳（秒）
+            open_interest: 持仓量
+            price: 价格
+            value_usdt: USDT价值（可选，默认按持仓量乘价格计算）
+        """
+        series = self._series.get(symbol)
+        if series is None:
+            series = self._series[symbol] = SymbolHistory()
+
+        if value_usdt is None:
+            value_usdt = open_interest * price
+        series.append(ts, open_interest, price, value_usdt)
+        series.trim(series.timestamps[-1] - self.retention_seconds)
+
+    def _window(self, series: SymbolHistory, minutes: int, now: Optional[float]) -> Optional[range]:
+        """查找窗口内记录的下标范围，窗口内无数据时依次扩大到30、60分钟"""
+        if now is None:
+            now = datetime.now(UTC8).timestamp()
+
+        end = series.index_after(now)
+        # 与数据库查询一致，向前多取2秒以包含边界数据
+        cutoffs = [now - minutes * 60 - 2]
+        cutoffs += [now - extended * 60 for extended in FALLBACK_WINDOWS_MINUTES if extended > minutes]
+
+        for cutoff in cutoffs:
+            begin = series.index_at_or_after(cutoff)
+            if begin < end:
+                return range(begin, end)
+
+        return None
+
+    def get_recent(self, symbol: str, minutes: int = 15, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        获取最近指定分钟数的记录，语义与DatabaseManager.get_recent_oi_data一致
+
+        Args:
+            symbol: 交易对符号
+            minutes: 时间范围（分钟）
+            now: 当前时间戳（秒，默认当前时间）
+
+        Returns:
+            List[Dict]: 历史数据列表，按时间升序排列
+        """
+        series = self._series.get(symbol)
+        if not series:
+            return []
+
+        window = self._window(series, minutes, now)
+        return [series.row(index) for index in window] if window else []
+
+    def get_window_baselines(self, symbols: Sequence[str], windows_minutes: Sequence[float],
+                             now: Optional[float] = None,
+                             fallback: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        一次取出所有交易对在多个窗口上的比较基准
+
+        每个窗口的基准是时间最接近 now - 窗口长度 的记录（允许偏差为窗口长度的
+        ASOF_TOLERANCE_FRACTION）。偏差范围内没有记录时，fallback为True则回退到目标时间之前
+        最近的一条记录（最早为窗口长度的BASELINE_FALLBACK_FACTOR倍之前，此时变化率覆盖的时间
+        长于窗口），为False则该窗口无基准。两种情况都不会用更近的数据代替。
+
+        Args:
+            symbols: 交易对列表
+            windows_minutes: 窗口长度列表（分钟）
+            now: 当前时间戳（秒，默认当前时间）
+            fallback: 时间点附近没有记录时是否回退到更早的记录
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (基准持仓量, 基准价格)，形状为(窗口数, 交易对数)，无基准时为NaN
+        """
+        if now is None:
+            now = datetime.now(UTC8).timestamp()
+
+        baseline_oi = np.full((len(windows_minutes), len(symbols)), np.nan)
+        baseline_price = np.full((len(windows_minutes), len(symbols)), np.nan)
+
+        for column, symbol in enumerate(symbols):
+            series = self._series.get(symbol)
+            if not series:
+                continue
+            for row, minutes in enumerate(windows_minutes):
+                index = series.baseline_index(now, minutes, fallback)
+                if index >= 0:
+                    baseline_oi[row, column] = series.open_interest[index]
+                    baseline_price[row, column] = series.prices[index]
+
+        return baseline_oi, baseline_price
+
+    def warm(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        使用数据库中的历史记录预热缓存
+
+        Args:
+            rows: 包含symbol、ts（毫秒）或timestamp、open_interest、price、value_usdt的记录
+
+        Returns:
+            int: 加载的记录数
+        """
+        count = 0
+        for row in rows:
+            if row.get('ts') is not None:
+                # 数据库中的UTC毫秒时间戳
+                ts = row['ts'] / 1000.0
+            else:
+                ts = row['timestamp']
+            if isinstance(ts, str):
+                ts = datetime.fromisoformat(ts)
+            if isinstance(ts, datetime):
+                if ts.tzinfo is None:
+                    ts = UTC8.localize(ts)
+                ts = ts.timestamp()
+
+            self.append(row['symbol'], ts, row['open_interest'], row['price'], row.get('value_usdt'))
+            count += 1
+
+        logger.info(f"历史缓存预热完成: {len(self._series)} 个交易对, {count} 条记录")
+        return count
+
+    def forget(self, symbols: Iterable[str]):
+        """移除已下架交易对的数据"""
+        for symbol in symbols:
+            self._series.pop(symbol, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return {
+            'symbols': len(self._series),
+            'records': sum(len(series) for series in self._series.values())
+        }
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+HTTP客户端连接池 - 为Binance和Telegram请求提供持久的keep-alive连接
+按主机维护独立的会话和连接池，并统计连接复用情况
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 各主机默认连接池大小（并发获取持仓量时需要较多的Binance连接）
+DEFAULT_POOL_SIZES: Dict[str, int] = {
+    'fapi.binance.com': 32,
+    'api.telegram.org': 2,
+}
+
+
+class HttpClient:
+    """按主机管理的HTTP会话池
+
+    每个主机使用独立的requests.Session和HTTPAdapter，连接在请求之间保持
+    keep-alive，避免为每个交易对重复进行TCP和TLS握手。
+    通过host_overrides可以把某个基础地址整体替换为本地桩服务器，便于基准测试。
+    """
+
+    def __init__(self, pool_sizes: Optional[Dict[str, int]] = None, default_pool_size: int = 4,
+                 host_overrides: Optional[Dict[str, str]] = None, timeout: float = 30.0):
+        """
+        初始化HTTP客户端
+
+        Args:
+            pool_sizes: 主机名到连接池大小的映射
+            default_pool_size: 未配置主机的连接池大小
+            host_overrides: 基础地址替换表，如 {'https://fapi.binance.com': 'http://127.0.0.1:8080'}
+            timeout: 默认请求超时（秒）
+        """
+        self.pool_sizes = dict(DEFAULT_POOL_SIZES)
+        if pool_sizes:
+            self.pool_sizes.update(pool_sizes)
+        self.default_pool_size = default_pool_size
+        self.host_overrides = dict(host_overrides or {})
+        self.timeout = timeout
+
+        self._sessions: Dict[str, requests.Session] = {}
+        self._adapters: Dict[str, HTTPAdapter] = {}
+        self._request_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _resolve_url(self, url: str) -> str:
+        """应用基础地址替换"""
+        for original, replacement in self.host_overrides.items():
+            if url.startswith(original):
+                return replacement + url[len(original):]
+        return url
+
+    def _get_session(self, url: str) -> requests.Session:
+        """获取（必要时创建）目标主机的会话"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                pool_size = self.pool_sizes.get(host.split(':')[0], self.default_pool_size)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+                self._adapters[host] = adapter
+                self._request_counts[host] = 0
+                logger.debug(f"创建HTTP会话: {host}，连接池大小 {pool_size}")
+            self._request_counts[host] += 1
+            return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发送HTTP请求
+
+        Args:
+            method: HTTP方法
+            url: 请求地址
+            **kwargs: 传递给requests的其他参数
+
+        Returns:
+            requests.Response: 响应对象
+        """
+        url = self._resolve_url(url)
+        kwargs.setdefault('timeout', self.timeout)
+        return self._get_session(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """发送GET请求"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """发送POST请求"""
+        return self.request('POST', url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取各主机的连接复用统计
+
+        Returns:
+            Dict: 每个主机的请求数、新建连接数和复用率
+        """
+        stats = {}
+        with self._lock:
+            for host, adapter in self._adapters.items():
+                new_connections = 0
+                for key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is not None:
+                        new_connections += pool.num_connections
+
+                requests_sent = self._request_counts.get(host, 0)
+                reused = max(requests_sent - new_connections, 0)
+                stats[host] = {
+                    'requests': requests_sent,
+                    'new_connections': new_connections,
+                    'reused_connections': reused,
+                    'reuse_rate': round(reused / requests_sent, 4) if requests_sent else 0.0
+                }
+        return stats
+
+    def close(self):
+        """关闭所有会话和连接"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._adapters.clear()
+            self._request_counts.clear()
+
+
+# 全局HTTP客户端实例
+_http_client = None
+
+
+def get_http_client(**kwargs) -> HttpClient:
+    """
+    获取全局HTTP客户端实例
+
+    Args:
+        **kwargs: 首次创建时的配置参数
+
+    Returns:
+        HttpClient实例
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = HttpClient(**kwargs)
+    return _http_client
+
+
+def set_http_client(client: Optional[HttpClient]):
+    """
+    替换全局HTTP客户端（例如基准测试时指向本地桩服务器）
+
+    Args:
+        client: 新的HttpClient实例，传入None则在下次获取时重新创建
+    """
+    global _http_client
+    if _http_client is not None and _http_client is not client:
+        _http_client.close()
+    _http_client = client
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+旧版JSON快照导入 - 把旧监控保存的binance_data.json导入oi_history
+流式解析data_store（symbol -> [[iso_ts, oi, price], ...]），不把整个文档读成嵌套列表，
+所有记录在一个事务中用executemany写入，已存在的(symbol, ts)跳过
+
+用法:
+    python legacy_import.py binance_data.json
+    python legacy_import.py snapshots/*.json --db data/binance_monitor.db --layout compact
+"""
+
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, Tuple
+
+from database_manager import DatabaseManager
+from oi_storage import STORAGE_LAYOUTS
+
+logger = logging.getLogger(__name__)
+
+# 每次从文件读取的字符数
+READ_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\r\n'
+
+# 旧版快照的时间没有时区信息，按UTC+8处理（与to_epoch_ms一致）。
+# Asia/Shanghai自1991年起没有夏令时，使用固定偏移避免每行调用pytz.localize
+_UTC8_FIXED = timezone(timedelta(hours=8))
+
+
+def _iso_to_epoch_ms(text: str) -> int:
+    """ISO-8601文本转换为UTC毫秒（无时区信息的按UTC+8处理）"""
+    dt = datetime.fromisoformat(text)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_UTC8_FIXED)
+    return int(round(dt.timestamp() * 1000))
+
+
+class _JsonStream:
+    """按需读取文件的最小JSON词法器：只解析当前需要的一个值，缓冲区只保留未消费的部分"""
+
+    def __init__(self, fp, chunk_size: int = READ_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """丢弃已消费的部分并读入下一块，文件结束时返回False"""
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白并返回下一个字符（文件结束时返回空字符串）"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        """消费一个结构字符"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON格式错误: 期望 '{char}'，实际为 '{found or 'EOF'}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """解析一个完整的JSON值（字符串、数字、数组或对象）"""
+        self.peek()
+        while True:
+            try:
+                result, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # 数字恰好在缓冲区末尾时可能被截断，读入更多内容后重新解析
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return result
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self._fill():
+                result, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+                return result
+
+    def items(self) -> Iterator[Tuple[str, None]]:
+        """遍历对象的键，调用方在每次迭代中负责消费对应的值"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key, None
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect('}')
+            return
+
+    def elements(self) -> Iterator[Any]:
+        """逐个解析数组元素"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return
+
+
+def iter_legacy_rows(path: str, stats: Dict[str, int]) -> Iterator[tuple]:
+    """
+    流式读取旧版JSON快照中的持仓量数据
+
+    Args:
+        path: JSON文件路径
+        stats: 统计信息（parsed / invalid / symbols），读取过程中更新
+
+    Yields:
+        tuple: oi_history插入参数（价格和持仓量变化率留空：快照间隔与监控的比较窗口不同，
+               相邻记录的变化率与监控写入的含义不一致，第一条记录也没有基准）
+    """
+    with open(path, 'r', encoding='utf-8') as fp:
+        stream = _JsonStream(fp)
+        for key, _ in stream.items():
+            if key != 'data_store':
+                stream.value()  # alert_cooldown、saved_at等其余字段直接跳过
+                continue
+
+            for symbol, _ in stream.items():
+                stats['symbols'] += 1
+                for entry in stream.elements():
+                    try:
+                        timestamp, open_interest, price = entry
+                        ts = _iso_to_epoch_ms(timestamp)
+                        open_interest = float(open_interest)
+                        price = float(price)
+                    except (TypeError, ValueError):
+                        stats['invalid'] += 1
+                        continue
+
+                    stats['parsed'] += 1
+                    yield (symbol, ts, open_interest, price, open_interest * price, None, None)
+
+
+def import_legacy_json(db: DatabaseManager, path: str) -> Dict[str, Any]:
+    """
+    导入一个旧版JSON快照（一个事务）
+
+    Args:
+        db: DatabaseManager实例
+        path: JSON文件路径
+
+    Returns:
+        Dict: 导入统计（解析行数、写入行数、跳过的重复行数、耗时和速度）
+    """
+    stats = {'symbols': 0, 'parsed': 0, 'invalid': 0}
+    start = time.time()
+    inserted = db.bulk_load_oi(iter_legacy_rows(path, stats))
+    duration = time.time() - start
+
+    result = {
+        'file': path,
+        'symbols': stats['symbols'],
+        'rows_parsed': stats['parsed'],
+        'rows_inserted': inserted,
+        'duplicates_skipped': stats['parsed'] - inserted,
+        'invalid_rows': stats['invalid'],
+        'duration': round(duration, 3),
+        'rows_per_second': round(stats['parsed'] / duration) if duration > 0 else stats['parsed'],
+    }
+    logger.info(f"导入旧版JSON快照完成: {result}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入旧版binance_data.json快照")
+    parser.add_argument("files", nargs='+', help="JSON快照文件")
+    parser.add_argument("--db", default="data/binance_monitor.db", help="数据库路径")
+    parser.add_argument("--layout", choices=sorted(STORAGE_LAYOUTS), default="standard",
+                        help="持仓量数据存储布局（须与监控配置一致）")
+    args = parser.parse_args()
+
+    db = DatabaseManager(db_path=args.db, storage_layout=args.layout)
+    try:
+        for path in args.files:
+            result = import_legacy_json(db, path)
+            print(f"{path}: {result['symbols']} 个交易对, 解析 {result['rows_parsed']:,} 行, "
+                  f"写入 {result['rows_inserted']:,} 行, 跳过重复 {result['duplicates_skipped']:,} 行, "
+                  f"耗时 {result['duration']:.2f}秒, {result['rows_per_second']:,} 行/秒")
+    finally:
+        db.shutdown()
+
+
+if __name__ == "__main__":
+    main()
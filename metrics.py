@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+指标注册表 - 在内存中累计计数器、仪表值和固定分桶直方图
+每个刷新间隔按指标汇总为一行写入数据库，取代每次调用写一行performance_metrics的方式
+"""
+
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶上界（适合以秒计的耗时和以个计的数量）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 1000)
+
+# 默认写入的百分位数
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+
+class _Series:
+    """一个指标（名称 + 交易对）在当前间隔内的累计值"""
+
+    __slots__ = ('kind', 'count', 'total', 'min', 'max', 'last', 'bucket_counts')
+
+    def __init__(self, kind: str, bucket_count: int = 0):
+        self.kind = kind
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.last = 0.0
+        # 直方图：每个上界一个计数，最后一个为超出所有上界的计数
+        self.bucket_counts = [0] * (bucket_count + 1) if kind == HISTOGRAM else None
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+
+def _bucket_percentile(bounds: Sequence[float], counts: List[int], total: int,
+                       minimum: float, maximum: float, percentile: float) -> float:
+    """按分桶计数估算百分位数（桶内线性插值，结果限制在观测到的最小最大值之间）"""
+    rank = percentile / 100.0 * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if count == 0:
+            continue
+        if seen + count >= rank:
+            lower = bounds[index - 1] if index > 0 else minimum
+            upper = bounds[index] if index < len(bounds) else maximum
+            lower = max(lower, minimum)
+            upper = min(upper, maximum)
+            fraction = (rank - seen) / count
+            return lower + (upper - lower) * fraction
+        seen += count
+    return maximum
+
+
+class MetricsRegistry:
+    """内存指标注册表
+
+    counter: 间隔内累加，写入总和；
+    gauge: 写入间隔内最后一次设置的值（以及最小最大值）；
+    histogram: 固定分桶计数，写入均值、最小最大值和百分位数。
+    collect()在间隔结束时为每个指标生成一行汇总并清空累计值，可被多个线程同时调用。
+    """
+
+    def __init__(self, flush_interval: float = 60.0,
+                 percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 histogram_buckets: Optional[Dict[str, Sequence[float]]] = None):
+        """
+        初始化指标注册表
+
+        Args:
+            flush_interval: 刷新间隔（秒）
+            percentiles: 直方图写入的百分位数
+            buckets: 默认直方图分桶上界（升序）
+            histogram_buckets: 个别指标使用的分桶上界
+        """
+        self.flush_interval = flush_interval
+        self.percentiles = tuple(percentiles)
+        self.buckets = tuple(sorted(buckets))
+        self.histogram_buckets = {
+            name: tuple(sorted(bounds)) for name, bounds in (histogram_buckets or {}).items()
+        }
+
+        self._series: Dict[Tuple[str, Optional[str]], _Series] = {}
+        self._lock = threading.Lock()
+        self._interval_start = time.time()
+
+        self.stats = {
+            'observations': 0,
+            'flushes': 0,
+            'rows_flushed': 0,
+        }
+
+    def _bounds(self, name: str) -> Tuple[float, ...]:
+        return self.histogram_buckets.get(name, self.buckets)
+
+    def _record(self, kind: str, name: str, value: float, symbol: Optional[str]):
+        with self._lock:
+            series = self._series.get((name, symbol))
+            if series is None:
+                series = _Series(kind, len(self._bounds(name)))
+                self._series[(name, symbol)] = series
+            elif series.kind != kind:
+                raise ValueError(f"指标 {name} 已注册为{series.kind}，不能作为{kind}使用")
+
+            series.add(value)
+            if kind == HISTOGRAM:
+                series.bucket_counts[bisect_left(self._bounds(name), value)] += 1
+            self.stats['observations'] += 1
+
+    def increment(self, name: str, value: float = 1, symbol: Optional[str] = None):
+        """计数器累加"""
+        self._record(COUNTER, name, value, symbol)
+
+    def set_gauge(self, name: str, value: float, symbol: Optional[str] = None):
+        """设置仪表值"""
+        self._record(GAUGE, name, value, symbol)
+
+    def observe(self, name: str, value: float, symbol: Optional[str] = None):
+        """记录一次直方图观测值"""
+        self._record(HISTOGRAM, name, value, symbol)
+
+    def flush_due(self, now: Optional[float] = None) -> bool:
+        """当前间隔是否已经结束"""
+        now = time.time() if now is None else now
+        return now - self._interval_start >= self.flush_interval
+
+    def _summarize(self, name: str, series: _Series) -> Tuple[float, Optional[str]]:
+        """指标的主值和汇总信息（JSON）"""
+        if series.kind == COUNTER:
+            return series.total, None
+        if series.kind == GAUGE:
+            return series.last, None
+
+        bounds = self._bounds(name)
+        summary = {
+            f"p{percentile:g}": _bucket_percentile(bounds, series.bucket_counts, series.count,
+                                                   series.min, series.max, percentile)
+            for percentile in self.percentiles
+        }
+        summary['buckets'] = {
+            (f"{bounds[index]:g}" if index < len(bounds) else '+Inf'): count
+            for index, count in enumerate(series.bucket_counts) if count
+        }
+        return series.total / series.count, json.dumps(summary, separators=(',', ':'))
+
+    def collect(self, now: Optional[float] = None) -> List[tuple]:
+        """
+        结束当前间隔并生成汇总行
+
+        Args:
+            now: 当前时间（秒），默认time.time()
+
+        Returns:
+            List[tuple]: metric_aggregates插入参数
+                (metric_name, metric_type, symbol, ts, interval_ms, sample_count,
+                 value, sum_value, min_value, max_value, summary)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            series_by_key = self._series
+            self._series = {}
+            interval_start = self._interval_start
+            self._interval_start = now
+
+        interval_ms = int(round((now - interval_start) * 1000))
+        ts = int(round(interval_start * 1000))
+        rows = []
+        for (name, symbol), series in sorted(series_by_key.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+            value, summary = self._summarize(name, series)
+            rows.append((name, series.kind, symbol, ts, interval_ms, series.count,
+                         value, series.total, series.min, series.max, summary))
+
+        self.stats['flushes'] += 1
+        self.stats['rows_flushed'] += len(rows)
+        return rows
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """当前间隔内各指标的累计值（不清空），用于状态查看"""
+        with self._lock:
+            items = list(self._series.items())
+        return {
+            f"{name}[{symbol}]" if symbol else name: {
+                'type': series.kind,
+                'count': series.count,
+                'value': self._summarize(name, series)[0],
+            }
+            for (name, symbol), series in items
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取注册表使用统计"""
+        with self._lock:
+            active = len(self._series)
+        return {
+            **self.stats,
+            'active_series': active,
+            'flush_interval': self.flush_interval,
+        }
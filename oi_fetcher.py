@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+持仓量并发获取引擎 - 基于线程池的有界并发扇出
+一次性获取所有交易对的持仓量，生成完整的 {symbol: oi} 快照
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OpenInterestFetcher:
+    """持仓量并发获取器
+
+    每个请求通过传入的同步获取函数完成（例如EnhancedBinanceMonitor.get_open_interest，
+    requests阻塞I/O），因此原有的速率限制和指数退避重试规则保持不变；
+    线程池的线程数即同时在途的最大请求数。
+    """
+
+    def __init__(self, fetch_func: Callable[[str], Optional[float]], max_concurrency: int = 20):
+        """
+        初始化持仓量获取器
+
+        Args:
+            fetch_func: 单个交易对的持仓量获取函数，失败时返回None
+            max_concurrency: 最大并发请求数（线程数）
+        """
+        self.fetch_func = fetch_func
+        self.max_concurrency = max(1, max_concurrency)
+
+        # 上一次扇出的统计信息
+        self.last_duration = 0.0
+        self.last_failed: List[str] = []
+
+    def _fetch_one(self, symbol: str) -> Optional[float]:
+        """获取单个交易对的持仓量，异常按失败处理"""
+        try:
+            return self.fetch_func(symbol)
+        except Exception as e:
+            logger.error(f"获取持仓量失败 {symbol}: {e}")
+            return None
+
+    def fetch_all(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """
+        并发获取所有交易对的持仓量，返回成功获取的快照
+
+        Args:
+            symbols: 交易对列表
+
+        Returns:
+            Dict[str, float]: 成功获取的交易对持仓量快照
+        """
+        start_time = time.time()
+        symbols = list(symbols)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, max(1, len(symbols))),
+                                thread_name_prefix="oi_fetch") as executor:
+            results = dict(zip(symbols, executor.map(self._fetch_one, symbols)))
+
+        snapshot = {symbol: oi for symbol, oi in results.items() if oi is not None}
+        self.last_failed = [symbol for symbol, oi in results.items() if oi is None]
+        self.last_duration = time.time() - start_time
+
+        logger.info(
+            f"持仓量并发获取完成: 成功 {len(snapshot)} 个, 失败 {len(self.last_failed)} 个, "
+            f"耗时 {self.last_duration:.2f}秒"
+        )
+        return snapshot
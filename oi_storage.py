@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+持仓量历史存储布局 - 决定oi_history数据在SQLite中的物理组织方式
+DatabaseManager通过布局对象写入、读取和清理持仓量数据，查询语句只依赖统一的读取源
+"""
+
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 读取源统一提供的列：symbol, ts, open_interest, price, value_usdt
+# 写入行统一格式：(symbol, ts, open_interest, price, value_usdt, price_change, oi_change)，与INSERT_SQL['oi_history']一致
+
+
+class StandardLayout:
+    """标准布局：自增主键的oi_history表，保存全部列"""
+
+    name = 'standard'
+    table = 'oi_history'
+    source = 'oi_history'
+    # 由触发器维护table_stats计数的物理表（None表示由DatabaseManager在写入和删除时维护）
+    stats_table = 'oi_history'
+
+    INSERT_SQL = """INSERT INTO oi_history
+        (symbol, ts, open_interest, price, value_usdt, price_change, oi_change)
+        VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+    # 只写入不存在的(symbol, ts)，通过idx_oi_symbol_ts判断
+    INSERT_MISSING_SQL = """INSERT INTO oi_history
+        (symbol, ts, open_interest, price, value_usdt, price_change, oi_change)
+        SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7
+        WHERE NOT EXISTS (SELECT 1 FROM oi_history WHERE symbol = ?1 AND ts = ?2)"""
+
+    def create_schema(self, cursor):
+        """创建索引（oi_history表本身由DatabaseManager创建）"""
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_oi_symbol_ts ON oi_history(symbol, ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_oi_ts ON oi_history(ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_oi_symbol_created ON oi_history(symbol, created_at)')
+
+    def readable_view(self, iso_sql: str) -> str:
+        """oi_history_readable视图的SELECT语句"""
+        return f'''
+            SELECT id, symbol, {iso_sql.format(column='ts')} AS timestamp,
+                   open_interest, price, value_usdt, price_change, oi_change, created_at, ts
+            FROM oi_history
+        '''
+
+    def insert_rows(self, cursor, rows: List[tuple]):
+        """批量写入"""
+        cursor.executemany(self.INSERT_SQL, rows)
+
+    def insert_missing_rows(self, cursor, rows: List[tuple]) -> int:
+        """批量写入，已存在的(symbol, ts)保持不变，返回实际写入的行数"""
+        cursor.executemany(self.INSERT_MISSING_SQL, rows)
+        return cursor.rowcount
+
+    def reset(self):
+        """写事务回滚后调用（标准布局没有需要丢弃的状态）"""
+
+    def delete_before(self, cursor, cutoff_ms: int, limit: int = -1) -> int:
+        """删除早于cutoff_ms的数据（最多limit行，-1表示不限），返回删除的行数"""
+        cursor.execute(
+            "DELETE FROM oi_history WHERE id IN (SELECT id FROM oi_history WHERE ts < ? ORDER BY ts LIMIT ?)",
+            (cutoff_ms, limit)
+        )
+        return cursor.rowcount
+
+    def count(self, cursor) -> int:
+        """记录总数"""
+        cursor.execute("SELECT COUNT(*) AS count FROM oi_history")
+        return cursor.fetchone()['count']
+
+    def latest_ts(self, cursor) -> Optional[int]:
+        """最新一条记录的时间戳"""
+        cursor.execute("SELECT MAX(ts) AS latest FROM oi_history")
+        return cursor.fetchone()['latest']
+
+    def symbols(self, cursor) -> List[str]:
+        """有数据的交易对（按(symbol, ts)索引去重，不读取表数据）"""
+        cursor.execute("SELECT DISTINCT symbol FROM oi_history ORDER BY symbol")
+        return [row['symbol'] for row in cursor.fetchall()]
+
+
+class CompactLayout:
+    """紧凑布局：symbols字典表 + 按(symbol_id, ts)聚簇的WITHOUT ROWID表
+
+    只保存持仓量和价格，value_usdt在读取时计算，price_change/oi_change
+    在可读视图中按相邻两条记录计算。主键即聚簇索引，不需要额外的二级索引，
+    每行写入只修改一棵B树。
+    """
+
+    name = 'compact'
+    table = 'oi_compact'
+    source = 'oi_compact_history'
+    stats_table = 'oi_compact'
+
+    INSERT_SYMBOL_SQL = "INSERT OR IGNORE INTO symbols (symbol) VALUES (?)"
+    INSERT_SQL = """INSERT OR REPLACE INTO oi_compact (symbol_id, ts, open_interest, price)
+        VALUES (?, ?, ?, ?)"""
+    INSERT_MISSING_SQL = """INSERT OR IGNORE INTO oi_compact (symbol_id, ts, open_interest, price)
+        VALUES (?, ?, ?, ?)"""
+
+    def __init__(self):
+        # 交易对到symbol_id的缓存，只在写连接上读写
+        self._symbol_ids: Dict[str, int] = {}
+
+    def create_schema(self, cursor):
+        """创建字典表、数据表和读取视图"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS symbols (
+                id INTEGER PRIMARY KEY,
+                symbol TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS oi_compact (
+                symbol_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                open_interest REAL NOT NULL,
+                price REAL NOT NULL,
+                PRIMARY KEY (symbol_id, ts)
+            ) WITHOUT ROWID
+        ''')
+        # CROSS JOIN固定以symbols为外层循环，按时间范围查询时对每个交易对走主键范围查找
+        cursor.execute("DROP VIEW IF EXISTS oi_compact_history")
+        cursor.execute('''
+            CREATE VIEW oi_compact_history AS
+            SELECT s.symbol, c.ts, c.open_interest, c.price,
+                   c.open_interest * c.price AS value_usdt
+            FROM symbols s
+            CROSS JOIN oi_compact c ON c.symbol_id = s.id
+        ''')
+        self._symbol_ids.clear()
+
+    def readable_view(self, iso_sql: str) -> str:
+        """oi_history_readable视图的SELECT语句，列与标准布局相同"""
+        return f'''
+            SELECT NULL AS id, s.symbol, {iso_sql.format(column='c.ts')} AS timestamp,
+                   c.open_interest, c.price, c.open_interest * c.price AS value_usdt,
+                   c.price / LAG(c.price) OVER w - 1 AS price_change,
+                   c.open_interest / LAG(c.open_interest) OVER w - 1 AS oi_change,
+                   NULL AS created_at, c.ts
+            FROM symbols s
+            JOIN oi_compact c ON c.symbol_id = s.id
+            WINDOW w AS (PARTITION BY c.symbol_id ORDER BY c.ts)
+        '''
+
+    def _symbol_id(self, cursor, symbol: str) -> int:
+        """获取交易对编号，不存在时登记"""
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            cursor.execute(self.INSERT_SYMBOL_SQL, (symbol,))
+            cursor.execute("SELECT id FROM symbols WHERE symbol = ?", (symbol,))
+            symbol_id = self._symbol_ids[symbol] = cursor.fetchone()['id']
+        return symbol_id
+
+    def insert_rows(self, cursor, rows: List[tuple]):
+        """批量写入（同一交易对同一毫秒的重复数据以后写入的为准）"""
+        cursor.executemany(self.INSERT_SQL, [
+            (self._symbol_id(cursor, row[0]), row[1], row[2], row[3]) for row in rows
+        ])
+
+    def insert_missing_rows(self, cursor, rows: List[tuple]) -> int:
+        """批量写入，已存在的(symbol, ts)保持不变，返回实际写入的行数"""
+        cursor.executemany(self.INSERT_MISSING_SQL, [
+            (self._symbol_id(cursor, row[0]), row[1], row[2], row[3]) for row in rows
+        ])
+        return cursor.rowcount
+
+    def reset(self):
+        """丢弃编号缓存（写事务回滚后新登记的编号可能已失效）"""
+        self._symbol_ids.clear()
+
+    def delete_before(self, cursor, cutoff_ms: int, limit: int = -1) -> int:
+        """按交易对逐个范围删除（最多limit行，-1表示不限），每个交易对只访问主键的一段前缀"""
+        cursor.execute(
+            """DELETE FROM oi_compact WHERE (symbol_id, ts) IN (
+                SELECT symbol_id, ts FROM oi_compact
+                WHERE symbol_id IN (SELECT id FROM symbols) AND ts < ? LIMIT ?
+            )""",
+            (cutoff_ms, limit)
+        )
+        return cursor.rowcount
+
+    def count(self, cursor) -> int:
+        """记录总数"""
+        cursor.execute("SELECT COUNT(*) AS count FROM oi_compact")
+        return cursor.fetchone()['count']
+
+    def latest_ts(self, cursor) -> Optional[int]:
+        """最新一条记录的时间戳（每个交易对取主键末尾，避免全表扫描）"""
+        cursor.execute(
+            """SELECT MAX((SELECT MAX(ts) FROM oi_compact WHERE symbol_id = s.id)) AS latest
+            FROM symbols s"""
+        )
+        return cursor.fetchone()['latest']
+
+    def symbols(self, cursor) -> List[str]:
+        """字典表中的交易对（可能包含已没有数据的交易对）"""
+        cursor.execute("SELECT symbol FROM symbols ORDER BY symbol")
+        return [row['symbol'] for row in cursor.fetchall()]
+
+    def import_standard(self, cursor, chunk_size: int = 50000) -> int:
+        """
+        把oi_history中的一块数据移动到紧凑表（复制和删除在同一事务中，可重复调用直到返回0）
+
+        Args:
+            cursor: 写连接游标
+            chunk_size: 本次移动的行数
+
+        Returns:
+            int: 移动的行数
+        """
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("SELECT MAX(id) AS last_id FROM (SELECT id FROM oi_history ORDER BY id LIMIT ?)",
+                           (chunk_size,))
+            last_id = cursor.fetchone()['last_id']
+            if last_id is None:
+                cursor.execute("COMMIT")
+                return 0
+
+            cursor.execute(
+                "INSERT OR IGNORE INTO symbols (symbol) SELECT DISTINCT symbol FROM oi_history WHERE id <= ?",
+                (last_id,)
+            )
+            cursor.execute(
+                """INSERT OR REPLACE INTO oi_compact (symbol_id, ts, open_interest, price)
+                SELECT s.id, h.ts, h.open_interest, h.price
+                FROM oi_history h JOIN symbols s ON s.symbol = h.symbol
+                WHERE h.id <= ? ORDER BY h.id""",
+                (last_id,)
+            )
+            moved = cursor.rowcount
+            cursor.execute("DELETE FROM oi_history WHERE id <= ?", (last_id,))
+            cursor.execute("COMMIT")
+            return moved
+        except Exception:
+            cursor.execute("ROLLBACK")
+            self.reset()
+            raise
+
+
+# 分区时长（UTC自然日，毫秒）
+PARTITION_MS = 86400 * 1000
+
+
+class PartitionedLayout(CompactLayout):
+    """按天分区布局：每个UTC自然日一张紧凑表oi_p_YYYYMMDD
+
+    写入按时间路由到对应分区（不存在时自动创建），读取通过UNION ALL视图，
+    过期数据整张分区DROP，不需要逐行删除。分区目录表oi_partitions记录
+    每个分区的起始时间和行数。SQLite单个复合查询最多500个分支，
+    因此保留期不应超过约500天。
+    """
+
+    name = 'partitioned'
+    table = 'oi_partitions'
+    source = 'oi_partitioned_history'
+    # 分区表随时创建和删除，不安装触发器
+    stats_table = None
+
+    def __init__(self):
+        super().__init__()
+        # 分区起始时间到表名的缓存，只在写连接上读写
+        self._partitions: Optional[Dict[int, str]] = None
+
+    @staticmethod
+    def partition_name(day_start: int) -> str:
+        """分区表名"""
+        return "oi_p_" + datetime.fromtimestamp(day_start / 1000, timezone.utc).strftime('%Y%m%d')
+
+    def create_schema(self, cursor):
+        """创建字典表、分区目录表和读取视图"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS symbols (
+                id INTEGER PRIMARY KEY,
+                symbol TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS oi_partitions (
+                day_start INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                row_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self.reset()
+        self._refresh_view(cursor)
+
+    def reset(self):
+        """丢弃编号和分区缓存"""
+        super().reset()
+        self._partitions = None
+
+    def _load_partitions(self, cursor) -> Dict[int, str]:
+        """读取分区目录"""
+        if self._partitions is None:
+            cursor.execute("SELECT day_start, name FROM oi_partitions ORDER BY day_start")
+            self._partitions = {row['day_start']: row['name'] for row in cursor.fetchall()}
+        return self._partitions
+
+    def _refresh_view(self, cursor):
+        """按当前分区重建UNION ALL读取视图"""
+        partitions = self._load_partitions(cursor)
+        # 每个分支都以symbols为外层循环（CROSS JOIN），时间范围条件下推后走主键范围查找
+        branches = [
+            f"""SELECT s.symbol, p.ts, p.open_interest, p.price, p.open_interest * p.price AS value_usdt
+            FROM symbols s CROSS JOIN {name} p ON p.symbol_id = s.id"""
+            for _, name in sorted(partitions.items())
+        ] or ["""SELECT NULL AS symbol, NULL AS ts, NULL AS open_interest, NULL AS price,
+            NULL AS value_usdt WHERE 0"""]
+
+        cursor.execute(f"DROP VIEW IF EXISTS {self.source}")
+        cursor.execute(f"CREATE VIEW {self.source} AS " + " UNION ALL ".join(branches))
+
+    def _partition_for(self, cursor, day_start: int) -> str:
+        """获取分区表名，不存在时创建分区并重建视图"""
+        partitions = self._load_partitions(cursor)
+        name = partitions.get(day_start)
+        if name is None:
+            name = self.partition_name(day_start)
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {name} (
+                    symbol_id INTEGER NOT NULL,
+                    ts INTEGER NOT NULL,
+                    open_interest REAL NOT NULL,
+                    price REAL NOT NULL,
+                    PRIMARY KEY (symbol_id, ts)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute("INSERT OR IGNORE INTO oi_partitions (day_start, name) VALUES (?, ?)",
+                           (day_start, name))
+            partitions[day_start] = name
+            self._refresh_view(cursor)
+            logger.info(f"创建持仓量数据分区: {name}")
+        return name
+
+    def readable_view(self, iso_sql: str) -> str:
+        """oi_history_readable视图的SELECT语句，列与标准布局相同"""
+        return f'''
+            SELECT NULL AS id, symbol, {iso_sql.format(column='ts')} AS timestamp,
+                   open_interest, price, value_usdt,
+                   price / LAG(price) OVER w - 1 AS price_change,
+                   open_interest / LAG(open_interest) OVER w - 1 AS oi_change,
+                   NULL AS created_at, ts
+            FROM {self.source}
+            WINDOW w AS (PARTITION BY symbol ORDER BY ts)
+        '''
+
+    def insert_rows(self, cursor, rows: List[tuple]):
+        """按天路由写入对应分区，已存在的(symbol, ts)用新值覆盖，分区目录只计入新增的行"""
+        by_partition: Dict[int, List[tuple]] = {}
+        for row in rows:
+            by_partition.setdefault(row[1] - row[1] % PARTITION_MS, []).append(
+                (self._symbol_id(cursor, row[0]), row[1], row[2], row[3])
+            )
+
+        for day_start, partition_rows in by_partition.items():
+            name = self._partition_for(cursor, day_start)
+            cursor.executemany(
+                f"""INSERT OR IGNORE INTO {name} (symbol_id, ts, open_interest, price)
+                VALUES (?, ?, ?, ?)""",
+                partition_rows
+            )
+            written = cursor.rowcount
+            if written < len(partition_rows):
+                # 有重复的(symbol, ts)：按写入顺序覆盖，与INSERT OR REPLACE结果相同
+                cursor.executemany(
+                    f"UPDATE {name} SET open_interest = ?, price = ? WHERE symbol_id = ? AND ts = ?",
+                    [(oi, price, symbol_id, ts) for symbol_id, ts, oi, price in partition_rows]
+                )
+            cursor.execute("UPDATE oi_partitions SET row_count = row_count + ? WHERE day_start = ?",
+                           (written, day_start))
+
+    def insert_missing_rows(self, cursor, rows: List[tuple]) -> int:
+        """按天路由写入，已存在的(symbol, ts)保持不变，返回实际写入的行数"""
+        by_partition: Dict[int, List[tuple]] = {}
+        for row in rows:
+            by_partition.setdefault(row[1] - row[1] % PARTITION_MS, []).append(
+                (self._symbol_id(cursor, row[0]), row[1], row[2], row[3])
+            )
+
+        inserted = 0
+        for day_start, partition_rows in by_partition.items():
+            name = self._partition_for(cursor, day_start)
+            cursor.executemany(
+                f"""INSERT OR IGNORE INTO {name} (symbol_id, ts, open_interest, price)
+                VALUES (?, ?, ?, ?)""",
+                partition_rows
+            )
+            written = cursor.rowcount
+            inserted += written
+            cursor.execute("UPDATE oi_partitions SET row_count = row_count + ? WHERE day_start = ?",
+                           (written, day_start))
+        return inserted
+
+    def delete_before(self, cursor, cutoff_ms: int, limit: int = -1) -> int:
+        """
+        删除早于cutoff_ms的数据
+
+        完全过期的分区整张DROP（不受limit限制），截止时间所在的分区
+        最多逐行删除limit行。
+        """
+        partitions = self._load_partitions(cursor)
+        deleted = 0
+        dropped = []
+
+        for day_start, name in sorted(partitions.items()):
+            if day_start + PARTITION_MS <= cutoff_ms:
+                cursor.execute("SELECT row_count FROM oi_partitions WHERE day_start = ?", (day_start,))
+                deleted += cursor.fetchone()['row_count']
+                cursor.execute(f"DROP TABLE IF EXISTS {name}")
+                cursor.execute("DELETE FROM oi_partitions WHERE day_start = ?", (day_start,))
+                dropped.append(day_start)
+            elif day_start < cutoff_ms:
+                cursor.execute(
+                    f"""DELETE FROM {name} WHERE (symbol_id, ts) IN (
+                        SELECT symbol_id, ts FROM {name}
+                        WHERE symbol_id IN (SELECT id FROM symbols) AND ts < ? LIMIT ?
+                    )""",
+                    (cutoff_ms, limit)
+                )
+                partial = cursor.rowcount
+                deleted += partial
+                cursor.execute("UPDATE oi_partitions SET row_count = row_count - ? WHERE day_start = ?",
+                               (partial, day_start))
+
+        if dropped:
+            logger.info(f"删除过期分区: {', '.join(partitions[day] for day in dropped)}")
+            for day_start in dropped:
+                del partitions[day_start]
+            self._refresh_view(cursor)
+
+        return deleted
+
+    def count(self, cursor) -> int:
+        """记录总数（由分区目录维护）"""
+        cursor.execute("SELECT COALESCE(SUM(row_count), 0) AS count FROM oi_partitions")
+        return cursor.fetchone()['count']
+
+    def recount(self, cursor):
+        """按分区实际行数校正分区目录（用于修复旧版本覆盖写入时累计偏大的行数）"""
+        for day_start, name in self._load_partitions(cursor).items():
+            cursor.execute(
+                f"UPDATE oi_partitions SET row_count = (SELECT COUNT(*) FROM {name}) WHERE day_start = ?",
+                (day_start,)
+            )
+
+    def latest_ts(self, cursor) -> Optional[int]:
+        """最新一条记录的时间戳（只查最新的分区）"""
+        cursor.execute("SELECT name FROM oi_partitions WHERE row_count > 0 ORDER BY day_start DESC LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        cursor.execute(
+            f"""SELECT MAX((SELECT MAX(ts) FROM {row['name']} WHERE symbol_id = s.id)) AS latest
+            FROM symbols s"""
+        )
+        return cursor.fetchone()['latest']
+
+    def partition_stats(self, cursor, with_sizes: bool = True) -> List[Dict[str, Any]]:
+        """
+        各分区的行数和占用空间
+
+        Args:
+            with_sizes: 是否统计占用空间（dbstat需要遍历数据库页）
+
+        Returns:
+            List[Dict]: 按时间升序的分区信息（不统计或SQLite未编译dbstat时size_bytes为None）
+        """
+        cursor.execute("SELECT day_start, name, row_count FROM oi_partitions ORDER BY day_start")
+        partitions = [dict(row) for row in cursor.fetchall()]
+
+        sizes: Dict[str, int] = {}
+        if with_sizes:
+            try:
+                cursor.execute(
+                    """SELECT name, SUM(pgsize) AS size FROM dbstat
+                    WHERE name IN (SELECT name FROM oi_partitions) GROUP BY name"""
+                )
+                sizes = {row['name']: row['size'] for row in cursor.fetchall()}
+            except sqlite3.OperationalError:
+                pass
+
+        return [{
+            'name': partition['name'],
+            'date': datetime.fromtimestamp(partition['day_start'] / 1000, timezone.utc).strftime('%Y-%m-%d'),
+            'rows': partition['row_count'],
+            'size_bytes': sizes.get(partition['name']) if sizes else None
+        } for partition in partitions]
+
+    def import_standard(self, cursor, chunk_size: int = 50000) -> int:
+        """把oi_history中的一块数据按天移动到分区（复制和删除在同一事务中）"""
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("SELECT MAX(id) AS last_id FROM (SELECT id FROM oi_history ORDER BY id LIMIT ?)",
+                           (chunk_size,))
+            last_id = cursor.fetchone()['last_id']
+            if last_id is None:
+                cursor.execute("COMMIT")
+                return 0
+
+            cursor.execute("SELECT symbol, ts, open_interest, price FROM oi_history WHERE id <= ? ORDER BY id",
+                           (last_id,))
+            rows = [tuple(row) for row in cursor.fetchall()]
+            self.insert_rows(cursor, rows)
+            cursor.execute("DELETE FROM oi_history WHERE id <= ?", (last_id,))
+            cursor.execute("COMMIT")
+            return len(rows)
+        except Exception:
+            cursor.execute("ROLLBACK")
+            self.reset()
+            raise
+
+
+STORAGE_LAYOUTS = {
+    StandardLayout.name: StandardLayout,
+    CompactLayout.name: CompactLayout,
+    PartitionedLayout.name: PartitionedLayout,
+}
+
+
+def create_layout(name: str) -> Any:
+    """
+    按名称创建存储布局
+
+    Args:
+        name: 布局名称（standard / compact / partitioned）
+
+    Returns:
+        存储布局对象
+    """
+    try:
+        return STORAGE_LAYOUTS[name]()
+    except KeyError:
+        raise ValueError(f"未知的存储布局: {name}（可选: {', '.join(STORAGE_LAYOUTS)}）")
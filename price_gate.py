@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+价格门控 - 根据批量价格筛选需要获取持仓量的交易对
+警报需要价格和持仓量同时超过阈值，价格未达到阈值的交易对只需低频刷新持仓量
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from history_cache import SymbolHistory, baseline_lookback_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class PriceGate:
+    """价格门控器
+
+    使用每个周期的批量价格维护一份内存中的价格历史，以此作为价格变化基准，
+    基准的定义与警报评估相同（SymbolHistory.baseline_index）。
+    任一比较窗口的价格变化达到该窗口阈值（或没有基准）的交易对优先获取持仓量，
+    其余交易对每隔若干个周期在后台刷新一次。后台刷新的交易对在 now - 窗口长度 附近通常
+    没有持仓量记录，价格突破时的持仓量基准来自回退（上一次刷新的记录），
+    因此刷新间隔须在回退范围内（由resolve_change_windows校验）。
+    """
+
+    def __init__(self, windows: Sequence[Tuple[float, float]] = ((15, 0.02),),
+                 background_refresh_cycles: int = 4, fallback: bool = True):
+        """
+        初始化价格门控器
+
+        Args:
+            windows: 比较窗口及其价格变化阈值 (窗口分钟数, 价格变化阈值)，与警报评估的窗口一致
+            background_refresh_cycles: 未通过门控的交易对每隔多少个周期刷新一次持仓量
+            fallback: 基准时间点附近没有价格时是否回退到更早的价格（与警报评估的baseline_fallback一致）
+        """
+        self.windows = sorted(windows)
+        if not self.windows:
+            raise ValueError("价格门控至少需要一个比较窗口")
+        self.background_refresh_cycles = max(1, background_refresh_cycles)
+        self.fallback = fallback
+        self.retention_seconds = baseline_lookback_seconds(self.windows[-1][0], fallback) + 60
+
+        # 只使用价格列，持仓量列记为NaN
+        self._history: Dict[str, SymbolHistory] = {}
+        self._last_fetch_cycle: Dict[str, int] = {}
+        self.cycle = 0
+
+    def record_prices(self, prices: Dict[str, float], now: float):
+        """
+        记录本周期的批量价格
+
+        Args:
+            prices: 交易对到价格的映射
+            now: 当前时间戳（秒）
+        """
+        cutoff = now - self.retention_seconds
+        for symbol, price in prices.items():
+            history = self._history.get(symbol)
+            if history is None:
+                history = self._history[symbol] = SymbolHistory()
+            history.append(now, float('nan'), price, float('nan'))
+            history.trim(cutoff)
+
+    def get_baseline_price(self, symbol: str, now: float, window_minutes: float = 15) -> Optional[float]:
+        """
+        获取价格基准：时间最接近 now - 窗口长度 的价格，规则与HistoryCache.get_window_baselines相同
+
+        Args:
+            symbol: 交易对符号
+            now: 当前时间戳（秒）
+            window_minutes: 比较窗口（分钟）
+
+        Returns:
+            Optional[float]: 基准价格，无可用数据时返回None
+        """
+        history = self._history.get(symbol)
+        if not history:
+            return None
+
+        index = history.baseline_index(now, window_minutes, self.fallback)
+        return history.prices[index] if index >= 0 else None
+
+    def _crossed(self, symbol: str, current_price: float, now: float) -> bool:
+        """任一窗口的价格变化达到阈值，或任一窗口没有基准时返回True"""
+        for window_minutes, price_change_threshold in self.windows:
+            baseline = self.get_baseline_price(symbol, now, window_minutes)
+            if not baseline or abs(current_price - baseline) / baseline >= price_change_threshold:
+                return True
+        return False
+
+    def select(self, symbols: Iterable[str], prices: Dict[str, float],
+               now: float) -> Tuple[List[str], List[str]]:
+        """
+        按价格门控划分交易对
+
+        Args:
+            symbols: 本周期的交易对列表
+            prices: 批量获取的当前价格
+            now: 当前时间戳（秒）
+
+        Returns:
+            Tuple[List[str], List[str]]: (优先获取列表, 后台刷新列表)
+        """
+        self.cycle += 1
+        priority = []
+        background = []
+
+        for symbol in symbols:
+            current_price = prices.get(symbol)
+
+            # 无价格或无基准时无法判断，按优先处理
+            if current_price is None or self._crossed(symbol, current_price, now):
+                priority.append(symbol)
+            elif self.cycle - self._last_fetch_cycle.get(symbol, 0) >= self.background_refresh_cycles:
+                background.append(symbol)
+
+        logger.debug(f"价格门控: 优先 {len(priority)} 个, 后台 {len(background)} 个")
+        return priority, background
+
+    def mark_fetched(self, symbols: Iterable[str]):
+        """记录本周期已获取持仓量的交易对"""
+        for symbol in symbols:
+            self._last_fetch_cycle[symbol] = self.cycle
+
+    def forget(self, symbols: Iterable[str]):
+        """移除已下架交易对的状态"""
+        for symbol in symbols:
+            self._history.pop(symbol, None)
+            self._last_fetch_cycle.pop(symbol, None)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+请求权重速率限制器 - 基于令牌桶按Binance接口权重进行限流
+根据响应头 X-MBX-USED-WEIGHT-1M 校正本地估计，可在多个线程间共享使用
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Binance U本位合约接口权重（参见官方文档）
+ENDPOINT_WEIGHTS: Dict[str, int] = {
+    '/fapi/v1/exchangeInfo': 1,
+    '/fapi/v1/openInterest': 1,
+    '/fapi/v1/ticker/price': 1,   # 不带symbol时为2
+    '/fapi/v1/ticker/24hr': 40,   # 带symbol时为1
+    '/fapi/v1/klines': 5,         # 按limit分级，见get_endpoint_weight
+    '/futures/data/openInterestHist': 1,  # 另有每IP每5分钟1000次的独立限制，按1计入权重预算
+}
+
+# K线接口权重：(limit上限（不含）, 权重)
+KLINES_WEIGHT_TIERS = ((100, 1), (500, 2), (1001, 5))
+
+# 已用权重响应头
+USED_WEIGHT_HEADER = 'X-MBX-USED-WEIGHT-1M'
+
+
+def get_endpoint_weight(path: str, params: Optional[Mapping[str, Any]] = None) -> int:
+    """
+    获取接口的请求权重
+
+    Args:
+        path: 接口路径，如 /fapi/v1/openInterest
+        params: 请求参数（部分接口的权重取决于是否带symbol）
+
+    Returns:
+        int: 请求权重，未知接口按1计算
+    """
+    has_symbol = bool(params and params.get('symbol'))
+
+    if path == '/fapi/v1/ticker/24hr' and has_symbol:
+        return 1
+    if path == '/fapi/v1/ticker/price' and not has_symbol:
+        return 2
+    if path == '/fapi/v1/klines':
+        limit = int((params or {}).get('limit', 500))
+        for upper, weight in KLINES_WEIGHT_TIERS:
+            if limit < upper:
+                return weight
+        return 10
+
+    return ENDPOINT_WEIGHTS.get(path, 1)
+
+
+class WeightRateLimiter:
+    """按请求权重计费的令牌桶限流器
+
+    令牌以 capacity/60 每秒的速度匀速补充。每次获取都是O(1)操作：
+    直接从桶中预扣权重，余额为负时按欠额计算需要等待的时间，
+    因此并发调用者会自动按到达顺序排队，无需维护请求时间列表。
+    """
+
+    def __init__(self, max_weight_per_minute: int = 2400, safety_margin: float = 0.95):
+        """
+        初始化限流器
+
+        Args:
+            max_weight_per_minute: 交易所每分钟权重上限
+            safety_margin: 实际使用的上限比例，为服务端计数误差预留余量
+        """
+        self.max_weight_per_minute = max_weight_per_minute
+        self.capacity = max_weight_per_minute * safety_margin
+        self.refill_rate = self.capacity / 60.0
+
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.total_weight = 0
+        self.total_requests = 0
+        self.total_waits = 0
+        self.total_wait_time = 0.0
+        self.header_corrections = 0
+        self.last_used_weight: Optional[int] = None
+
+    def _refill(self, now: float):
+        """按流逝时间补充令牌（调用方需持有锁）"""
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_rate)
+            self._last_refill = now
+
+    def _reserve(self, weight: int) -> float:
+        """预扣权重并返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= weight
+
+            wait_time = 0.0
+            if self._tokens < 0:
+                wait_time = -self._tokens / self.refill_rate
+            wait_time = max(wait_time, self._paused_until - now)
+
+            self.total_weight += weight
+            self.total_requests += 1
+            if wait_time > 0:
+                self.total_waits += 1
+                self.total_wait_time += wait_time
+
+            return wait_time
+
+    def acquire(self, weight: int = 1) -> float:
+        """
+        阻塞直到可以发送指定权重的请求（线程安全）
+
+        Args:
+            weight: 请求权重
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        wait_time = self._reserve(weight)
+        if wait_time > 0:
+            if wait_time > 1:
+                logger.warning(f"请求权重接近上限，等待 {wait_time:.2f} 秒")
+            time.sleep(wait_time)
+        return wait_time
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """
+        根据响应头中的已用权重校正本地估计
+
+        服务端计数高于本地估计时（例如同一IP上还有其他进程），
+        将可用令牌下调到服务端剩余额度；只向下校正，保持保守。
+
+        Args:
+            headers: HTTP响应头
+        """
+        used_weight = headers.get(USED_WEIGHT_HEADER) if headers else None
+        if used_weight is None:
+            return
+
+        try:
+            used_weight = int(used_weight)
+        except (TypeError, ValueError):
+            return
+
+        with self._lock:
+            self.last_used_weight = used_weight
+            self._refill(time.monotonic())
+            server_remaining = self.capacity - used_weight
+            if server_remaining < self._tokens:
+                self._tokens = server_remaining
+                self.header_corrections += 1
+
+    def pause(self, seconds: float):
+        """
+        在指定时间内暂停所有请求（用于429/418响应的Retry-After）
+
+        Args:
+            seconds: 暂停秒数
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流器统计信息"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'max_weight_per_minute': self.max_weight_per_minute,
+                'available_weight': round(self._tokens, 2),
+                'total_weight': self.total_weight,
+                'total_requests': self.total_requests,
+                'total_waits': self.total_waits,
+                'total_wait_time': round(self.total_wait_time, 3),
+                'header_corrections': self.header_corrections,
+                'last_used_weight': self.last_used_weight
+            }
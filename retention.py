@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+增量数据保留 - 分块删除过期数据并逐步回收空闲页
+每块删除是一个独立的短事务，一轮清理可以分散到多个监控周期中完成，不会长时间占用写锁
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 清理顺序：表名 -> 结果统计中的键名（与cleanup_old_data的返回值一致）
+RETENTION_RESULT_KEYS = {
+    'oi_history': 'oi_records_deleted',
+    'alerts': 'alert_records_deleted',
+    'error_logs': 'error_logs_deleted',
+    'performance_metrics': 'performance_metrics_deleted',
+    'metric_aggregates': 'metric_aggregates_deleted',
+    'oi_rollup_1h': 'rollup_1h_deleted',
+    'oi_rollup_1d': 'rollup_1d_deleted',
+}
+
+# 删除完成后回收空闲页的任务名
+VACUUM_TASK = 'incremental_vacuum'
+
+# 删除持仓量数据之前写冷数据归档的任务名
+ARCHIVE_TASK = 'archive_oi_history'
+
+DAY_MS = 86400 * 1000
+
+
+class RetentionEngine:
+    """增量清理引擎
+
+    start_pass()确定本轮各表的截止时间，之后每次step()在时间预算内
+    依次分块删除各表的过期数据，最后用incremental_vacuum分批归还空闲页。
+    一轮未完成时下一次step()从中断处继续。
+
+    配置了归档器时，持仓量数据的截止时间向下取整到UTC零点，删除之前
+    先把每个过期的自然日写入归档文件；归档失败时本轮不删除持仓量数据。
+    """
+
+    def __init__(self, db, data_retention_days: int = 30, alert_retention_days: int = 90,
+                 error_retention_days: int = 7, metric_retention_days: int = 30,
+                 hourly_retention_days: Optional[int] = 180, daily_retention_days: Optional[int] = None,
+                 chunk_size: int = 5000, time_budget: Optional[float] = 0.5,
+                 vacuum_pages: int = 1000, archiver=None):
+        """
+        初始化清理引擎
+
+        Args:
+            db: DatabaseManager实例
+            data_retention_days: 持仓量数据保留天数
+            alert_retention_days: 警报记录保留天数
+            error_retention_days: 错误日志保留天数
+            metric_retention_days: 性能指标保留天数
+            hourly_retention_days: 小时汇总保留天数（None表示永久保留）
+            daily_retention_days: 日线汇总保留天数（None表示永久保留）
+            chunk_size: 每个删除事务最多删除的行数
+            time_budget: 每次step()的时间预算（秒），None表示一直执行到本轮完成
+            vacuum_pages: 每次incremental_vacuum最多回收的页数
+            archiver: 冷数据归档（ColdArchive实例，None表示过期数据直接删除）
+        """
+        self.db = db
+        self.retention_days = {
+            'oi_history': data_retention_days,
+            'alerts': alert_retention_days,
+            'error_logs': error_retention_days,
+            'performance_metrics': metric_retention_days,
+            'metric_aggregates': metric_retention_days,
+            'oi_rollup_1h': hourly_retention_days,
+            'oi_rollup_1d': daily_retention_days,
+        }
+        self.chunk_size = max(1, chunk_size)
+        self.time_budget = time_budget
+        self.vacuum_pages = max(1, vacuum_pages)
+        self.archiver = archiver
+
+        self._pending: List[str] = []
+        self._cutoffs: Dict[str, Any] = {}
+        self._archive_days: List[int] = []
+        self._pass_started = 0.0
+        self.pass_stats: Dict[str, int] = {}
+        self.passes_completed = 0
+        self.last_pass_duration = 0.0
+
+    @property
+    def active(self) -> bool:
+        """当前是否有未完成的清理轮次"""
+        return bool(self._pending)
+
+    def start_pass(self):
+        """开始新一轮清理（上一轮未完成时继续上一轮）"""
+        if self.active:
+            logger.info(f"上一轮数据清理尚未完成，剩余任务: {self._pending}")
+            return
+
+        # 保留天数为None的表不清理
+        self._cutoffs = {
+            table: self.db.retention_cutoff(table, days)
+            for table, days in self.retention_days.items() if days is not None
+        }
+        self._pending = [table for table in RETENTION_RESULT_KEYS if table in self._cutoffs] + [VACUUM_TASK]
+        self._pass_started = time.time()
+        self.pass_stats = {key: 0 for key in RETENTION_RESULT_KEYS.values()}
+        self.pass_stats['pages_freed'] = 0
+
+        if self.archiver is not None and 'oi_history' in self._cutoffs:
+            self._prepare_archive()
+        logger.info("开始新一轮增量数据清理")
+
+    def _prepare_archive(self):
+        """确定本轮需要归档的自然日，并在删除持仓量数据之前插入归档任务"""
+        cutoff = self._cutoffs['oi_history']
+        cutoff -= cutoff % DAY_MS
+        self._cutoffs['oi_history'] = cutoff
+
+        self.pass_stats['days_archived'] = 0
+        self._archive_days = []
+        try:
+            earliest = self.db.get_oi_earliest_ts()
+        except Exception as e:
+            self._cancel_oi_deletion(e)
+            return
+
+        if earliest is not None:
+            self._archive_days = [
+                day for day in range(earliest - earliest % DAY_MS, cutoff, DAY_MS)
+                if not self.archiver.has_day(day)
+            ]
+        if self._archive_days:
+            self._pending.insert(self._pending.index('oi_history'), ARCHIVE_TASK)
+
+    def _cancel_oi_deletion(self, error: Exception):
+        """归档失败：本轮不删除持仓量数据，其余表照常清理"""
+        logger.error(f"冷数据归档失败，本轮保留持仓量数据: {error}")
+        self._archive_days = []
+        self._pending = [task for task in self._pending if task not in (ARCHIVE_TASK, 'oi_history')]
+
+    def _archive_next_day(self):
+        """归档一个自然日"""
+        day = self._archive_days[0]
+        try:
+            rows = self.db.get_oi_rows_between(day, day + DAY_MS)
+            if rows:
+                self.archiver.write_day(day, rows)
+                self.pass_stats['days_archived'] += 1
+        except Exception as e:
+            self._cancel_oi_deletion(e)
+            return
+
+        self._archive_days.pop(0)
+        if not self._archive_days:
+            self._pending.remove(ARCHIVE_TASK)
+
+    def step(self) -> Dict[str, int]:
+        """
+        在时间预算内推进当前清理轮次
+
+        Returns:
+            Dict[str, int]: 本次step的删除和回收统计
+        """
+        if not self.active:
+            return {}
+
+        start = time.time()
+        deadline = start + self.time_budget if self.time_budget is not None else None
+        step_stats = {'rows_deleted': 0, 'pages_freed': 0, 'chunks': 0}
+
+        while self._pending and (deadline is None or time.time() < deadline):
+            task = self._pending[0]
+
+            if task == VACUUM_TASK:
+                freed = self.db.incremental_vacuum(self.vacuum_pages)
+                step_stats['pages_freed'] += freed
+                self.pass_stats['pages_freed'] += freed
+                if freed < self.vacuum_pages:
+                    self._pending.pop(0)
+                continue
+
+            if task == ARCHIVE_TASK:
+                self._archive_next_day()
+                continue
+
+            deleted = self.db.delete_expired(task, self._cutoffs[task], self.chunk_size)
+            step_stats['rows_deleted'] += deleted
+            step_stats['chunks'] += 1
+            self.pass_stats[RETENTION_RESULT_KEYS[task]] += deleted
+            if deleted < self.chunk_size:
+                self._pending.pop(0)
+
+        duration = time.time() - start
+        self.db.metrics.increment("retention_rows_deleted", step_stats['rows_deleted'])
+        self.db.metrics.increment("retention_pages_freed", step_stats['pages_freed'])
+        self.db.metrics.observe("retention_step_duration", duration)
+        self.db.metrics.set_gauge("retention_tasks_remaining", len(self._pending))
+
+        if not self._pending:
+            self.passes_completed += 1
+            self.last_pass_duration = time.time() - self._pass_started
+            self.db.metrics.observe("retention_pass_duration", self.last_pass_duration)
+            logger.info(f"增量数据清理完成: {self.pass_stats}, 耗时 {self.last_pass_duration:.2f}秒")
+        else:
+            logger.debug(f"增量数据清理进度: {step_stats}, 剩余任务: {self._pending}")
+
+        return step_stats
+
+    @property
+    def rows_deleted(self) -> int:
+        """本轮已删除的总行数"""
+        return sum(self.pass_stats.get(key, 0) for key in RETENTION_RESULT_KEYS.values())
+
+    def run_to_completion(self) -> Dict[str, int]:
+        """开始一轮清理并一直执行到完成（忽略时间预算）"""
+        budget = self.time_budget
+        self.time_budget = None
+        try:
+            self.start_pass()
+            self.step()
+        finally:
+            self.time_budget = budget
+        return dict(self.pass_stats)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取清理引擎状态"""
+        return {
+            'active': self.active,
+            'pending_tasks': list(self._pending),
+            'passes_completed': self.passes_completed,
+            'last_pass_duration': round(self.last_pass_duration, 3),
+            'current_pass': dict(self.pass_stats)
+        }
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+滚动统计 - 按交易对、按比较窗口流式维护持仓量和价格变化率的均值、方差和EWMA
+每个周期对所有交易对一次向量化更新（Welford算法和指数加权，不回扫历史），
+用于把变化率换算为z分数，给波动不同的交易对使用各自的触发标准；统计量保存为npz文件，重启后继续累计
+"""
+
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 统计的两个量：持仓量变化率和价格变化率
+OI = 0
+PRICE = 1
+
+# 交易对槽位的初始容量（不足时翻倍）
+INITIAL_CAPACITY = 256
+
+
+class RollingStats:
+    """滚动统计引擎
+
+    统计量保存在形状为(量, 窗口, 交易对槽位)的数组中：
+    Welford累计均值和平方差和（长期分布），以及按半衰期衰减的EWMA均值和方差（近期分布）。
+    z分数使用EWMA统计量计算，样本数达到min_samples之前视为未就绪。
+    """
+
+    def __init__(self, windows_minutes: Sequence[float], halflife_cycles: float = 96,
+                 min_samples: int = 32):
+        """
+        初始化滚动统计
+
+        Args:
+            windows_minutes: 比较窗口（分钟），与评估矩阵的行一一对应
+            halflife_cycles: EWMA半衰期（周期数）
+            min_samples: z分数可用所需的最少样本数
+        """
+        self.windows_minutes = tuple(float(minutes) for minutes in windows_minutes)
+        self.halflife_cycles = halflife_cycles
+        self.alpha = 1 - 0.5 ** (1 / max(halflife_cycles, 1e-9))
+        self.min_samples = max(2, min_samples)
+
+        self._columns: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._allocate(INITIAL_CAPACITY)
+
+    def _allocate(self, capacity: int):
+        """分配（或扩容）统计数组，已有数据保留"""
+        shape = (2, len(self.windows_minutes), capacity)
+        arrays = {
+            'count': np.zeros(shape[1:], dtype=np.int64),
+            'mean': np.zeros(shape),
+            'm2': np.zeros(shape),
+            'ewm_mean': np.zeros(shape),
+            'ewm_var': np.zeros(shape),
+        }
+        old_capacity = getattr(self, 'capacity', 0)
+        for name, array in arrays.items():
+            if old_capacity:
+                array[..., :old_capacity] = getattr(self, name)
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def _reset_columns(self, columns):
+        self.count[:, columns] = 0
+        for array in (self.mean, self.m2, self.ewm_mean, self.ewm_var):
+            array[..., columns] = 0.0
+
+    def _columns_for(self, symbols: Sequence[str]) -> np.ndarray:
+        """交易对对应的槽位下标，新交易对分配新槽位"""
+        columns = np.empty(len(symbols), dtype=np.intp)
+        for index, symbol in enumerate(symbols):
+            column = self._columns.get(symbol)
+            if column is None:
+                if self._free:
+                    column = self._free.pop()
+                else:
+                    column = len(self._columns)
+                    if column >= self.capacity:
+                        self._allocate(self.capacity * 2)
+                self._columns[symbol] = column
+            columns[index] = column
+        return columns
+
+    def zscores(self, symbols: Sequence[str], oi_change: np.ndarray,
+                price_change: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        按更新前的统计量计算本周期变化率的z分数
+
+        Args:
+            symbols: 交易对列表（与变化率矩阵的列对应）
+            oi_change: 持仓量变化率（窗口数 x 交易对数，无基准时为NaN）
+            price_change: 价格变化率（同上）
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (持仓量z分数, 价格z分数, 是否就绪)
+        """
+        columns = self._columns_for(symbols)
+        ewm_mean = self.ewm_mean[:, :, columns]
+        ewm_std = np.sqrt(self.ewm_var[:, :, columns])
+        ready = (self.count[:, columns] >= self.min_samples) & (ewm_std[OI] > 0) & (ewm_std[PRICE] > 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            oi_z = (oi_change - ewm_mean[OI]) / ewm_std[OI]
+            price_z = (price_change - ewm_mean[PRICE]) / ewm_std[PRICE]
+        ready &= np.isfinite(oi_z) & np.isfinite(price_z)
+        return oi_z, price_z, ready
+
+    def update(self, symbols: Sequence[str], oi_change: np.ndarray, price_change: np.ndarray):
+        """
+        用本周期的变化率更新统计量（NaN表示该窗口无基准，不计入）
+
+        Args:
+            symbols: 交易对列表（与变化率矩阵的列对应）
+            oi_change: 持仓量变化率（窗口数 x 交易对数）
+            price_change: 价格变化率（窗口数 x 交易对数）
+        """
+        if not len(symbols):
+            return
+        columns = self._columns_for(symbols)
+        values = np.stack([np.asarray(oi_change, dtype=np.float64),
+                           np.asarray(price_change, dtype=np.float64)])
+        observed = np.isfinite(values).all(axis=0)
+
+        count = self.count[:, columns]
+        mean = self.mean[:, :, columns]
+        m2 = self.m2[:, :, columns]
+        ewm_mean = self.ewm_mean[:, :, columns]
+        ewm_var = self.ewm_var[:, :, columns]
+
+        new_count = count + observed
+        values = np.where(observed, values, mean)
+
+        # Welford：累计均值和平方差和
+        delta = values - mean
+        new_mean = mean + np.where(observed, delta / np.maximum(new_count, 1), 0.0)
+        new_m2 = m2 + np.where(observed, delta * (values - new_mean), 0.0)
+
+        # 指数加权均值和方差，第一个样本直接作为初始均值
+        first = observed & (count == 0)
+        diff = values - ewm_mean
+        increment = self.alpha * diff
+        new_ewm_mean = np.where(first, values, np.where(observed, ewm_mean + increment, ewm_mean))
+        new_ewm_var = np.where(first, 0.0,
+                               np.where(observed, (1 - self.alpha) * (ewm_var + diff * increment), ewm_var))
+
+        self.count[:, columns] = new_count
+        self.mean[:, :, columns] = new_mean
+        self.m2[:, :, columns] = new_m2
+        self.ewm_mean[:, :, columns] = new_ewm_mean
+        self.ewm_var[:, :, columns] = new_ewm_var
+
+    def forget(self, symbols: Iterable[str]):
+        """移除已下架交易对的统计量，槽位留给新交易对使用"""
+        for symbol in symbols:
+            column = self._columns.pop(symbol, None)
+            if column is not None:
+                self._reset_columns([column])
+                self._free.append(column)
+
+    def save(self, path: str):
+        """
+        保存统计量（只保存在用的槽位，先写临时文件再原子替换）
+
+        Args:
+            path: npz文件路径
+        """
+        symbols = sorted(self._columns)
+        columns = np.array([self._columns[symbol] for symbol in symbols], dtype=np.intp)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as fp:
+            np.savez_compressed(
+                fp,
+                symbols=np.array(symbols, dtype=str),
+                windows_minutes=np.array(self.windows_minutes),
+                alpha=np.array(self.alpha),
+                count=self.count[:, columns],
+                mean=self.mean[:, :, columns],
+                m2=self.m2[:, :, columns],
+                ewm_mean=self.ewm_mean[:, :, columns],
+                ewm_var=self.ewm_var[:, :, columns],
+            )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        """
+        加载保存的统计量
+
+        比较窗口与当前配置不同的窗口重新开始累计，其余窗口照常恢复。
+
+        Args:
+            path: npz文件路径
+
+        Returns:
+            bool: 是否加载成功
+        """
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                symbols = [str(symbol) for symbol in data['symbols']]
+                saved_windows = [float(minutes) for minutes in data['windows_minutes']]
+                stored = {name: data[name] for name in ('count', 'mean', 'm2', 'ewm_mean', 'ewm_var')}
+        except Exception as e:
+            logger.error(f"加载滚动统计失败，将重新累计: {e}")
+            return False
+
+        self._columns = {}
+        self._free = []
+        self.capacity = 0
+        self._allocate(max(INITIAL_CAPACITY, len(symbols)))
+        columns = self._columns_for(symbols)
+
+        restored = []
+        for row, minutes in enumerate(self.windows_minutes):
+            if minutes not in saved_windows:
+                continue
+            saved_row = saved_windows.index(minutes)
+            self.count[row, columns] = stored['count'][saved_row]
+            for name in ('mean', 'm2', 'ewm_mean', 'ewm_var'):
+                getattr(self, name)[:, row, columns] = stored[name][:, saved_row]
+            restored.append(minutes)
+
+        logger.info(f"滚动统计已加载: {len(symbols)} 个交易对, 恢复窗口 {restored}")
+        return True
+
+    def get_symbol_stats(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """单个交易对各窗口的统计量（长期标准差、近期均值和标准差）"""
+        column = self._columns.get(symbol)
+        if column is None:
+            return None
+
+        result = {}
+        for row, minutes in enumerate(self.windows_minutes):
+            count = int(self.count[row, column])
+            entry = {'samples': count}
+            for quantity, name in ((OI, 'oi_change'), (PRICE, 'price_change')):
+                variance = self.m2[quantity, row, column] / (count - 1) if count > 1 else 0.0
+                entry[name] = {
+                    'mean': float(self.mean[quantity, row, column]),
+                    'std': float(np.sqrt(variance)),
+                    'ewm_mean': float(self.ewm_mean[quantity, row, column]),
+                    'ewm_std': float(np.sqrt(self.ewm_var[quantity, row, column])),
+                }
+            result[f"{minutes:g}m"] = entry
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计引擎状态"""
+        active = np.array(list(self._columns.values()), dtype=np.intp)
+        ready = int((self.count[:, active] >= self.min_samples).any(axis=0).sum()) if len(active) else 0
+        return {
+            'symbols': len(self._columns),
+            'ready_symbols': ready,
+            'windows_minutes': list(self.windows_minutes),
+            'halflife_cycles': self.halflife_cycles,
+            'min_samples': self.min_samples,
+        }
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+分级汇总 - 把持仓量原始数据逐级汇总为小时和日线OHLC
+原始数据 -> 1小时 -> 1天，每级只汇总已经结束的时间段，并记录进度以便增量更新
+"""
+
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 86400 * 1000
+
+# 时间段结束后等待的时间，留给异步写入队列把最后一个周期的数据写完
+ROLLUP_GRACE_MS = 5 * 60 * 1000
+
+# 原始数据层名称（不是汇总表）
+RAW_TIER = 'raw'
+
+
+class RollupTier(NamedTuple):
+    """汇总层级"""
+    name: str
+    table: str
+    bucket_ms: int
+    source: str  # 上一级层级名称
+
+
+ROLLUP_TIERS = (
+    RollupTier('1h', 'oi_rollup_1h', HOUR_MS, RAW_TIER),
+    RollupTier('1d', 'oi_rollup_1d', DAY_MS, '1h'),
+)
+
+# 各层级的bucket长度，原始数据为0
+TIER_BUCKET_MS = {RAW_TIER: 0, **{tier.name: tier.bucket_ms for tier in ROLLUP_TIERS}}
+
+ROLLUP_TABLE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        symbol TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        oi_open REAL NOT NULL,
+        oi_high REAL NOT NULL,
+        oi_low REAL NOT NULL,
+        oi_close REAL NOT NULL,
+        price_open REAL NOT NULL,
+        price_high REAL NOT NULL,
+        price_low REAL NOT NULL,
+        price_close REAL NOT NULL,
+        value_open REAL,
+        value_high REAL,
+        value_low REAL,
+        value_close REAL,
+        samples INTEGER NOT NULL,
+        PRIMARY KEY (symbol, bucket)
+    ) WITHOUT ROWID
+'''
+
+ROLLUP_COLUMNS = ['oi', 'price', 'value']
+
+ROLLUP_OUTPUT_COLUMNS = ['symbol', 'bucket'] + [
+    f"{column}_{part}" for column in ROLLUP_COLUMNS for part in ('open', 'high', 'low', 'close')
+] + ['samples']
+
+
+def _rollup_insert_sql(tier: RollupTier, source_relation: str) -> str:
+    """
+    生成一个层级的汇总语句（参数为时间范围[start, end)）
+
+    open/close取时间段内第一条和最后一条记录，high/low取最大最小值。
+    """
+    if tier.source == RAW_TIER:
+        time_column = 'ts'
+        # 原始数据每个字段同时作为open/high/low/close
+        fields = {
+            'oi': ('open_interest',) * 4,
+            'price': ('price',) * 4,
+            'value': ('COALESCE(value_usdt, open_interest * price)',) * 4,
+        }
+        samples = '1'
+    else:
+        time_column = 'bucket'
+        fields = {
+            column: tuple(f"{column}_{part}" for part in ('open', 'high', 'low', 'close'))
+            for column in ROLLUP_COLUMNS
+        }
+        samples = 'samples'
+
+    bucket = f"{time_column} - {time_column} % {tier.bucket_ms}"
+    inner = []
+    outer = []
+    for column, (open_expr, high_expr, low_expr, close_expr) in fields.items():
+        inner += [
+            f"FIRST_VALUE({open_expr}) OVER w AS {column}_open",
+            f"{high_expr} AS {column}_high",
+            f"{low_expr} AS {column}_low",
+            f"LAST_VALUE({close_expr}) OVER w AS {column}_close",
+        ]
+        outer += [
+            f"MAX({column}_open)", f"MAX({column}_high)", f"MIN({column}_low)", f"MAX({column}_close)",
+        ]
+
+    return f"""INSERT OR REPLACE INTO {tier.table} ({', '.join(ROLLUP_OUTPUT_COLUMNS)})
+        SELECT symbol, bucket, {', '.join(outer)}, SUM(samples)
+        FROM (
+            SELECT symbol, {bucket} AS bucket, {', '.join(inner)}, {samples} AS samples
+            FROM {source_relation}
+            WHERE {time_column} >= ? AND {time_column} < ?
+            WINDOW w AS (PARTITION BY symbol, {bucket} ORDER BY {time_column}
+                         ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+        )
+        GROUP BY symbol, bucket"""
+
+
+class RollupManager:
+    """汇总管理器
+
+    rollup_state表记录每个层级已汇总到的时间（不含），update()从该时间开始
+    汇总已经结束的时间段；日线只汇总小时线已经覆盖的完整自然日（UTC）。
+    """
+
+    def __init__(self, db):
+        """
+        初始化汇总管理器
+
+        Args:
+            db: DatabaseManager实例
+        """
+        self.db = db
+        self.tiers = {tier.name: tier for tier in ROLLUP_TIERS}
+
+    def create_schema(self, cursor):
+        """创建汇总表和进度表"""
+        for tier in ROLLUP_TIERS:
+            cursor.execute(ROLLUP_TABLE_SCHEMA.format(table=tier.table))
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tier.table}_bucket ON {tier.table}(bucket)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                tier TEXT PRIMARY KEY,
+                watermark INTEGER NOT NULL
+            )
+        ''')
+
+    def _relation(self, tier_name: str) -> str:
+        """层级对应的表或视图"""
+        if tier_name == RAW_TIER:
+            return self.db.oi_storage.source
+        return self.tiers[tier_name].table
+
+    def get_watermark(self, cursor, tier_name: str) -> Optional[int]:
+        """层级已汇总到的时间（毫秒，不含），尚未开始时返回None"""
+        cursor.execute("SELECT watermark FROM rollup_state WHERE tier = ?", (tier_name,))
+        row = cursor.fetchone()
+        return row['watermark'] if row else None
+
+    def _initial_watermark(self, cursor, tier: RollupTier) -> Optional[int]:
+        """第一次汇总的起点：上一级最早数据所在的时间段"""
+        time_column = 'ts' if tier.source == RAW_TIER else 'bucket'
+        cursor.execute(f"SELECT MIN({time_column}) AS earliest FROM {self._relation(tier.source)}")
+        earliest = cursor.fetchone()['earliest']
+        if earliest is None:
+            return None
+        return earliest - earliest % tier.bucket_ms
+
+    def update(self, now_ms: int, max_buckets: int = 48) -> Dict[str, int]:
+        """
+        增量汇总已经结束的时间段
+
+        Args:
+            now_ms: 当前时间（UTC毫秒）
+            max_buckets: 每个层级本次最多汇总的时间段数（限制单个事务的大小）
+
+        Returns:
+            Dict[str, int]: 各层级写入的汇总行数
+        """
+        written = {}
+        for tier in ROLLUP_TIERS:
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    start = self.get_watermark(cursor, tier.name)
+                    if start is None:
+                        start = self._initial_watermark(cursor, tier)
+
+                    # 只汇总完全结束的时间段；上一级是汇总表时不能超过上一级的进度
+                    end = now_ms - ROLLUP_GRACE_MS
+                    if tier.source != RAW_TIER:
+                        end = min(end, self.get_watermark(cursor, tier.source) or 0)
+                    end -= end % tier.bucket_ms
+
+                    if start is None or end <= start:
+                        cursor.execute("COMMIT")
+                        written[tier.name] = 0
+                        continue
+
+                    end = min(end, start + max_buckets * tier.bucket_ms)
+                    cursor.execute(_rollup_insert_sql(tier, self._relation(tier.source)), (start, end))
+                    written[tier.name] = cursor.rowcount
+                    cursor.execute(
+                        "INSERT OR REPLACE INTO rollup_state (tier, watermark) VALUES (?, ?)",
+                        (tier.name, end)
+                    )
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+
+            if written[tier.name]:
+                logger.debug(f"{tier.table} 汇总 {written[tier.name]} 行，进度至 {end}")
+
+        return written
+
+    def choose_tier(self, start_ms: int, end_ms: int, now_ms: int, max_points: int,
+                    retention_days: Dict[str, Optional[int]]) -> str:
+        """
+        为时间范围查询选择层级
+
+        在保留期覆盖start_ms的层级中，选择bucket不超过目标分辨率的最粗层级；
+        范围很短时使用原始数据，超出所有保留期时使用最粗的层级。
+
+        Args:
+            start_ms: 查询开始时间
+            end_ms: 查询结束时间
+            now_ms: 当前时间
+            max_points: 每个交易对期望返回的最多点数
+            retention_days: 各层级保留天数（None表示永久保留）
+
+        Returns:
+            str: 层级名称
+        """
+        resolution = (end_ms - start_ms) / max(1, max_points)
+        covering = [
+            name for name in TIER_BUCKET_MS
+            if retention_days.get(name) is None or start_ms >= now_ms - retention_days[name] * DAY_MS
+        ]
+        if not covering:
+            return ROLLUP_TIERS[-1].name
+
+        fine_enough = [name for name in covering if TIER_BUCKET_MS[name] <= resolution]
+        if fine_enough:
+            return max(fine_enough, key=TIER_BUCKET_MS.get)
+        return min(covering, key=TIER_BUCKET_MS.get)
+
+    @staticmethod
+    def bucket_ms(tier_name: str) -> int:
+        """层级每个时间段的长度（毫秒），原始数据为0"""
+        return TIER_BUCKET_MS[tier_name]
+
+    def query(self, cursor, tier_name: str, symbol: str, start_ms: int, end_ms: int) -> List[Dict[str, Any]]:
+        """
+        从指定层级读取一个交易对的OHLC序列（原始数据的open/high/low/close相同）
+
+        Returns:
+            List[Dict]: 按时间升序的记录，字段同汇总表，时间为bucket
+        """
+        if tier_name == RAW_TIER:
+            cursor.execute(
+                f"""SELECT symbol, ts AS bucket,
+                    open_interest AS oi_open, open_interest AS oi_high,
+                    open_interest AS oi_low, open_interest AS oi_close,
+                    price AS price_open, price AS price_high, price AS price_low, price AS price_close,
+                    value_usdt AS value_open, value_usdt AS value_high,
+                    value_usdt AS value_low, value_usdt AS value_close,
+                    1 AS samples
+                FROM {self._relation(RAW_TIER)}
+                WHERE symbol = ? AND ts >= ? AND ts < ?
+                ORDER BY ts ASC""",
+                (symbol, start_ms, end_ms)
+            )
+        else:
+            cursor.execute(
+                f"""SELECT {', '.join(ROLLUP_OUTPUT_COLUMNS)} FROM {self._relation(tier_name)}
+                WHERE symbol = ? AND bucket >= ? AND bucket < ?
+                ORDER BY bucket ASC""",
+                (symbol, start_ms - start_ms % TIER_BUCKET_MS[tier_name], end_ms)
+            )
+        return [dict(row) for row in cursor.fetchall()]
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+数据库快照导出 - 用SQLite在线备份API定期生成只读副本，供DB Browser等工具查看
+在线数据库始终使用WAL模式；快照为DELETE日志模式的独立文件，复制过程不阻塞监控写入
+"""
+
+import logging
+import os
+import sqlite3
+import stat
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+
+def default_snapshot_path(db_path: str) -> str:
+    """默认快照路径：data/binance_monitor.db -> data/binance_monitor_browser.db"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}_browser{ext or '.db'}"
+
+
+class SnapshotExporter:
+    """定期快照导出
+
+    复制期间在源数据库上持有一个读事务：WAL模式下读事务看到固定的数据版本，
+    监控的写入照常进行，也不会使复制重新开始。每步只复制pages_per_step页，
+    步与步之间让出CPU。复制到临时文件，完成后切换为DELETE日志模式、设为只读，
+    再原子替换旧快照，查看者不会打开到写了一半的文件。
+    """
+
+    def __init__(self, db_path: str, snapshot_path: Optional[str] = None,
+                 interval_seconds: float = 300.0, pages_per_step: int = 100,
+                 step_sleep: float = 0.005, metrics=None):
+        """
+        初始化快照导出
+
+        Args:
+            db_path: 在线数据库路径
+            snapshot_path: 快照文件路径（默认在数据库文件名后加_browser）
+            interval_seconds: 后台导出间隔（秒）
+            pages_per_step: 每步复制的页数
+            step_sleep: 每步之间的等待时间（秒）
+            metrics: 指标注册表（可选），记录导出耗时和页数
+        """
+        self.db_path = db_path
+        self.snapshot_path = snapshot_path or default_snapshot_path(db_path)
+        self.interval_seconds = interval_seconds
+        self.pages_per_step = max(1, pages_per_step)
+        self.step_sleep = step_sleep
+        self.metrics = metrics
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._export_lock = threading.Lock()
+
+        self.stats = {
+            'exports': 0,
+            'failures': 0,
+            'last_export_time': None,
+            'last_duration': 0.0,
+            'last_pages': 0,
+            'last_steps': 0,
+        }
+
+    def _progress(self, status: int, remaining: int, total: int):
+        """每步复制后的回调：记录进度并让出时间给其他线程"""
+        self.stats['last_pages'] = total
+        self.stats['last_steps'] += 1
+        if self.step_sleep > 0 and remaining > 0:
+            time.sleep(self.step_sleep)
+
+    def export(self) -> bool:
+        """
+        导出一次快照（阻塞直到完成）
+
+        Returns:
+            bool: 是否导出成功
+        """
+        with self._export_lock:
+            start = time.time()
+            tmp_path = self.snapshot_path + '.tmp'
+            self.stats['last_steps'] = 0
+
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+                source_uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+                source = sqlite3.connect(source_uri, uri=True, isolation_level=None, check_same_thread=False)
+                target = sqlite3.connect(tmp_path, isolation_level=None)
+                try:
+                    # 打开读事务并读取一次，固定本次快照看到的数据版本
+                    source.execute("BEGIN")
+                    source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                    source.backup(target, pages=self.pages_per_step, progress=self._progress)
+                    source.execute("COMMIT")
+
+                    # 备份会复制源库的WAL标记，切换为传统日志模式便于其他工具打开
+                    target.execute("PRAGMA journal_mode=DELETE")
+                finally:
+                    target.close()
+                    source.close()
+
+                os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                os.replace(tmp_path, self.snapshot_path)
+
+            except Exception as e:
+                self.stats['failures'] += 1
+                logger.error(f"数据库快照导出失败: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return False
+
+            duration = time.time() - start
+            self.stats['exports'] += 1
+            self.stats['last_export_time'] = time.time()
+            self.stats['last_duration'] = duration
+            if self.metrics is not None:
+                self.metrics.observe("snapshot_duration", duration)
+                self.metrics.set_gauge("snapshot_pages", self.stats['last_pages'])
+
+            logger.info(
+                f"数据库快照已导出: {self.snapshot_path}（{self.stats['last_pages']} 页, "
+                f"{self.stats['last_steps']} 步, 耗时 {duration:.2f}秒）"
+            )
+            return True
+
+    def _run(self):
+        """后台线程：启动时导出一次，之后按间隔导出"""
+        while not self._stop_event.is_set():
+            self.export()
+            self._stop_event.wait(self.interval_seconds)
+
+    def start(self):
+        """启动后台导出线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="db-snapshot", daemon=True)
+        self._thread.start()
+        logger.info(f"数据库快照导出已启动: 每 {self.interval_seconds:.0f} 秒导出到 {self.snapshot_path}")
+
+    def stop(self, timeout: float = 30.0):
+        """停止后台导出线程（正在进行的导出会完成）"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取导出统计"""
+        return {**self.stats, 'snapshot_path': self.snapshot_path}
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+交易对列表缓存 - 缓存exchangeInfo中的永续合约交易对
+支持TTL过期、获取失败后强制刷新，以及新增/下架交易对的差异检测
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SymbolUniverseDiff:
+    """交易对列表变化"""
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        """是否有交易对新增或下架"""
+        return bool(self.added or self.removed)
+
+
+class SymbolUniverseCache:
+    """永续合约交易对缓存
+
+    exchangeInfo体积较大且上下架并不频繁，因此只在TTL到期、
+    上次获取失败或被显式标记失效时才重新下载。
+    """
+
+    def __init__(self, fetch_func: Callable[[], List[str]], ttl_seconds: float = 6 * 3600):
+        """
+        初始化交易对缓存
+
+        Args:
+            fetch_func: 获取交易对列表的函数，失败时返回空列表
+            ttl_seconds: 缓存有效期（秒）
+        """
+        self.fetch_func = fetch_func
+        self.ttl_seconds = ttl_seconds
+
+        self._symbols: List[str] = []
+        self._fetched_at = 0.0
+        self._force_refresh = True
+        self._lock = threading.Lock()
+
+        # 最近一次刷新产生的差异
+        self.last_diff = SymbolUniverseDiff()
+        self.refresh_count = 0
+
+    def invalidate(self):
+        """标记缓存失效，下次获取时强制刷新"""
+        with self._lock:
+            self._force_refresh = True
+
+    def is_expired(self) -> bool:
+        """缓存是否需要刷新"""
+        return self._force_refresh or (time.time() - self._fetched_at) >= self.ttl_seconds
+
+    def get_symbols(self, force_refresh: bool = False) -> List[str]:
+        """
+        获取交易对列表，必要时刷新
+
+        刷新失败时返回上一次成功获取的列表，并在下次调用时继续尝试刷新。
+
+        Args:
+            force_refresh: 是否忽略TTL强制刷新
+
+        Returns:
+            List[str]: 交易对列表
+        """
+        with self._lock:
+            if force_refresh or self.is_expired():
+                self._refresh()
+            return list(self._symbols)
+
+    def _refresh(self):
+        """重新获取交易对列表并计算差异（调用方需持有锁）"""
+        symbols = self.fetch_func()
+
+        if not symbols:
+            self._force_refresh = True
+            self.last_diff = SymbolUniverseDiff()
+            if self._symbols:
+                logger.warning(f"刷新交易对列表失败，继续使用缓存的 {len(self._symbols)} 个交易对")
+            return
+
+        old_set = set(self._symbols)
+        new_set = set(symbols)
+
+        # 首次加载不视为变化
+        if old_set:
+            self.last_diff = SymbolUniverseDiff(
+                added=sorted(new_set - old_set),
+                removed=sorted(old_set - new_set)
+            )
+        else:
+            self.last_diff = SymbolUniverseDiff()
+
+        if self.last_diff.has_changes:
+            logger.info(f"交易对列表变化: 新增 {self.last_diff.added}, 下架 {self.last_diff.removed}")
+
+        self._symbols = list(symbols)
+        self._fetched_at = time.time()
+        self._force_refresh = False
+        self.refresh_count += 1
+
+    def pop_diff(self) -> Optional[SymbolUniverseDiff]:
+        """
+        取出并清除最近一次刷新的差异
+
+        Returns:
+            Optional[SymbolUniverseDiff]: 有变化时返回差异，否则返回None
+        """
+        with self._lock:
+            diff = self.last_diff
+            self.last_diff = SymbolUniverseDiff()
+            return diff if diff.has_changes else None
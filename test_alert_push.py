@@ -33,7 +33,7 @@ def test_latest_alert_push():
     cursor = conn.cursor()
 
     # 获取最近的一条警报
-    cursor.execute('SELECT * FROM alerts ORDER BY alert_time DESC LIMIT 1')
+    cursor.execute('SELECT * FROM alerts_readable ORDER BY alert_ts DESC LIMIT 1')
     latest_alert = cursor.fetchone()
     conn.close()
 
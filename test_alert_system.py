@@ -76,7 +76,7 @@ def test_alert_system():
     # 验证警报已保存
     with sqlite3.connect('/Users/vadar/Cursor file/trading bot/binance_monitor.db') as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM alerts WHERE symbol = 'TESTALERTUSDT' ORDER BY alert_time DESC LIMIT 1")
+        cursor.execute("SELECT * FROM alerts_readable WHERE symbol = 'TESTALERTUSDT' ORDER BY alert_ts DESC LIMIT 1")
         saved_alert = cursor.fetchone()
 
         if saved_alert:
@@ -8,6 +8,8 @@ import os
 from datetime import datetime, timedelta
 import pytz
 
+from database_manager import to_epoch_ms
+
 UTC8 = pytz.timezone('Asia/Shanghai')
 
 def get_utc8_time():
@@ -38,9 +40,9 @@ def test_timing_fix():
 
     # 插入历史数据
     cursor.execute("""
-        INSERT INTO oi_history (symbol, timestamp, open_interest, price, value_usdt)
+        INSERT INTO oi_history (symbol, ts, open_interest, price, value_usdt)
         VALUES (?, ?, ?, ?, ?)
-    """, ('TESTUSDT', old_time.isoformat(), old_oi, old_price, old_oi * old_price))
+    """, ('TESTUSDT', to_epoch_ms(old_time), old_oi, old_price, old_oi * old_price))
 
     conn.commit()
     print(f"插入历史数据: {old_time} - OI: {old_oi}, Price: {old_price}")
@@ -54,14 +56,14 @@ def test_timing_fix():
 
     # 获取历史数据（模拟我们的修复逻辑）
     # 使用当前时间计算截止时间，但向前调整2秒以解决微秒精度问题
-    cutoff_time = (get_utc8_time() - timedelta(minutes=15) - timedelta(seconds=2)).isoformat()
-    print(f"查询截止时间: {cutoff_time}")
+    cutoff_time = get_utc8_time() - timedelta(minutes=15) - timedelta(seconds=2)
+    print(f"查询截止时间: {cutoff_time.isoformat()}")
     print(f"历史数据时间: {old_time.isoformat()}")
     print(f"时间差: {(get_utc8_time() - old_time).total_seconds()} 秒")
 
     cursor.execute("""
-        SELECT timestamp, open_interest, price, value_usdt
-        FROM oi_history
+        SELECT timestamp, ts, open_interest, price, value_usdt
+        FROM oi_history_readable
         WHERE symbol = 'TESTUSDT'
         ORDER BY timestamp ASC
     """)
@@ -72,15 +74,15 @@ def test_timing_fix():
         print(f"  {row['timestamp']} - OI: {row['open_interest']}, Price: {row['price']}")
 
     cursor.execute("""
-        SELECT timestamp, open_interest, price, value_usdt
-        FROM oi_history
+        SELECT timestamp, ts, open_interest, price, value_usdt
+        FROM oi_history_readable
         WHERE symbol = 'TESTUSDT'
-        AND timestamp >= ?
+        AND ts >= ?
         ORDER BY timestamp ASC
-    """, (cutoff_time,))
+    """, (to_epoch_ms(cutoff_time),))
 
-    print(f"SQL查询: timestamp >= '{cutoff_time}'")
-    print(f"比较: '{all_data[0]['timestamp']}' >= '{cutoff_time}' = {all_data[0]['timestamp'] >= cutoff_time}")
+    print(f"SQL查询: ts >= {to_epoch_ms(cutoff_time)}")
+    print(f"比较: {all_data[0]['ts']} >= {to_epoch_ms(cutoff_time)} = {all_data[0]['ts'] >= to_epoch_ms(cutoff_time)}")
 
     historical_data = cursor.fetchall()
     print(f"\n获取到的历史数据: {len(historical_data)} 条")
@@ -113,21 +115,21 @@ def test_timing_fix():
 
         # 现在保存当前数据（模拟我们的修复逻辑）
         cursor.execute("""
-            INSERT INTO oi_history (symbol, timestamp, open_interest, price, value_usdt, price_change, oi_change)
+            INSERT INTO oi_history (symbol, ts, open_interest, price, value_usdt, price_change, oi_change)
             VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, ('TESTUSDT', current_time.isoformat(), current_oi, current_price, current_oi * current_price, price_change_rate, oi_change_rate))
+        """, ('TESTUSDT', to_epoch_ms(current_time), current_oi, current_price, current_oi * current_price, price_change_rate, oi_change_rate))
 
         conn.commit()
         print(f"\n✓ 已保存当前数据到数据库")
 
         # 再次获取历史数据，验证我们的修复
         cursor.execute("""
-            SELECT timestamp, open_interest, price, value_usdt
-            FROM oi_history
+            SELECT timestamp, ts, open_interest, price, value_usdt
+            FROM oi_history_readable
             WHERE symbol = 'TESTUSDT'
-            AND timestamp >= ?
+            AND ts >= ?
             ORDER BY timestamp ASC
-        """, ((get_utc8_time() - timedelta(minutes=15)).isoformat(),))
+        """, (to_epoch_ms(get_utc8_time() - timedelta(minutes=15)),))
 
         updated_historical_data = cursor.fetchall()
         print(f"\n保存当前数据后，再次获取历史数据: {len(updated_historical_data)} 条")
@@ -139,7 +141,7 @@ def test_timing_fix():
             print(f"历史价格: {oldest_after_save['price']}")
 
             # 验证历史数据没有被当前数据污染
-            if oldest_after_save['timestamp'] == old_time.isoformat():
+            if oldest_after_save['ts'] == to_epoch_ms(old_time):
                 print("\n✓ 修复成功！历史数据没有被当前数据污染")
                 print("✓ 最老的历史数据仍然是之前保存的旧数据")
             else:
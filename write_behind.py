@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+异步写入队列 - 数据库写入的write-behind层
+生产者把记录放入有界队列立即返回，由专用写线程按批次写入数据库
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 停止信号
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """写入队列
+
+    写线程在积累到batch_size条记录或距离上次写入超过flush_interval秒时
+    批量提交一次，put_batch放入的批次作为整体提交，不会被拆到两个事务中。
+    写入失败时按指数退避重试整批记录。队列已满时put会阻塞生产者（背压），
+    直到写线程腾出空间。shutdown()保证队列中的所有记录都被处理后才返回。
+    """
+
+    def __init__(self, write_func: Callable[[Dict[str, List[tuple]]], int],
+                 max_queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, put_timeout: float = 30.0,
+                 max_retries: int = 3, retry_backoff: float = 0.5):
+        """
+        初始化写入队列
+
+        Args:
+            write_func: 批量写入函数，接收 {表名: [参数元组]}，返回写入的行数，失败时抛出异常
+            max_queue_size: 队列最大长度（条目数，put_batch放入的一个批次算一条）
+            batch_size: 积累到多少条记录时写入一次（整体入队的批次不会被拆分）
+            flush_interval: 最长写入间隔（秒）
+            put_timeout: 队列已满时生产者的最长等待时间（秒）
+            max_retries: 写入失败后的最多重试次数，仍失败时丢弃该批记录
+            retry_backoff: 首次重试前的等待时间（秒），之后每次翻倍
+        """
+        self.write_func = write_func
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+        # 统计信息（生产者线程和写线程都会更新，修改时持有锁）
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'write_failures': 0,
+            'write_retries': 0,
+            'dropped': 0,
+            'batches': 0,
+            'backpressure_waits': 0
+        }
+
+    def _count(self, name: str, value: int = 1):
+        """累加一项统计"""
+        with self._stats_lock:
+            self.stats[name] += value
+
+    def start(self):
+        """启动写线程"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="db_write_behind", daemon=True)
+        self._thread.start()
+        logger.info(f"异步写入线程已启动: 批大小 {self.batch_size}, 刷新间隔 {self.flush_interval}秒")
+
+    def put(self, table: str, row: tuple) -> bool:
+        """
+        放入一条记录
+
+        Args:
+            table: 目标表名
+            row: 插入参数
+
+        Returns:
+            bool: 是否成功入队（等待超时或队列已关闭时返回False）
+        """
+        return self.put_batch({table: [row]}) > 0
+
+    def put_many(self, table: str, rows: Iterable[tuple]) -> int:
+        """放入同一张表的多条记录（作为一个整体写入），返回成功入队的数量"""
+        return self.put_batch({table: list(rows)})
+
+    def put_batch(self, rows_by_table: Dict[str, List[tuple]]) -> int:
+        """
+        把多张表的记录作为一个整体入队，写线程不会拆分，保证在同一个事务中提交
+
+        Args:
+            rows_by_table: 表名到插入参数列表的映射
+
+        Returns:
+            int: 成功入队的记录数（整体入队或整体丢弃）
+        """
+        item = {table: list(rows) for table, rows in rows_by_table.items() if rows}
+        size = sum(len(rows) for rows in item.values())
+        if not size:
+            return 0
+
+        if self._stopped:
+            logger.error(f"写入队列已关闭，丢弃 {size} 条记录（{', '.join(item)}）")
+            self._count('dropped', size)
+            return 0
+
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count('backpressure_waits')
+            try:
+                self._queue.put(item, timeout=self.put_timeout)
+            except queue.Full:
+                logger.error(f"写入队列已满且等待超时，丢弃 {size} 条记录（{', '.join(item)}）")
+                self._count('dropped', size)
+                return 0
+
+        self._count('enqueued', size)
+        return size
+
+    def _write(self, items: List[Dict[str, List[tuple]]]):
+        """合并多个条目后在一次写入中提交"""
+        rows_by_table: Dict[str, List[tuple]] = {}
+        for item in items:
+            for table, rows in item.items():
+                rows_by_table.setdefault(table, []).extend(rows)
+        size = sum(len(rows) for rows in rows_by_table.values())
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    written = self.write_func(rows_by_table)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"异步写入失败，已重试 {attempt} 次，丢弃 {size} 条记录: {e}")
+                        self._count('write_failures', size)
+                        return
+                    delay = self.retry_backoff * 2 ** attempt
+                    logger.warning(f"异步写入失败（{size} 条），{delay:.1f} 秒后重试: {e}")
+                    self._count('write_retries')
+                    time.sleep(delay)
+
+            self._count('batches')
+            self._count('written', written)
+        finally:
+            for _ in items:
+                self._queue.task_done()
+
+    def _run(self):
+        """写线程主循环"""
+        pending: List[Dict[str, List[tuple]]] = []
+        pending_rows = 0
+        deadline = time.time() + self.flush_interval
+        stopping = False
+
+        while True:
+            try:
+                if stopping:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                if stopping:
+                    break
+                item = None
+
+            if item is _STOP:
+                stopping = True
+                self._queue.task_done()
+            elif item is not None:
+                pending.append(item)
+                pending_rows += sum(len(rows) for rows in item.values())
+
+            now = time.time()
+            if pending and (pending_rows >= self.batch_size or now >= deadline or stopping):
+                self._write(pending)
+                pending = []
+                pending_rows = 0
+
+            if now >= deadline:
+                deadline = now + self.flush_interval
+
+    def qsize(self) -> int:
+        """当前排队的条目数（一个批次算一条）"""
+        return self._queue.qsize()
+
+    def flush(self):
+        """阻塞直到当前已入队的记录全部写入"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """
+        停止写线程并写入队列中剩余的全部记录
+
+        Args:
+            timeout: 等待写线程退出的最长时间（秒），None表示一直等待
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+
+        if self._thread is None:
+            return
+
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        logger.info(f"异步写入线程已停止: {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入队列统计信息"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['queued'] = self._queue.qsize()
+        return stats